@@ -0,0 +1,140 @@
+import re
+import pandas as pd
+
+# Secondary unit designators; the unit number is kept without them
+UNIT_DESIGNATORS = {
+    'APT': '', 'APARTMENT': '', 'UNIT': '', 'STE': '', 'SUITE': '', '#': '',
+    'RM': '', 'ROOM': '', 'BLDG': '', 'LOT': '',
+    # Penthouse units are distinct from the plain numbers, keep the marker
+    'PH': 'PH', 'PENTHOUSE': 'PH',
+}
+
+STREET_SUFFIXES = {
+    'AVENUE': 'AVE', 'AV': 'AVE', 'BOULEVARD': 'BLVD', 'CAUSEWAY': 'CSWY', 'CIRCLE': 'CIR',
+    'COURT': 'CT', 'DRIVE': 'DR', 'HIGHWAY': 'HWY', 'ISLAND': 'IS', 'LANE': 'LN', 'PARKWAY': 'PKWY',
+    'PLACE': 'PL', 'PLAZA': 'PLZ', 'POINT': 'PT', 'ROAD': 'RD', 'STREET': 'ST', 'TERRACE': 'TER',
+    'TRAIL': 'TRL', 'WAY': 'WAY', 'ISLE': 'IS', 'ISLES': 'IS', 'HARBOUR': 'HBR', 'HARBOR': 'HBR',
+}
+
+DIRECTIONALS = {
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
+    'NORTHEAST': 'NE', 'NORTHWEST': 'NW', 'SOUTHEAST': 'SE', 'SOUTHWEST': 'SW',
+}
+
+# Names the sites use interchangeably for the same city
+CITY_ALIASES = {
+    'HALLANDALE': 'HALLANDALE BEACH',
+    'MIAMI BCH': 'MIAMI BEACH',
+    'N MIAMI BEACH': 'NORTH MIAMI BEACH',
+    'N MIAMI': 'NORTH MIAMI',
+    'SUNNY ISLES': 'SUNNY ISLES BEACH',
+    'BAL HARBOR': 'BAL HARBOUR',
+}
+
+ADDRESS_FIELDS = ['ADDR_NUMBER', 'ADDR_STREET', 'ADDR_UNIT', 'ADDR_CITY', 'ADDR_ZIP']
+
+_UNIT_RE = re.compile(r'(?:\b(' + '|'.join(sorted((k for k in UNIT_DESIGNATORS if k != '#'), key=len, reverse=True))
+                      + r')\b\.?|#)\s*#?\s*-?\s*([A-Z0-9][A-Z0-9/\-]*)\s*$')
+_ZIP_RE = re.compile(r'\b(\d{5})(?:-\d{4})?\s*$')
+
+def _street_tokens(tokens):
+    """Street name tokens with directionals abbreviated, and the street type too.
+
+    Only the street type is abbreviated: the last token, or the one before a
+    post-directional ('OCEAN DRIVE NORTH'), and never the only token, so
+    names like 'ISLAND BLVD' or 'HARBOUR POINT DR' keep their words.
+    """
+    tokens = [DIRECTIONALS.get(t, t) for t in tokens]
+    last = len(tokens) - 1
+    if last > 0 and tokens[last] in DIRECTIONALS.values():
+        last -= 1
+    if last > 0:
+        tokens[last] = STREET_SUFFIXES.get(tokens[last], tokens[last])
+    return tokens
+
+def parse_address(text):
+    """Split '1913 S Ocean Dr APT 410, Hallandale, FL 33009' into normalized parts.
+
+    Returns (number, street, unit, city, zip), each '' when missing. The
+    street type and directionals are abbreviated (_street_tokens), unit
+    designators dropped and city aliases resolved.
+    """
+    parts = [p.strip() for p in re.sub(r'[^\w#,/\- ]', ' ', str(text or '').upper()).split(',')]
+    parts = [p for p in parts if p]
+    zipcode = ''
+    if parts:
+        match = _ZIP_RE.search(parts[-1])
+        if match:
+            zipcode = match.group(1)
+            parts[-1] = parts[-1][:match.start()].strip()
+            # Drop the state left in front of the zipcode
+            if re.fullmatch(r'[A-Z]{2}', parts[-1]) or not parts[-1]:
+                parts.pop()
+    street = parts[0] if len(parts) >= 2 else ''
+    city = ' '.join(parts[-1].split()) if len(parts) >= 2 else (parts[0] if parts else '')
+    # A street line on its own has a house number; 'Hallandale Beach' does not
+    if not street and parts and re.match(r'\d', parts[0]):
+        street, city = parts[0], ''
+    if len(parts) >= 3 and _UNIT_RE.search(parts[1]):
+        # 'Street, Unit 5, City' style
+        street = f"{street} {parts[1]}"
+    unit = ''
+    match = _UNIT_RE.search(street)
+    if match:
+        designator = UNIT_DESIGNATORS.get(match.group(1) or '#', '')
+        unit = designator + match.group(2)
+        street = street[:match.start()]
+    unit = re.sub(r'[^A-Z0-9/]', '', unit).lstrip('0') or unit
+    tokens = street.split()
+    number = tokens.pop(0) if tokens and re.fullmatch(r'\d+[A-Z]?(?:-\d+)?', tokens[0]) else ''
+    street = ' '.join(_street_tokens(tokens))
+    city = CITY_ALIASES.get(city, city)
+    return number, street, unit, city, zipcode
+
+def normalize_addresses(addresses, zipcodes=None):
+    """DataFrame of ADDRESS_FIELDS for a Series of address strings.
+
+    zipcodes (e.g. the ZIPCODE column) fills in the zipcode where the
+    address text has none.
+    """
+    # The same address shows up once per source, parse each distinct text once
+    texts = addresses.fillna('').astype(str)
+    unique = texts.unique()
+    lookup = pd.DataFrame([parse_address(a) for a in unique], columns=ADDRESS_FIELDS, index=unique)
+    parsed = lookup.reindex(texts.values).set_axis(addresses.index)
+    if zipcodes is not None:
+        parsed['ADDR_ZIP'] = parsed['ADDR_ZIP'].where(parsed['ADDR_ZIP'] != '', zipcodes.fillna('').astype(str).str.strip())
+    return parsed
+
+def _same_street(a, b):
+    """Streets match when one's tokens contain the other's ('COLLINS' / 'COLLINS AVE') or they mostly overlap."""
+    ta, tb = set(a.split()), set(b.split())
+    if not ta or not tb:
+        return False
+    return ta <= tb or tb <= ta or len(ta & tb) / len(ta | tb) >= 0.5
+
+def address_keys(addresses, zipcodes=None):
+    """Matching key per address: 'zip|number|street|unit', or NA when too incomplete to match.
+
+    Candidates are blocked on zipcode, house number and unit, so street
+    names are only compared within a block and the cost stays near-linear.
+    Streets that match within a block share the key of the first of them.
+    """
+    parsed = normalize_addresses(addresses, zipcodes)
+    complete = (parsed['ADDR_NUMBER'] != '') & (parsed['ADDR_STREET'] != '') & (parsed['ADDR_ZIP'] != '')
+    block = parsed['ADDR_ZIP'] + '|' + parsed['ADDR_NUMBER'] + '|' + parsed['ADDR_UNIT']
+    street = parsed['ADDR_STREET'].copy()
+    streets_per_block = street[complete].groupby(block[complete]).unique()
+    canonical = {}
+    for block_id, names in streets_per_block[streets_per_block.str.len() > 1].items():
+        chosen = []
+        for name in names:
+            match = next((c for c in chosen if _same_street(c, name)), None)
+            if match is None:
+                chosen.append(name)
+            else:
+                canonical[(block_id, name)] = match
+    if canonical:
+        street = pd.Series([canonical.get((b, s), s) for b, s in zip(block, street)], index=street.index)
+    keys = parsed['ADDR_ZIP'] + '|' + parsed['ADDR_NUMBER'] + '|' + street + '|' + parsed['ADDR_UNIT']
+    return keys.where(complete).astype('string')
@@ -0,0 +1,207 @@
+import os
+import re
+import csv
+import logging
+import threading
+import unicodedata
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from normalize import PHONE_PATTERN
+
+AGENT_EMAILS_CSV = 'nestfully_emails.csv'
+# SPLIT_PATTERN is the first/last name split that found the email (see name_splits)
+CACHE_HEADERS = ['AGENT_KEY', 'AGENT_NAME', 'AGENT_PHONE', 'EMAIL', 'STATUS', 'LOOKED_UP_AT', 'SPLIT_PATTERN']
+
+FOUND = 'found'
+MISSING = 'missing'
+
+# Agents Nestfully had no email for are searched again after this many days
+MISS_TTL = timedelta(days=float(os.environ.get('NESTFULLY_MISS_TTL_DAYS', 30)))
+
+def normalize_agent_name(name):
+    """'José  O'Neil-Smith' -> 'JOSE ONEIL SMITH': no accents or punctuation, single spaces."""
+    name = unicodedata.normalize('NFKD', str(name or '')).encode('ascii', 'ignore').decode()
+    name = re.sub(r"['.]", '', name.upper())
+    return ' '.join(re.sub(r'[^A-Z0-9]+', ' ', name).split())
+
+def normalize_agent_phone(phone):
+    """First US phone number in the text as +1XXXXXXXXXX, '' when there is none."""
+    match = re.search(PHONE_PATTERN, str(phone or ''))
+    return '+1' + ''.join(match.groups()) if match else ''
+
+# Trailing designations that are not part of the agent's last name
+NAME_SUFFIXES = {'JR', 'SR', 'II', 'III', 'IV', 'PA', 'ESQ', 'REALTOR', 'BROKER', 'CRS', 'GRI'}
+
+def agent_id(name):
+    """Identity of an agent across sources: first and last name token, 'MELISSA APTAKIN'.
+
+    Middle names and initials, suffixes ('Jr', 'P.A.') and spelling of
+    accents or punctuation do not matter. Phones are deliberately left
+    out, the sites often list an office number shared by many agents or
+    disagree on the agent's number; the phone only picks between several
+    directory results for the same name (nestfully_http.pick_result).
+    """
+    tokens = normalize_agent_name(name).split()
+    while len(tokens) > 2 and tokens[-1] in NAME_SUFFIXES:
+        tokens.pop()
+    return ' '.join(tokens[:1] + tokens[1:][-1:])
+
+def agent_key(name, phone=''):
+    """Cache key for an agent: normalized name and phone, 'JANE DOE|+19545455583'."""
+    return f"{normalize_agent_name(name)}|{normalize_agent_phone(phone)}"
+
+def _read_entries(path):
+    """(header, cache entries) of a cache file; files in older formats are parsed in memory."""
+    if not os.path.exists(path):
+        return None, []
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        header = reader.fieldnames or []
+        rows = list(reader)
+    entries = []
+    for row in rows:
+        name = (row.get('AGENT_NAME') or '').strip()
+        if not name:
+            continue
+        email = (row.get('EMAIL') or '').strip()
+        phone = normalize_agent_phone(row.get('AGENT_PHONE'))
+        entries.append({
+            'AGENT_KEY': row.get('AGENT_KEY') or agent_key(name, phone),
+            'AGENT_NAME': name,
+            'AGENT_PHONE': phone,
+            'EMAIL': email,
+            'STATUS': row.get('STATUS') or (FOUND if email else MISSING),
+            'LOOKED_UP_AT': row.get('LOOKED_UP_AT') or '',
+            'SPLIT_PATTERN': row.get('SPLIT_PATTERN') or '',
+        })
+    return header, entries
+
+class AgentEmailCache:
+    """Agent email lookups remembered across runs in an append-only CSV.
+
+    Emails that were found are kept for good; agents without an email are
+    remembered for MISS_TTL so they are not searched again on every run.
+    The file is read once when the cache is created and every result is
+    appended to it as soon as it is recorded, the last row for a key wins.
+    record() may be called from several enrichment threads. Only record()
+    writes the file, readers (attach_emails) never touch it.
+    """
+
+    def __init__(self, path=AGENT_EMAILS_CSV, miss_ttl=MISS_TTL):
+        self.path = path
+        self.miss_ttl = miss_ttl
+        self.entries = {}
+        # Agent ID -> keys recorded for it, for matches across name variants and phones
+        self.ids = {}
+        self.lock = threading.Lock()
+        header, entries = _read_entries(path)
+        # Files in an older format are upgraded by the first record(), once
+        self.upgraded = header is None or header == CACHE_HEADERS
+        for entry in entries:
+            self._store(entry)
+
+    def _store(self, entry):
+        self.entries[entry['AGENT_KEY']] = entry
+        self.ids.setdefault(agent_id(entry['AGENT_NAME']), set()).add(entry['AGENT_KEY'])
+
+    def _upgrade(self):
+        # Files from before the cache only have AGENT_NAME,EMAIL (and older caches lack
+        # some columns); the writer rewrites them once with the full header so results
+        # can be appended. Re-read under the lock, the file is the source of truth.
+        header, entries = _read_entries(self.path)
+        if header is None or header == CACHE_HEADERS:
+            return
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CACHE_HEADERS)
+            writer.writeheader()
+            writer.writerows(entries)
+        os.replace(tmp_file, self.path)
+        logging.info(f"Upgraded {self.path} to the agent cache format ({len(entries)} rows).")
+
+    def _fresh(self, entry):
+        if entry['STATUS'] == FOUND:
+            return True
+        try:
+            looked_up_at = datetime.fromisoformat(entry['LOOKED_UP_AT'])
+        except ValueError:
+            return False
+        return datetime.now(timezone.utc) - looked_up_at < self.miss_ttl
+
+    def lookup(self, name, phone=''):
+        """Cached email for the agent, '' for a remembered miss, None when it has to be searched.
+
+        An agent is matched on name and phone first, then on its agent_id,
+        so the result for 'Melissa Aptakin' also answers 'Melissa Lynn
+        Aptakin' under another phone.
+        """
+        entry = self.entries.get(agent_key(name, phone))
+        if entry is None:
+            candidates = [self.entries[k] for k in list(self.ids.get(agent_id(name), ()))]
+            # A found email beats a miss recorded for another variant
+            candidates.sort(key=lambda e: e['STATUS'] != FOUND)
+            entry = candidates[0] if candidates else None
+        if entry is None or not self._fresh(entry):
+            return None
+        return entry['EMAIL'] if entry['STATUS'] == FOUND else ''
+
+    def record(self, name, phone, email, split_pattern=''):
+        """Remember the result of a search ('' when nothing was found) and append it to the file."""
+        email = (email or '').strip()
+        phone = normalize_agent_phone(phone)
+        entry = {
+            'AGENT_KEY': agent_key(name, phone),
+            'AGENT_NAME': str(name).strip(),
+            'AGENT_PHONE': phone,
+            'EMAIL': email,
+            'STATUS': FOUND if email else MISSING,
+            'LOOKED_UP_AT': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'SPLIT_PATTERN': split_pattern if email else '',
+        }
+        with self.lock:
+            self._store(entry)
+            if not self.upgraded:
+                self._upgrade()
+                self.upgraded = True
+            write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=CACHE_HEADERS)
+                if write_header:
+                    writer.writeheader()
+                writer.writerow(entry)
+
+# path -> ((mtime, size) of the file, AgentEmailCache read from it)
+_shared_caches = {}
+
+def shared_cache(path=AGENT_EMAILS_CSV):
+    """AgentEmailCache of path for readers, parsed again only after the file changed."""
+    try:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        version = None
+    cached = _shared_caches.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, AgentEmailCache(path))
+        _shared_caches[path] = cached
+    return cached[1]
+
+def attach_emails(df, cache=None):
+    """df with EMAIL filled in from the agent email cache where it is empty.
+
+    Enrichment only appends to the cache file, so the listings pick up new
+    emails when they are compiled or read instead of being rewritten.
+    """
+    if 'AGENT_NAME' not in df.columns:
+        return df
+    cache = cache or shared_cache()
+    df = df.copy()
+    email = df['EMAIL'].astype('string').str.strip() if 'EMAIL' in df.columns else pd.Series(pd.NA, index=df.index, dtype='string')
+    missing = (email.fillna('') == '').to_numpy(dtype=bool)
+    names = df.loc[missing, 'AGENT_NAME'].astype('string').fillna('')
+    phones = df.loc[missing, 'AGENT_PHONE'].astype('string').fillna('') if 'AGENT_PHONE' in df.columns else names.str.slice(0, 0)
+    # Listings share agents, look each name/phone pair up once
+    found = {pair: cache.lookup(*pair) or pd.NA for pair in set(zip(names, phones)) if pair[0].strip()}
+    fill = pd.Series([found.get(pair, pd.NA) for pair in zip(names, phones)], index=names.index, dtype='string')
+    df['EMAIL'] = email.where(~missing, fill.reindex(email.index)).astype('string')
+    return df
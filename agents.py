@@ -0,0 +1,59 @@
+import os
+import pandas as pd
+from agent_cache import agent_id, normalize_agent_phone
+
+AGENTS_CSV = 'agents.csv'
+AGENT_HEADERS = ['AGENT_ID', 'AGENT_NAME', 'AGENT_PHONE', 'NAME_VARIANTS', 'PHONES', 'EMAIL', 'LISTINGS']
+
+def agent_ids(names):
+    """AGENT_ID (agent_cache.agent_id) for a Series of agent names, NA where there is no name."""
+    names = names.astype('string').fillna('')
+    ids = {name: agent_id(name) or pd.NA for name in names.unique()}
+    return names.map(ids).astype('string')
+
+def _most_common(parts, column):
+    counts = parts.groupby(['AGENT_ID', column]).size().reset_index(name='_N')
+    counts = counts.sort_values(['_N', column], ascending=[False, True], kind='stable')
+    return counts.drop_duplicates(subset=['AGENT_ID']).set_index('AGENT_ID')[column]
+
+def _all_values(parts, column):
+    values = parts[['AGENT_ID', column]].dropna().drop_duplicates().sort_values(column)
+    return values.groupby('AGENT_ID')[column].agg(';'.join)
+
+def build_agents(listings):
+    """One row per AGENT_ID of the compiled listings.
+
+    AGENT_NAME is the most common spelling and AGENT_PHONE the most common
+    phone; every spelling and phone seen is kept in NAME_VARIANTS and
+    PHONES (';'-separated). Phones only describe the agent, they are never
+    used to tell agents apart or to merge them.
+    """
+    if listings.empty or 'AGENT_ID' not in listings.columns:
+        return pd.DataFrame(columns=AGENT_HEADERS)
+    df = listings[listings['AGENT_ID'].notna()]
+    names = df['AGENT_NAME'].astype('string').str.replace(r'\s+', ' ', regex=True).str.strip()
+    phones = df['AGENT_PHONE'].astype('string').fillna('').map(normalize_agent_phone) if 'AGENT_PHONE' in df.columns else names.str.slice(0, 0)
+    emails = df['EMAIL'].astype('string').str.strip().replace('', pd.NA) if 'EMAIL' in df.columns else pd.Series(pd.NA, index=df.index, dtype='string')
+    parts = pd.DataFrame({'AGENT_ID': df['AGENT_ID'], 'NAME': names, 'PHONE': phones.replace('', pd.NA), 'EMAIL': emails})
+    grouped = parts.groupby('AGENT_ID')
+    agents = pd.DataFrame({
+        'AGENT_NAME': _most_common(parts, 'NAME'),
+        'AGENT_PHONE': _most_common(parts, 'PHONE'),
+        'NAME_VARIANTS': _all_values(parts, 'NAME'),
+        'PHONES': _all_values(parts, 'PHONE'),
+        'EMAIL': grouped['EMAIL'].first(),
+        'LISTINGS': grouped.size(),
+    }).fillna({'AGENT_PHONE': '', 'PHONES': ''})
+    agents.index.name = 'AGENT_ID'
+    return agents.reset_index()[AGENT_HEADERS]
+
+def write_agents(agents, path=AGENTS_CSV):
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    agents.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, path)
+
+def load_agents(path=AGENTS_CSV):
+    """The agent table written by the compiler, empty when there is none yet."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=AGENT_HEADERS)
+    return pd.read_csv(path, dtype={c: 'string' for c in AGENT_HEADERS if c != 'LISTINGS'}, keep_default_na=False)
@@ -1,16 +1,11 @@
 from flask import Flask, render_template, request
-import pandas as pd
-import os
+from main_listing import load_listings
 
 app = Flask(__name__)
 
-CSV_FILE = 'main_listing.csv'
-
 def get_listings():
-    if os.path.exists(CSV_FILE):
-        df = pd.read_csv(CSV_FILE)
-        return df.to_dict(orient='records')
-    return []
+    # Served from the memory-mapped Parquet file when the compiler has written one
+    return load_listings().to_dict(orient='records')
 
 @app.route('/')
 def index():
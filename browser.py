@@ -0,0 +1,147 @@
+import os
+import sys
+import logging
+import undetected_chromedriver as uc
+
+# File types blocked when resource blocking is on: images, media and fonts
+BLOCKED_EXTENSIONS = [
+    'png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'bmp', 'ico', 'svg',
+    'mp4', 'webm', 'm3u8', 'mp3',
+    'woff', 'woff2', 'ttf', 'otf', 'eot',
+]
+
+# URL patterns blocked through CDP when resource blocking is on: the file types
+# above (with or without a query string, 'x.png?w=400'), map tiles and
+# third-party trackers. Bot-protection scripts are left alone on purpose,
+# blocking them gets the session flagged.
+BLOCKED_URL_PATTERNS = [f'*.{ext}{query}' for ext in BLOCKED_EXTENSIONS for query in ('', '?*')] + [
+    '*maps.googleapis.com/maps/vt*', '*maps.gstatic.com*', '*api.mapbox.com*', '*tiles.mapbox.com*',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*facebook.net*', '*connect.facebook.*', '*hotjar.com*', '*segment.io*', '*segment.com*',
+    '*nr-data.net*', '*newrelic.com*', '*bat.bing.com*', '*adsrvr.org*', '*criteo.*',
+    '*taboola.com*', '*quantserve.com*', '*scorecardresearch.com*', '*tiqcdn.com*', '*optimizely.com*',
+]
+
+# Window positions for headed runs, so three scrapers can share one screen
+WINDOW_CORNERS = {
+    'upper-left': (0, 0),
+    'upper-right': (1, 0),
+    'lower-right': (1, 1),
+    'lower-left': (0, 1),
+}
+
+def has_display():
+    """False on Linux boxes without an X/Wayland display, where Chrome must run headless."""
+    if sys.platform.startswith('linux'):
+        return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+    return True
+
+def block_resources_in_tab(driver):
+    """Apply BLOCKED_URL_PATTERNS to the current tab; CDP blocking is per tab."""
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        logging.warning(f"Could not enable resource blocking: {e}")
+
+def place_window(driver, corner):
+    """Resize the window to a quarter of the screen and move it into a corner."""
+    screen_width, screen_height = driver.execute_script("return [screen.availWidth, screen.availHeight];")
+    window_width = int(screen_width / 2)
+    window_height = int(screen_height / 2)
+    column, row = WINDOW_CORNERS[corner]
+    window_x = column * (screen_width - window_width)
+    window_y = row * (screen_height - window_height)
+    driver.set_window_rect(window_x, window_y, window_width, window_height)
+    logging.info(f"Set window size to {window_width}x{window_height} at position ({window_x}, {window_y})")
+
+def setup_browser(headless=None, block_resources=None, eager=None, corner=None):
+    """Launch undetected Chrome.
+
+    headless defaults to True only when there is no display (e.g. Linux
+    workers). block_resources (CDP-blocks BLOCKED_URL_PATTERNS and disables
+    images) and eager (return from page loads at DOMContentLoaded) default to
+    the headless setting. corner is one of WINDOW_CORNERS and only applies to
+    headed browsers; None leaves the window where Chrome puts it.
+    """
+    if headless is None:
+        headless = not has_display()
+    if block_resources is None:
+        block_resources = headless
+    if eager is None:
+        eager = headless
+    logging.info(f"Setting up browser (headless={headless}, block_resources={block_resources}, eager={eager})...")
+    options = uc.ChromeOptions()
+    options.add_argument('--disable-extensions')
+    options.add_argument('--disable-gpu')
+    if headless:
+        options.add_argument('--window-size=1366,900')
+        if sys.platform.startswith('linux'):
+            options.add_argument('--no-sandbox')
+            options.add_argument('--disable-dev-shm-usage')
+    if block_resources:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+    if eager:
+        options.page_load_strategy = 'eager'
+    driver = uc.Chrome(options=options, headless=headless, use_subprocess=True)
+    logging.info("Browser launched.")
+    # Remembered so tabs opened later (DetailTab) get the same blocking
+    driver.block_resources = block_resources
+    if block_resources:
+        block_resources_in_tab(driver)
+    if corner and not headless:
+        try:
+            place_window(driver, corner)
+        except Exception as e:
+            logging.warning(f"Could not position browser window: {e}")
+    return driver
+
+
+class DetailTab:
+    """Second browser tab used for listing detail pages.
+
+    The search results stay loaded in the original tab, so the scrapers no
+    longer reload the results page after every listing and pagination keeps
+    its state. Use as a context manager; the tab is closed on exit.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.results_handle = driver.current_window_handle
+        self.handle = None
+
+    def get(self, url):
+        """Load url in the detail tab, opening the tab on first use."""
+        if self.handle is None:
+            self.driver.switch_to.new_window('tab')
+            self.handle = self.driver.current_window_handle
+            if getattr(self.driver, 'block_resources', False):
+                block_resources_in_tab(self.driver)
+        elif self.driver.current_window_handle != self.handle:
+            self.driver.switch_to.window(self.handle)
+        self.driver.get(url)
+
+    def back_to_results(self):
+        """Switch the driver back to the untouched search results tab."""
+        if self.driver.current_window_handle != self.results_handle:
+            self.driver.switch_to.window(self.results_handle)
+
+    def close(self):
+        if self.handle is not None:
+            try:
+                self.driver.switch_to.window(self.handle)
+                self.driver.close()
+            except Exception as e:
+                logging.debug(f"Could not close detail tab: {e}")
+            self.handle = None
+        try:
+            self.driver.switch_to.window(self.results_handle)
+        except Exception as e:
+            logging.debug(f"Could not switch back to results tab: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,77 @@
+import os
+import json
+import logging
+from datetime import datetime, timezone
+
+CHECKPOINT_DIR = 'checkpoints'
+
+class Checkpoint:
+    """Durable position of a scraper run: zipcode, results page and card index.
+
+    One JSON file per source and shard, rewritten atomically. A position is
+    only written while the listing store has nothing buffered, so the file
+    never claims cards whose rows could still be lost; after a crash at most
+    the cards since the last flush are visited again (and mostly skipped by
+    the seen index). The file is removed when the run completes.
+    """
+
+    def __init__(self, source, zipcodes, shard=None, directory=CHECKPOINT_DIR):
+        label = f"shard{shard[0]}of{shard[1]}" if shard else 'all'
+        self.path = os.path.join(directory, f"{source}_{label}.json")
+        self.state = {'zipcodes': list(zipcodes), 'done': [], 'zipcode': None, 'page': 1, 'card': 0, 'listings': 0}
+
+    def resume(self):
+        """Zipcodes left to scrape and (page, card, listings) to continue the first one at.
+
+        Without a usable checkpoint (none, or one for another zipcode list)
+        this is every zipcode from the start.
+        """
+        start = (1, 0, 0)
+        if not os.path.exists(self.path):
+            logging.info(f"No checkpoint at {self.path}, starting from the first zipcode.")
+            return list(self.state['zipcodes']), start
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read checkpoint {self.path} ({e}), starting from the first zipcode.")
+            return list(self.state['zipcodes']), start
+        if saved.get('zipcodes') != self.state['zipcodes']:
+            logging.warning(f"Checkpoint {self.path} is for other zipcodes, starting from the first zipcode.")
+            return list(self.state['zipcodes']), start
+        self.state.update(saved)
+        remaining = [z for z in self.state['zipcodes'] if z not in self.state['done']]
+        if remaining and remaining[0] == self.state['zipcode']:
+            start = (self.state['page'], self.state['card'], self.state['listings'])
+        logging.info(f"Resuming from {self.path}: {len(remaining)} zipcodes left, "
+                     f"{remaining[0] if remaining else '-'} at page {start[0]}, card {start[1]}.")
+        return remaining, start
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.state['saved_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_file, self.path)
+
+    def position(self, zipcode, page, card, listings, store):
+        """Record that zipcode is done up to card (0-based, exclusive) of results page page.
+
+        Written to disk only when store has no unflushed rows.
+        """
+        self.state.update(zipcode=zipcode, page=page, card=card, listings=listings)
+        if not store.buffer:
+            self.save()
+
+    def finish(self, zipcode, store):
+        """Mark zipcode as completely scraped, flushing store first."""
+        store.flush()
+        self.state['done'].append(zipcode)
+        self.state.update(zipcode=None, page=1, card=0, listings=0)
+        self.save()
+
+    def clear(self):
+        """The run completed, a later --resume starts over."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,102 @@
+import os
+import argparse
+import logging
+import pandas as pd
+from normalize import normalize
+
+# Raw results files cleaned by the pipeline, one per scraper
+RESULTS_FILES = ['zillow_results.csv', 'realtor_results.csv', 'redfin_results.csv']
+
+CHUNK_SIZE = 100000
+
+def cleaned_path(csv_file):
+    return csv_file.replace('.csv', '_cleaned.csv')
+
+def rejected_path(csv_file):
+    return csv_file.replace('.csv', '_rejected.csv')
+
+def reject_reasons(df):
+    """Series naming the first failed check of each row ('' for valid rows).
+
+    A row is valid with a 5-digit ZIPCODE, an empty or alphanumeric/dash MLS
+    (not the literal 'source') and a positive numeric PRICE ('$' and ','
+    allowed).
+    Missing columns are not checked.
+    """
+    reasons = pd.Series('', index=df.index, dtype=object)
+    if 'ZIPCODE' in df.columns:
+        bad = ~df['ZIPCODE'].str.strip().str.fullmatch(r'\d{5}')
+        reasons = reasons.mask(reasons.eq('') & bad, 'ZIPCODE')
+    if 'MLS' in df.columns:
+        # Listings without an MLS are kept; the compiler matches them by address
+        mls = df['MLS'].str.strip()
+        bad = (mls.ne('') & ~mls.str.fullmatch(r'[A-Za-z0-9\-]+')) | mls.str.lower().eq('source')
+        reasons = reasons.mask(reasons.eq('') & bad, 'MLS')
+    if 'PRICE' in df.columns:
+        price = df['PRICE'].str.replace(r'[$,]', '', regex=True).str.strip()
+        numeric = pd.to_numeric(price.where(price.str.fullmatch(r'\d+(\.\d+)?')), errors='coerce')
+        bad = ~(numeric > 0)
+        reasons = reasons.mask(reasons.eq('') & bad, 'PRICE')
+    return reasons
+
+def clean_results(csv_file, log_file=None, chunk_size=CHUNK_SIZE):
+    """Split csv_file into *_cleaned.csv and a *_rejected.csv quarantine file.
+
+    Kept rows get the typed normalize.NORMALIZED_COLUMNS. The raw file is
+    processed in chunks and both outputs are streamed to temporary files that
+    replace the previous ones once complete. Rejected rows keep all their
+    columns plus REJECT_REASON. Returns (kept, rejected)
+    row counts, or None when csv_file does not exist.
+    """
+    log_file = log_file or csv_file.replace('_results.csv', '_scraper_cleaner.log')
+    if not os.path.exists(csv_file):
+        print(f"{csv_file} not found for cleaning.")
+        return None
+    outputs = {'kept': cleaned_path(csv_file), 'rejected': rejected_path(csv_file)}
+    tmp_files = {name: f"{path}.{os.getpid()}.tmp" for name, path in outputs.items()}
+    counts = {'kept': 0, 'rejected': 0}
+    try:
+        # Everything is read as text so values are written back exactly as scraped
+        chunks = pd.read_csv(csv_file, dtype=str, keep_default_na=False, chunksize=chunk_size)
+        for index, chunk in enumerate(chunks):
+            reasons = reject_reasons(chunk)
+            valid = reasons.eq('')
+            rejected = chunk[~valid].assign(REJECT_REASON=reasons[~valid])
+            # Typed columns are computed once here for every downstream reader
+            kept = normalize(chunk[valid])
+            for name, part in (('kept', kept), ('rejected', rejected)):
+                part.to_csv(tmp_files[name], mode='w' if index == 0 else 'a', header=index == 0, index=False)
+                counts[name] += len(part)
+        if not os.path.exists(tmp_files['kept']):
+            # Header-only input: still replace the outputs so they are not stale
+            header = pd.read_csv(csv_file, dtype=str, nrows=0)
+            normalize(header).to_csv(tmp_files['kept'], index=False)
+            header.assign(REJECT_REASON='').to_csv(tmp_files['rejected'], index=False)
+        for name, path in outputs.items():
+            os.replace(tmp_files[name], path)
+    finally:
+        for tmp_file in tmp_files.values():
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+    with open(log_file, 'a', encoding='utf-8') as logf:
+        if counts['rejected'] > 0:
+            logf.write(f"{counts['rejected']} rows deleted from {csv_file}, see {outputs['rejected']}.\n")
+    print(f"{counts['rejected']} rows deleted from {csv_file}. Cleaned file saved as {outputs['kept']}.")
+    logging.info(f"Cleaned {csv_file}: kept {counts['kept']}, quarantined {counts['rejected']} in {outputs['rejected']}.")
+    return counts['kept'], counts['rejected']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean the raw scraper results into *_cleaned.csv files.")
+    parser.add_argument('files', nargs='*', default=RESULTS_FILES,
+                        help="Raw results CSVs to clean (default: all three sources)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        filename='cleaning.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    for csv_file in args.files:
+        clean_results(csv_file)
+
+if __name__ == "__main__":
+    main()
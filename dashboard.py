@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import os
 import subprocess
+from normalize import NORMALIZED_COLUMNS
+from main_listing import load_listings, MAIN_LISTING_PARQUET, KEY_COLUMNS
 
 st.set_page_config(page_title="Listings Dashboard", layout="wide")
 st.title("Real Estate Listings Dashboard")
@@ -9,12 +11,9 @@ st.title("Real Estate Listings Dashboard")
 csv_file = 'main_listing.csv'
 orch_file = 'orchestrator.py'
 
-# Load data
+# Listings are loaded below, only the rows matching the sidebar filters
 
-
-if os.path.exists(csv_file):
-    df = pd.read_csv(csv_file)
-else:
+if not os.path.exists(csv_file) and not os.path.exists(MAIN_LISTING_PARQUET):
     st.warning(f"{csv_file} not found.")
 
 # Trigger orchestrator
@@ -31,7 +30,7 @@ if st.button("Get Leads"):
         st.error(f"{orch_file} not found.")
 
 # Only show the filtered view
-if os.path.exists(csv_file):
+if os.path.exists(csv_file) or os.path.exists(MAIN_LISTING_PARQUET):
     st.sidebar.header("Filters")
     zipcodes_list = [
         '33009', '33019', '33119', '33128', '33129', '33130',
@@ -41,85 +40,24 @@ if os.path.exists(csv_file):
     zipcode = st.sidebar.selectbox("Zipcode", options=["Show All"] + zipcodes_list)
     source = st.sidebar.selectbox("Source", options=['Show All', 'ZLW', 'RLTR', 'RDFN'])
     sort_option = st.sidebar.selectbox("Sort By", options=["Newest", "Oldest", "Highest Price", "Lowest Price"])
-    filtered = df.copy()
-    if zipcode:
-        if zipcode != "Show All":
-            filtered = filtered[filtered['ZIPCODE'].astype(str) == zipcode]
-    if source and source != 'Show All':
-        filtered = filtered[filtered['SOURCE'] == source]
-    # Sorting logic
+    # Zipcode and source filters are pushed down into the Parquet read
+    filtered = load_listings(
+        zipcode=zipcode if zipcode and zipcode != "Show All" else None,
+        source=source if source and source != 'Show All' else None,
+    )
+    # Sorting logic, on the typed columns computed at ingest
     if sort_option == "Newest":
-        if 'DAYS_ON_MARKET' in filtered.columns:
-            def days_on_market_to_hours(val):
-                if pd.isna(val):
-                    return float('inf')
-                val = str(val).strip().lower()
-                if 'hour' in val:
-                    try:
-                        return int(val.split()[0])
-                    except:
-                        return float('inf')
-                elif 'day' in val:
-                    try:
-                        return int(val.split()[0]) * 24
-                    except:
-                        return float('inf')
-                else:
-                    return float('inf')
-            filtered = filtered.copy()
-            filtered['DAYS_ON_MARKET_HOURS'] = filtered['DAYS_ON_MARKET'].apply(days_on_market_to_hours)
-            filtered = filtered.sort_values(by='DAYS_ON_MARKET_HOURS', ascending=True)
-            filtered = filtered.drop(columns=['DAYS_ON_MARKET_HOURS'])
+        filtered = filtered.sort_values(by='HOURS_ON_MARKET', ascending=True, na_position='last')
     elif sort_option == "Oldest":
-        if 'DAYS_ON_MARKET' in filtered.columns:
-            def days_on_market_to_hours(val):
-                if pd.isna(val):
-                    return float('inf')
-                val = str(val).strip().lower()
-                if 'hour' in val:
-                    try:
-                        return int(val.split()[0])
-                    except:
-                        return float('inf')
-                elif 'day' in val:
-                    try:
-                        return int(val.split()[0]) * 24
-                    except:
-                        return float('inf')
-                else:
-                    return float('inf')
-            filtered = filtered.copy()
-            filtered['DAYS_ON_MARKET_HOURS'] = filtered['DAYS_ON_MARKET'].apply(days_on_market_to_hours)
-            filtered = filtered.sort_values(by='DAYS_ON_MARKET_HOURS', ascending=False)
-            filtered = filtered.drop(columns=['DAYS_ON_MARKET_HOURS'])
+        filtered = filtered.sort_values(by='HOURS_ON_MARKET', ascending=False, na_position='last')
     elif sort_option == "Highest Price":
-        if 'PRICE' in filtered.columns:
-            filtered = filtered.copy()
-            def price_to_number(val):
-                try:
-                    val = str(val).replace('$', '').replace(',', '').strip()
-                    return float(val)
-                except:
-                    return float('-inf')
-            filtered['PRICE_NUM'] = filtered['PRICE'].apply(price_to_number)
-            filtered = filtered.sort_values(by='PRICE_NUM', ascending=False)
-            filtered = filtered.drop(columns=['PRICE_NUM'])
+        filtered = filtered.sort_values(by='PRICE_NUM', ascending=False, na_position='last')
     elif sort_option == "Lowest Price":
-        if 'PRICE' in filtered.columns:
-            filtered = filtered.copy()
-            def price_to_number(val):
-                try:
-                    val = str(val).replace('$', '').replace(',', '').strip()
-                    return float(val)
-                except:
-                    return float('inf')
-            filtered['PRICE_NUM'] = filtered['PRICE'].apply(price_to_number)
-            filtered = filtered.sort_values(by='PRICE_NUM', ascending=True)
-            filtered = filtered.drop(columns=['PRICE_NUM'])
+        filtered = filtered.sort_values(by='PRICE_NUM', ascending=True, na_position='last')
     st.subheader("Listings")
     # Make URLs clickable
     if not filtered.empty:
-        display_df = filtered.copy()
+        display_df = filtered.drop(columns=NORMALIZED_COLUMNS + KEY_COLUMNS + ['SCRAPED_AT'], errors='ignore')
         # Rename headers: replace '_' with space
         display_df.columns = [col.replace('_', ' ') for col in display_df.columns]
         # Move Agent Phone and Email columns beside Agent Name
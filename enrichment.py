@@ -0,0 +1,161 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from agent_cache import AgentEmailCache, agent_id, agent_key
+
+# Minimum seconds between two searches against nestfully.com, across all workers
+MIN_INTERVAL = float(os.environ.get('NESTFULLY_MIN_INTERVAL', '1'))
+
+class RateLimiter:
+    """Spaces wait() returns from all threads at least min_interval seconds apart."""
+
+    def __init__(self, min_interval=MIN_INTERVAL):
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_at)
+            self.next_at = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+def pending_agents(agents, cache):
+    """One (name, phone) pair per agent_id from agents that the cache cannot answer, in order.
+
+    Name variants of the same agent (middle names, case, punctuation) and
+    their different phones are searched once.
+    """
+    pending = {}
+    for name, phone in agents:
+        name = str(name or '').strip()
+        phone = str(phone or '').strip()
+        if not name:
+            continue
+        key = agent_id(name)
+        if key not in pending and cache.lookup(name, phone) is None:
+            pending[key] = (name, phone)
+    return list(pending.values())
+
+class EnrichmentPool:
+    """Enrichment workers in threads, draining a bounded queue of agents.
+
+    open_worker(limiter) opens one worker, an object with lookup(name, phone)
+    returning (email or '', the name split pattern that found it or '')
+    and close(); it should call limiter.wait() before each request to the
+    site. Workers are opened one at a time from their own threads.
+    submit() skips agents that were already submitted or that the cache
+    can answer, and blocks while the queue is full unless told not to, in
+    which case the agent waits in a backlog. Every result is recorded in
+    the cache as soon as it is known.
+    """
+
+    def __init__(self, open_worker, workers=1, cache=None, limiter=None, queue_size=100):
+        self.open_worker = open_worker
+        self.cache = cache or AgentEmailCache()
+        self.limiter = limiter or RateLimiter()
+        self.work = queue.Queue(maxsize=queue_size)
+        # Agents submitted without blocking while the queue was full, in order
+        self.backlog = deque()
+        self.submitted = set()
+        self.results = {}
+        # Browser launches patch and start chromedriver, do them one at a time
+        self.open_lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._drain, args=(number,), daemon=True) for number in range(1, workers + 1)]
+        for thread in self.threads:
+            thread.start()
+
+    def _put(self, item):
+        # Give up instead of blocking forever when no worker is left to take it
+        while any(thread.is_alive() for thread in self.threads):
+            try:
+                self.work.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _flush_backlog(self):
+        while self.backlog:
+            try:
+                self.work.put_nowait(self.backlog[0])
+            except queue.Full:
+                return
+            self.backlog.popleft()
+
+    def submit(self, name, phone='', block=True):
+        """Queue the agent for a lookup; False when it is not needed or no worker is running.
+
+        With block False a full queue does not hold up the caller: the agent
+        is kept in the backlog, which is queued as the workers make room
+        (on later submits) and by close().
+        """
+        name = str(name or '').strip()
+        phone = str(phone or '').strip()
+        key = agent_id(name)
+        if not key or key in self.submitted or self.cache.lookup(name, phone) is not None:
+            return False
+        self.submitted.add(key)
+        if block:
+            return self._put((name, phone))
+        self.backlog.append((name, phone))
+        self._flush_backlog()
+        return True
+
+    def _drain(self, number):
+        try:
+            with self.open_lock:
+                worker = self.open_worker(self.limiter)
+        except Exception as e:
+            logging.error(f"Enrichment worker {number} could not start: {e}")
+            return
+        try:
+            while True:
+                item = self.work.get()
+                if item is None:
+                    break
+                name, phone = item
+                try:
+                    email, split_pattern = worker.lookup(name, phone)
+                except Exception as e:
+                    # Not recorded, so the agent is tried again on the next run
+                    logging.error(f"Worker {number} failed to look up {name}: {e}")
+                    continue
+                self.cache.record(name, phone, email, split_pattern)
+                self.results[agent_key(name, phone)] = email
+                logging.info(f"Worker {number}: {name} -> {email or 'no email'} ({len(self.results)}/{len(self.submitted)})")
+        finally:
+            worker.close()
+
+    def close(self):
+        """Wait for the queued agents to be looked up, stop the workers and return {agent key: email}."""
+        while self.backlog and self._put(self.backlog[0]):
+            self.backlog.popleft()
+        for _ in self.threads:
+            self._put(None)
+        for thread in self.threads:
+            thread.join()
+        left = self.work.qsize() + len(self.backlog)
+        if left:
+            logging.warning(f"{left} agents were left unsearched, no enrichment worker was running.")
+        return self.results
+
+def run_enrichment(agents, open_worker, workers=1, cache=None, limiter=None):
+    """Look up the email of each agent not in the cache with an EnrichmentPool of workers.
+
+    Returns {agent key: email} for the agents looked up in this run.
+    """
+    cache = cache or AgentEmailCache()
+    pending = pending_agents(agents, cache)
+    logging.info(f"{len(pending)} agents to look up on Nestfully with {workers} worker(s).")
+    if not pending:
+        return {}
+    pool = EnrichmentPool(open_worker, min(workers, len(pending)), cache, limiter)
+    for name, phone in pending:
+        pool.submit(name, phone)
+    return pool.close()
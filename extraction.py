@@ -0,0 +1,204 @@
+import logging
+from functools import lru_cache
+from lxml import etree, html as lxml_html
+
+# Evaluates a whole extraction spec inside the page so a detail page costs one
+# WebDriver round trip instead of one find_element call per field.
+EXTRACT_FIELDS_JS = """
+var fields = arguments[0], multi = arguments[1];
+function nodes(selector) {
+    if (selector[0] === 'xpath') {
+        var result = document.evaluate(selector[1], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var list = [];
+        for (var i = 0; i < result.snapshotLength; i++) {
+            list.push(result.snapshotItem(i));
+        }
+        return list;
+    }
+    return Array.prototype.slice.call(document.querySelectorAll(selector[1]));
+}
+function text(node) {
+    return ((node.innerText !== undefined ? node.innerText : node.textContent) || '').trim();
+}
+var out = {};
+Object.keys(fields).forEach(function (field) {
+    out[field] = '';
+    var selectors = fields[field];
+    for (var i = 0; i < selectors.length; i++) {
+        var found;
+        try {
+            found = nodes(selectors[i]);
+        } catch (e) {
+            continue;
+        }
+        if (found.length) {
+            out[field] = text(found[0]);
+            return;
+        }
+    }
+});
+Object.keys(multi).forEach(function (field) {
+    try {
+        out[field] = nodes(multi[field]).map(text);
+    } catch (e) {
+        out[field] = [];
+    }
+});
+return out;
+"""
+
+@lru_cache(maxsize=4)
+def parse_html(html):
+    """Parse page HTML with lxml; cached so one fetched page is only parsed once."""
+    return lxml_html.fromstring(html)
+
+def _html_nodes(tree, selector):
+    by, expr = selector
+    if by == 'xpath':
+        return [node for node in tree.xpath(expr) if hasattr(node, 'text_content')]
+    return tree.cssselect(expr)
+
+# Text under a node the way innerText sees it: without script and style contents,
+# which on the HTTP path would otherwise expose embedded JSON to the field regexes
+VISIBLE_TEXT = etree.XPath('.//text()[not(ancestor::script) and not(ancestor::style)]')
+
+def _visible_text(node):
+    return ''.join(VISIBLE_TEXT(node))
+
+def _html_text(node):
+    return ' '.join(_visible_text(node).split())
+
+def _extract_fields_html(html, fields, multi):
+    tree = parse_html(html)
+    result = {}
+    for field, selectors in fields.items():
+        result[field] = ''
+        for selector in selectors:
+            try:
+                found = _html_nodes(tree, selector)
+            except Exception:
+                continue
+            if found:
+                result[field] = _html_text(found[0])
+                break
+    for field, selector in multi.items():
+        try:
+            result[field] = [_html_text(node) for node in _html_nodes(tree, selector)]
+        except Exception:
+            result[field] = []
+    return result
+
+def extract_fields(page, fields, multi=None):
+    """Extract all fields of a page in one pass.
+
+    ``page`` is either a WebDriver, in which case the spec runs in a single
+    execute_script call, or the page HTML (e.g. from fetcher.HttpFetcher), which
+    is parsed with lxml. ``fields`` maps a field name to a list of
+    (By, selector) fallbacks; the text of the first element matched by the first
+    matching selector is returned, or '' when no selector matches. ``multi`` maps
+    a field name to one (By, selector) whose matches are all returned as a list
+    of texts.
+    """
+    spec = {field: [list(selector) for selector in selectors] for field, selectors in fields.items()}
+    multi_spec = {field: list(selector) for field, selector in (multi or {}).items()}
+    if isinstance(page, str):
+        return _extract_fields_html(page, spec, multi_spec)
+    try:
+        result = page.execute_script(EXTRACT_FIELDS_JS, spec, multi_spec) or {}
+    except Exception as e:
+        logging.error(f"Field extraction script failed: {e}")
+        result = {}
+    for field in spec:
+        result.setdefault(field, '')
+    for field in multi_spec:
+        result.setdefault(field, [])
+    return result
+
+def page_source(page):
+    """HTML of a page given either a WebDriver or the HTML itself."""
+    return page if isinstance(page, str) else page.page_source
+
+def page_text(page):
+    """Visible-ish text of the page body, from a WebDriver or from HTML."""
+    if isinstance(page, str):
+        body = parse_html(page).find('.//body')
+        return _visible_text(body) if body is not None else ''
+    return page.execute_script("return document.body ? document.body.innerText : '';") or ''
+
+# Scrolls the results list inside the page until no new cards show up and
+# returns every card's detail link in a single async call.
+HARVEST_CARDS_JS = """
+var cardSelector = arguments[0], linkSelector = arguments[1], settleMs = arguments[2], maxSteps = arguments[3];
+var done = arguments[arguments.length - 1];
+function all(selector) {
+    return selector ? Array.prototype.slice.call(document.querySelectorAll(selector)) : [];
+}
+function cards() {
+    var found = all(cardSelector);
+    return found.length ? found : all(linkSelector);
+}
+function scroller() {
+    var first = cards()[0];
+    for (var el = first && first.parentElement; el; el = el.parentElement) {
+        var overflow = getComputedStyle(el).overflowY;
+        if ((overflow === 'auto' || overflow === 'scroll') && el.scrollHeight > el.clientHeight) {
+            return el;
+        }
+    }
+    return document.scrollingElement || document.documentElement;
+}
+var seen = {}, out = [];
+function collect() {
+    cards().forEach(function (card) {
+        var link = card.matches(linkSelector) ? card : card.querySelector(linkSelector);
+        if (!link || !link.href || seen[link.href]) {
+            return;
+        }
+        seen[link.href] = true;
+        out.push(link.href);
+    });
+}
+var steps = 0, stable = 0, lastCount = -1;
+function step() {
+    collect();
+    var el = scroller();
+    var before = el.scrollTop;
+    el.scrollTop = before + Math.max(el.clientHeight * 0.8, 200);
+    var atBottom = el.scrollTop === before || el.scrollTop + el.clientHeight >= el.scrollHeight - 2;
+    setTimeout(function () {
+        collect();
+        stable = (atBottom && out.length === lastCount) ? stable + 1 : 0;
+        lastCount = out.length;
+        steps += 1;
+        if (stable >= 2 || steps >= maxSteps) {
+            done(out);
+        } else {
+            step();
+        }
+    }, settleMs);
+}
+step();
+"""
+
+def harvest_cards(driver, card_selector, link_selector, settle_ms=400, max_steps=60, timeout=90):
+    """Scroll a lazy-loaded results list and return its cards' links in one async script call.
+
+    Scrolling stops once the list is at the bottom and the number of cards has
+    stopped growing. Returns the detail hrefs, deduplicated in page order.
+    Cards without a link matching link_selector are skipped; when card_selector
+    matches nothing the links themselves are used as cards.
+    """
+    try:
+        driver.set_script_timeout(timeout)
+        hrefs = driver.execute_async_script(HARVEST_CARDS_JS, card_selector, link_selector, settle_ms, max_steps)
+    except Exception as e:
+        logging.error(f"Card harvesting script failed: {e}")
+        return []
+    return hrefs or []
+
+def maps_url(address):
+    """Google Maps search link for an address, or '' if there is no address."""
+    if not address:
+        return ''
+    maps_query = address.replace(' ', '+')
+    return f"https://www.google.com/maps/search/?api=1&query={maps_query}"
@@ -0,0 +1,113 @@
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from waits import wait_for_any
+
+# Lower-cased snippets that identify a bot wall / challenge page instead of a listing
+BOT_WALL_MARKERS = (
+    'px-captcha',
+    'captcha-container',
+    'press & hold',
+    'access to this page has been denied',
+    'pardon our interruption',
+    'are you a robot',
+    'cf-chl-',
+)
+BOT_WALL_STATUSES = {403, 405, 429, 503}
+
+DEFAULT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Connection': 'keep-alive',
+}
+
+def is_bot_wall(status_code, html, markers=BOT_WALL_MARKERS):
+    """True when a response is a block/challenge page rather than real content."""
+    if status_code in BOT_WALL_STATUSES:
+        return True
+    head = (html or '')[:200000].lower()
+    return any(marker in head for marker in markers)
+
+class HttpFetcher:
+    """Pooled keep-alive HTTP client that reuses a warmed-up browser's cookies.
+
+    fetch_html returns None whenever the page has to be loaded in the real
+    browser instead (network error, bad status or bot wall). After
+    max_blocked consecutive bot walls it stops trying until borrow_session
+    is called again with fresh cookies.
+    """
+
+    def __init__(self, pool_size=10, timeout=15, max_blocked=3, markers=BOT_WALL_MARKERS):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.timeout = timeout
+        self.max_blocked = max_blocked
+        self.markers = markers
+        self.blocked = 0
+        self.stats = {'http': 0, 'browser': 0}
+
+    @property
+    def enabled(self):
+        return self.blocked < self.max_blocked
+
+    def borrow_session(self, driver):
+        """Copy the user agent and cookies of a browser that has already loaded the site."""
+        try:
+            user_agent = driver.execute_script("return navigator.userAgent;")
+            if user_agent:
+                self.session.headers['User-Agent'] = user_agent
+            for cookie in driver.get_cookies():
+                self.session.cookies.set(cookie['name'], cookie['value'],
+                                         domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+            self.blocked = 0
+        except Exception as e:
+            logging.warning(f"Could not borrow browser session for HTTP fetching: {e}")
+
+    def fetch_html(self, url, referer=None):
+        """GET url over the pooled session; None means 'use the browser for this one'."""
+        if not self.enabled:
+            return None
+        headers = {'Referer': referer} if referer else None
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            logging.info(f"HTTP fetch failed for {url}: {e}")
+            return None
+        if is_bot_wall(response.status_code, response.text, self.markers):
+            self.blocked += 1
+            logging.info(f"HTTP fetch hit a bot wall ({response.status_code}) for {url}; "
+                         f"{self.blocked}/{self.max_blocked} before falling back to the browser only.")
+            return None
+        if response.status_code != 200:
+            logging.info(f"HTTP fetch got status {response.status_code} for {url}")
+            return None
+        self.blocked = 0
+        return response.text
+
+def load_listing(driver, fetcher, url, extract, required=('MLS', 'PRICE', 'ADDRESS'), referer=None, open_page=None, ready=None):
+    """Extract a listing over HTTP when possible, loading it in the browser otherwise.
+
+    extract(page) receives either the fetched HTML or the driver (after
+    open_page(url), driver.get by default) and returns the row dict. An HTTP
+    page whose row misses one of the required fields is treated as needing
+    JavaScript and is reloaded in the browser. ready is a list of (By,
+    selector) locators for the detail page's key content; with eager page
+    loads the browser returns at DOMContentLoaded, so extraction waits for
+    one of them to render first.
+    """
+    if fetcher is not None:
+        html = fetcher.fetch_html(url, referer=referer)
+        if html is not None:
+            data = extract(html)
+            if all(data.get(field) for field in required):
+                fetcher.stats['http'] += 1
+                return data
+            logging.info(f"HTTP page for {url} is missing listing data, loading it in the browser.")
+        fetcher.stats['browser'] += 1
+    (open_page or driver.get)(url)
+    if ready:
+        wait_for_any(driver, ready)
+    return extract(driver)
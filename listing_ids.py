@@ -0,0 +1,73 @@
+import re
+import math
+import hashlib
+from urllib.parse import urlsplit
+
+# Stable listing ID in each source's detail URL
+ID_PATTERNS = [
+    ('ZLW', 'zillow.com', re.compile(r'/(\d+)_zpid')),
+    ('RLTR', 'realtor.com', re.compile(r'_(M\d+-\d+)(?:[/?#]|$)')),
+    ('RDFN', 'redfin.com', re.compile(r'/home/(\d+)')),
+]
+
+def canonical_id(url):
+    """Stable ID of a listing URL, e.g. 'ZLW:12345678', 'RLTR:M64907-12238', 'RDFN:42424242'.
+
+    Query strings, fragments and slug changes do not affect the ID. URLs that
+    do not match a known source fall back to host and path.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for source, domain, pattern in ID_PATTERNS:
+        if host.endswith(domain):
+            match = pattern.search(parts.path)
+            if match:
+                return f"{source}:{match.group(1)}"
+    return f"{host}{parts.path.rstrip('/')}"
+
+def id_hash(listing_id):
+    """64-bit integer hash of a canonical ID, for the in-memory seen sets."""
+    return int.from_bytes(hashlib.blake2b(listing_id.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+class SeenSet:
+    """Exact set of seen listing IDs, stored as 64-bit hashes instead of URL strings."""
+
+    def __init__(self, ids=()):
+        self.hashes = {id_hash(listing_id) for listing_id in ids}
+
+    def add(self, listing_id):
+        self.hashes.add(id_hash(listing_id))
+
+    def __contains__(self, listing_id):
+        return id_hash(listing_id) in self.hashes
+
+    def __len__(self):
+        return len(self.hashes)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over canonical IDs.
+
+    Never gives false negatives; false positives occur at about error_rate
+    once capacity IDs have been added, so a hit must be confirmed elsewhere.
+    """
+
+    def __init__(self, capacity, error_rate=0.001, ids=()):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        for listing_id in ids:
+            self.add(listing_id)
+
+    def _positions(self, listing_id):
+        digest = hashlib.blake2b(listing_id.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, listing_id):
+        for pos in self._positions(listing_id):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, listing_id):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(listing_id))
@@ -1,5 +1,16 @@
 import pandas as pd
 import os
+import io
+import json
+import hashlib
+import argparse
+from normalize import normalize, read_listings, NORMALIZED_COLUMNS
+from cleaning import reject_reasons
+from main_listing import write_listings, load_listings, read_listings_where, listing_columns, order_columns, partitioned, export_csv, MAIN_LISTING_CSV, MAIN_LISTING_PARQUET
+from address import address_keys
+from listing_ids import canonical_id
+from agent_cache import attach_emails
+from agents import agent_ids, build_agents, write_agents, load_agents, AGENTS_CSV
 
 # Paths to cleaned CSVs
 
@@ -9,24 +20,366 @@ csv_sources = {
 	'redfin_results_cleaned.csv': 'RDFN'
 }
 
-# Read and concatenate all available cleaned CSVs, adding SOURCE column
-dfs = []
-for file, source in csv_sources.items():
-	if os.path.exists(file):
-		df = pd.read_csv(file)
+# Per-source watermarks of the last compile
+STATE_FILE = 'compiler_state.json'
+
+# Bytes before a watermark that are hashed to detect a rewritten source file
+TAIL_BYTES = 256
+
+# State key recording how AGENT_IDs were built; tables compiled while the
+# phone was part of them are recompiled with name-only IDs
+AGENT_ID_FORMAT = 'agent_id_format'
+AGENT_ID_VERSION = 'name'
+
+# State flag set when main_listing.parquet was updated without main_listing.csv
+# and agents.csv (see compile_rows); the next compile_listings exports them
+EXPORTS_STALE = 'exports_stale'
+
+def load_state():
+	if os.path.exists(STATE_FILE):
+		with open(STATE_FILE, 'r', encoding='utf-8') as f:
+			return json.load(f)
+	return {}
+
+def save_state(state):
+	tmp_file = f"{STATE_FILE}.{os.getpid()}.tmp"
+	with open(tmp_file, 'w', encoding='utf-8') as f:
+		json.dump(state, f, indent=2)
+	os.replace(tmp_file, STATE_FILE)
+
+def _tail_hash(f, offset):
+	start = max(offset - TAIL_BYTES, 0)
+	f.seek(start)
+	return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+def read_new_rows(file, mark):
+	"""Rows of a cleaned CSV after its watermark, and the new watermark.
+
+	A watermark is the byte offset just past the last compiled row, plus the
+	header and a hash of the bytes before the offset. If the file no longer
+	matches (it was rebuilt with different content), None is returned as
+	the rows so the caller can do a full rebuild.
+	"""
+	with open(file, 'rb') as f:
+		header = f.readline()
+		if mark:
+			size = os.fstat(f.fileno()).st_size
+			if mark.get('header') != header.decode('utf-8') or size < mark['offset'] or _tail_hash(f, mark['offset']) != mark['tail']:
+				return None, None
+			offset = mark['offset']
+		else:
+			offset = len(header)
+		f.seek(offset)
+		data = f.read()
+		# Only consume complete lines
+		data = data[:data.rfind(b'\n') + 1]
+		new_offset = offset + len(data)
+		new_mark = {'header': header.decode('utf-8'), 'offset': new_offset, 'tail': _tail_hash(f, new_offset)}
+	if not data:
+		return read_listings(io.BytesIO(header)), new_mark
+	return read_listings(io.BytesIO(header + data)), new_mark
+
+# Source order per field for MLS numbers listed by several sources; the
+# first source with a non-empty value wins. Fields not listed use 'default'.
+# Overridable with a source_priority.json file of the same shape.
+SOURCE_PRIORITY = {
+	'default': ['ZLW', 'RLTR', 'RDFN'],
+	# Zillow and Redfin show the agent's own number, Realtor.com the office line
+	'AGENT_PHONE': ['ZLW', 'RDFN', 'RLTR'],
+	'DAYS_ON_MARKET': ['RDFN', 'ZLW', 'RLTR'],
+}
+PRIORITY_FILE = 'source_priority.json'
+
+# Typed columns are taken from the same row as the field they are parsed from
+DERIVED_FIELDS = {
+	'PRICE': ['PRICE_NUM'],
+	'BEDS': ['BEDS_NUM'],
+	'BATHS': ['BATHS_NUM'],
+	'SQFT': ['SQFT_NUM'],
+	'DAYS_ON_MARKET': ['HOURS_ON_MARKET', 'LISTED_AT'],
+	'AGENT_PHONE': ['PHONE_E164'],
+	'ADDRESS': ['ADDRESS_KEY'],
+	'AGENT_NAME': ['AGENT_ID'],
+}
+
+# Placeholders the sites show for a missing value
+EMPTY_VALUES = ['', '-', '--', '\u2014', 'nan']
+
+def load_priority():
+	priority = dict(SOURCE_PRIORITY)
+	if os.path.exists(PRIORITY_FILE):
+		with open(PRIORITY_FILE, 'r', encoding='utf-8') as f:
+			priority.update(json.load(f))
+	return priority
+
+def field_sources(df, field):
+	"""Source of each row's value for field: its FIELD_SOURCES entry, else the row's SOURCE."""
+	if 'FIELD_SOURCES' not in df.columns:
+		return df['SOURCE']
+	recorded = df['FIELD_SOURCES'].astype('string').str.extract(rf'(?:^|;){field}=(\w+)')[0]
+	return recorded.fillna(df['SOURCE'])
+
+def merge_rows(rows, priority):
+	"""One row per LISTING_KEY, each field taken from the highest-priority source that has a value.
+
+	rows can mix freshly cleaned rows and already merged ones (whose
+	FIELD_SOURCES say where each value came from). SOURCE is the
+	default-priority source of the listing; FIELD_SOURCES lists the fields
+	whose value came from a different source, as 'FIELD=SRC;...'.
+	"""
+	rows = rows.reset_index(drop=True)
+	order = rows['LISTING_KEY'].drop_duplicates()
+	merged = pd.DataFrame(index=pd.Index(order, name='LISTING_KEY'))
+	derived = {column for columns in DERIVED_FIELDS.values() for column in columns}
+	fields = [c for c in rows.columns if c not in derived and c not in ('LISTING_KEY', 'SOURCE', 'FIELD_SOURCES')]
+	default_rank = {source: i for i, source in enumerate(priority['default'])}
+	# The listing's own SOURCE: the best source among all of its rows
+	best = rows.assign(_RANK=rows['SOURCE'].map(default_rank).fillna(len(default_rank)))
+	best = best.sort_values('_RANK', kind='stable').drop_duplicates(subset=['LISTING_KEY'])
+	merged['SOURCE'] = best.set_index('LISTING_KEY')['SOURCE'].reindex(merged.index)
+	provenance = {}
+	for field in fields:
+		rank = {source: i for i, source in enumerate(priority.get(field, priority['default']))}
+		sources = field_sources(rows, field)
+		value = rows[field].astype('string').str.strip()
+		candidates = rows[value.notna() & ~value.isin(EMPTY_VALUES)]
+		candidates = candidates.assign(_RANK=sources.map(rank).fillna(len(rank)), _SRC=sources)
+		candidates = candidates.sort_values('_RANK', kind='stable').drop_duplicates(subset=['LISTING_KEY']).set_index('LISTING_KEY')
+		columns = [field] + [c for c in DERIVED_FIELDS.get(field, []) if c in rows.columns]
+		for column in columns:
+			merged[column] = candidates[column].reindex(merged.index).astype(rows[column].dtype)
+		provenance[field] = candidates['_SRC'].reindex(merged.index)
+	# Record only the fields that did not come from the listing's SOURCE
+	notes = pd.Series('', index=merged.index, dtype='string')
+	for field, sources in provenance.items():
+		differs = sources.notna() & (sources != merged['SOURCE'])
+		notes = notes.where(~differs, notes + ';' + field + '=' + sources.astype('string'))
+	merged['FIELD_SOURCES'] = notes.str.lstrip(';')
+	merged = merged.reset_index()
+	return merged[[c for c in rows.columns if c in merged.columns] + [c for c in merged.columns if c not in rows.columns]]
+
+def assign_listing_keys(existing, new):
+	"""Set LISTING_KEY and ADDRESS_KEY on the new rows and on the existing rows they may match.
+
+	LISTING_KEY is the MLS number. A row without one takes the MLS of a row
+	at the same address (address.address_keys), else 'ADDR:<address key>',
+	else 'URL:<canonical listing ID>'. Only existing rows in the new rows'
+	zipcodes are re-keyed, as the address matcher blocks on zipcode anyway.
+	Returns the updated (existing, new).
+	"""
+	zipcodes = set(new['ZIPCODE'].dropna()) if 'ZIPCODE' in new.columns else set()
+	nearby = existing['ZIPCODE'].isin(zipcodes) if not existing.empty else pd.Series(False, index=existing.index)
+	pool = pd.concat([existing[nearby], new], keys=['existing', 'new'])
+	pool['ADDRESS_KEY'] = address_keys(pool['ADDRESS'], pool.get('ZIPCODE'))
+	mls = pool['MLS'].astype('string').str.strip().fillna('')
+	has_mls = mls != ''
+	mls_at_address = pool[has_mls & pool['ADDRESS_KEY'].notna()].assign(_MLS=mls).drop_duplicates(subset=['ADDRESS_KEY']).set_index('ADDRESS_KEY')['_MLS']
+	keys = mls.where(has_mls, pool['ADDRESS_KEY'].map(mls_at_address))
+	keys = keys.where(keys.notna() & keys.ne(''), 'ADDR:' + pool['ADDRESS_KEY'])
+	unkeyed = keys.isna()
+	keys[unkeyed] = 'URL:' + pool.loc[unkeyed, 'URL'].fillna('').map(canonical_id)
+	pool['LISTING_KEY'] = keys.astype('string')
+	existing = existing.copy()
+	for column in ('ADDRESS_KEY', 'LISTING_KEY'):
+		if column not in existing.columns:
+			existing[column] = pd.Series(pd.NA, index=existing.index, dtype='string')
+		if nearby.any():
+			existing.loc[nearby, column] = pool.loc['existing', column].values
+	return existing, pool.loc['new'].reset_index(drop=True)
+
+def merge_listings(existing, new):
+	"""Upsert new rows into the compiled listings with a field-level merge per LISTING_KEY.
+
+	Only the existing rows that share a LISTING_KEY with the new rows, or
+	whose key changed through them, are re-merged. Returns the merged
+	listings and the rows that were only appended (None if existing rows
+	were replaced).
+	"""
+	priority = load_priority()
+	new = new.drop_duplicates(keep='first')
+	previous_keys = existing['LISTING_KEY'] if 'LISTING_KEY' in existing.columns else pd.Series(pd.NA, index=existing.index, dtype='string')
+	existing, new = assign_listing_keys(existing, new)
+	changed = existing['LISTING_KEY'].ne(previous_keys).fillna(True) if not existing.empty else pd.Series(False, index=existing.index)
+	keys = set(new['LISTING_KEY']) | set(existing.loc[changed, 'LISTING_KEY'])
+	affected = existing['LISTING_KEY'].isin(keys) if not existing.empty else pd.Series(False, index=existing.index)
+	merged = merge_rows(pd.concat([existing[affected], new], ignore_index=True), priority)
+	merged = merged[order_columns(merged.columns)]
+	if not affected.any():
+		combined = pd.concat([existing, merged], ignore_index=True)
+		return combined[order_columns(combined.columns)], merged
+	combined = pd.concat([existing[~affected], merged], ignore_index=True)
+	return combined[order_columns(combined.columns)], None
+
+def compile_listings(full=False):
+	"""Merge the rows added to the cleaned CSVs since the last compile into main_listing.*.
+
+	With full (or without previous state or compiled output) everything is
+	rebuilt from the cleaned CSVs, as before watermarks existed.
+	"""
+	state = {} if full else load_state()
+	have_output = os.path.exists(MAIN_LISTING_CSV) or os.path.exists(MAIN_LISTING_PARQUET)
+	if not any(file in state for file in csv_sources) or not have_output:
+		full, state = True, {}
+	dfs = []
+	new_state = {}
+	for file, source in csv_sources.items():
+		if not os.path.exists(file):
+			print(f"Warning: {file} not found.")
+			continue
+		df, mark = read_new_rows(file, state.get(file))
+		if df is None:
+			print(f"{file} was rebuilt since the last compile, recompiling everything.")
+			return compile_listings(full=True)
+		# Cleaned files from before the normalization stage lack the typed columns
+		if not set(NORMALIZED_COLUMNS) <= set(df.columns):
+			df = normalize(df)
 		df['SOURCE'] = source
+		if 'AGENT_NAME' in df.columns:
+			df['AGENT_ID'] = agent_ids(df['AGENT_NAME'])
 		dfs.append(df)
+		new_state[file] = mark
+	if not dfs:
+		print("No cleaned CSV files found to compile.")
+		return
+	new = pd.concat(dfs, ignore_index=True)
+	columns = listing_columns()
+	if not full and not {'LISTING_KEY', 'AGENT_ID'} <= set(columns):
+		print("main_listing predates listing keys or agent IDs, recompiling everything.")
+		return compile_listings(full=True)
+	if not full and columns != order_columns(columns):
+		print("main_listing has its key columns in front of the scraped ones, recompiling everything.")
+		return compile_listings(full=True)
+	if not full and state.get(AGENT_ID_FORMAT) != AGENT_ID_VERSION:
+		print("main_listing has agent IDs of an older format, recompiling everything.")
+		return compile_listings(full=True)
+	new_state[AGENT_ID_FORMAT] = AGENT_ID_VERSION
+	if not new.empty or full:
+		combined, agents = merge_into_main(new, full)
+	if state.get(EXPORTS_STALE) and not full:
+		export_tables()
+	save_state(new_state)
+	if full:
+		print(f"Compiled {len(combined)} unique listings ({len(new)} new rows) into main_listing.csv and main_listing.parquet, {len(agents)} agents into {AGENTS_CSV}.")
+	elif new.empty:
+		print("No new listings since the last compile.")
 	else:
-		print(f"Warning: {file} not found.")
-
-if dfs:
-	combined = pd.concat(dfs, ignore_index=True)
-	# Remove fully identical rows
-	combined = combined.drop_duplicates(keep='first')
-	# Deduplicate by MLS, keeping the first occurrence
-	if 'MLS' in combined.columns:
-		combined = combined.drop_duplicates(subset=['MLS'], keep='first')
-	combined.to_csv('main_listing.csv', index=False)
-	print(f"Compiled {len(combined)} unique listings into main_listing.csv.")
-else:
-	print("No cleaned CSV files found to compile.")
+		print(f"Merged {len(new)} new rows into main_listing.csv and main_listing.parquet ({len(combined)} listings in the zipcodes they touched).")
+
+def load_existing(new):
+	"""The compiled listings the new rows can merge with, and the zipcodes those cover.
+
+	With partitioned output that is every partition of the new rows'
+	zipcodes and of the listings they share an MLS number or listing URL
+	with. Otherwise, or for rows without a zipcode, it is all listings,
+	with None as the zipcodes.
+	"""
+	zipcodes = set(new['ZIPCODE'].astype('string').fillna('')) if 'ZIPCODE' in new.columns else {''}
+	if not partitioned() or '' in zipcodes:
+		return load_listings(), None
+	mls = new['MLS'].astype('string').str.strip().fillna('') if 'MLS' in new.columns else pd.Series('', index=new.index)
+	urls = new['URL'].astype('string').fillna('') if 'URL' in new.columns else []
+	keys = set(mls[mls != '']) | {'URL:' + canonical_id(url) for url in urls if url}
+	# Listings can turn up in the searches of several zipcodes
+	elsewhere = read_listings_where('LISTING_KEY', keys, columns=['ZIPCODE', 'LISTING_KEY'])
+	zipcodes |= set(elsewhere['ZIPCODE'].astype('string').fillna(''))
+	return attach_emails(read_listings_where('ZIPCODE', zipcodes)), zipcodes
+
+def _same_rows(before, after):
+	"""True when a merge left the listings exactly as they were."""
+	if len(before) != len(after) or set(before.columns) != set(after.columns):
+		return False
+	columns = sorted(c for c in before.columns if c != 'LISTING_KEY')
+	before = before.astype('string').fillna('').set_index('LISTING_KEY').sort_index()[columns]
+	after = after.astype('string').fillna('').set_index('LISTING_KEY').sort_index()[columns]
+	return before.equals(after)
+
+def _zipcode_set(df):
+	return set(df['ZIPCODE'].astype('string').fillna('')) if 'ZIPCODE' in df.columns else set()
+
+def merge_into_main(new, full=False, export=True):
+	"""Merge cleaned, normalized rows into the compiled listings and write them and the agent table.
+
+	Only the partitions the rows touch are read and rewritten (see
+	load_existing), and nothing is written when the merge changes nothing.
+	With export False, main_listing.csv and agents.csv are left to a later
+	export_tables. Returns the merged listings of the touched partitions
+	(all listings when full) and the agent table rows of the new rows'
+	agents (all agents when full).
+	"""
+	# Emails come from the enrichment cache; load_existing joins them into the existing rows
+	new = attach_emails(new)
+	existing, zipcodes = (pd.DataFrame(), None) if full else load_existing(new)
+	combined, appended = merge_listings(existing, new)
+	if zipcodes is not None and set(combined.columns) != set(listing_columns()):
+		# A new column has to reach every partition
+		existing, zipcodes = load_listings(), None
+		combined, appended = merge_listings(existing, new)
+	ids = set(new['AGENT_ID'].dropna()) if 'AGENT_ID' in new.columns else set()
+	if not full and _same_rows(existing, combined):
+		return combined, build_agents(combined[combined['AGENT_ID'].isin(ids)])
+	if zipcodes is not None:
+		zipcodes |= _zipcode_set(combined)
+	write_listings(combined, appended=None if full else appended, zipcodes=zipcodes, csv=export)
+	if zipcodes is None:
+		# Enrichment works from the agent table, once per AGENT_ID
+		agents = build_agents(combined)
+		if export:
+			write_agents(agents)
+		return combined, agents if full else agents[agents['AGENT_ID'].isin(ids)]
+	if export:
+		# Agents whose listings were replaced may have lost some of them
+		refresh_agents(ids | set(existing['AGENT_ID'].dropna()))
+	return combined, build_agents(combined[combined['AGENT_ID'].isin(ids)])
+
+def refresh_agents(ids):
+	"""Rebuild the agent table rows of ids from all of their listings, keeping the other agents' rows."""
+	columns = [c for c in ('AGENT_ID', 'AGENT_NAME', 'AGENT_PHONE', 'EMAIL') if c in listing_columns()]
+	rebuilt = build_agents(read_listings_where('AGENT_ID', ids, columns=columns))
+	agents = load_agents()
+	agents = pd.concat([agents[~agents['AGENT_ID'].isin(ids)], rebuilt], ignore_index=True)
+	write_agents(agents.sort_values('AGENT_ID', kind='stable'))
+
+def export_tables():
+	"""Write main_listing.csv and agents.csv from all compiled listings."""
+	export_csv()
+	write_agents(build_agents(load_listings()))
+
+def compile_rows(rows):
+	"""Clean raw scraped rows (with their SOURCE) and merge them into main_listing.parquet right away.
+
+	Used by the pipelined orchestrator for rows the scrapers emit while
+	they run. Only the Parquet partitions of the rows' zipcodes are
+	rewritten; main_listing.csv and agents.csv are exported by the next
+	compile_listings. The watermarks are left alone: the end-of-run
+	compile reads the same rows from the cleaned CSVs again, which the
+	upsert makes harmless. Rejected rows are skipped, the cleaner
+	quarantines them later. Returns the agent table rows of the agents of
+	the kept rows.
+	"""
+	rows = rows.astype('string').fillna('')
+	kept = normalize(rows[reject_reasons(rows).eq('')])
+	if kept.empty:
+		return build_agents(kept)
+	if 'AGENT_NAME' in kept.columns:
+		kept['AGENT_ID'] = agent_ids(kept['AGENT_NAME'])
+	columns = listing_columns()
+	if columns and (not {'LISTING_KEY', 'AGENT_ID'} <= set(columns) or columns != order_columns(columns)
+					or load_state().get(AGENT_ID_FORMAT) != AGENT_ID_VERSION):
+		compile_listings(full=True)
+		columns = listing_columns()
+	combined, agents = merge_into_main(kept, full=not columns, export=False)
+	state = load_state()
+	if not state.get(EXPORTS_STALE):
+		state[EXPORTS_STALE] = True
+		save_state(state)
+	return agents
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Compile the cleaned scraper results into main_listing.csv/.parquet.")
+	parser.add_argument('--full', action='store_true',
+						help="Rebuild from all cleaned rows instead of only those added since the last compile")
+	args = parser.parse_args(argv)
+	compile_listings(full=args.full)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,220 @@
+import os
+import re
+import logging
+import pandas as pd
+from normalize import normalize, read_listings, NORMALIZED_COLUMNS, NORMALIZED_DTYPES, DATE_COLUMNS
+from agent_cache import attach_emails
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+MAIN_LISTING_CSV = 'main_listing.csv'
+# A directory with one Parquet file per ZIPCODE, so a compile only rewrites
+# the zipcodes it touched (older versions wrote a single file here)
+MAIN_LISTING_PARQUET = 'main_listing.parquet'
+
+# Columns the compiler adds for matching and provenance. They come after the
+# scraped and normalized columns, so main_listing.csv and the dashboard keep
+# the scraped columns in their original positions
+KEY_COLUMNS = ['LISTING_KEY', 'ADDRESS_KEY', 'AGENT_ID', 'FIELD_SOURCES']
+
+def order_columns(columns):
+    """columns with the KEY_COLUMNS among them moved to the end."""
+    columns = list(columns)
+    return [c for c in columns if c not in KEY_COLUMNS] + [c for c in KEY_COLUMNS if c in columns]
+
+# Rows per Parquet row group; each partition is sorted by SOURCE/PRICE_NUM
+# so the row group statistics let readers skip whole groups when filtering
+ROW_GROUP_SIZE = 10000
+
+def partition_file(zipcode, parquet_path=MAIN_LISTING_PARQUET):
+    """Path of the Parquet file holding the listings of zipcode ('' for rows without one)."""
+    name = re.sub(r'[^0-9A-Za-z]+', '_', zipcode) or 'none'
+    return os.path.join(parquet_path, f"zip-{name}.parquet")
+
+def partition_files(parquet_path=MAIN_LISTING_PARQUET):
+    """Partition files of the compiled listings, [] when they are not partitioned (yet)."""
+    if not os.path.isdir(parquet_path):
+        return []
+    return sorted(os.path.join(parquet_path, name) for name in os.listdir(parquet_path)
+                  if name.startswith('zip-') and name.endswith('.parquet'))
+
+def partitioned(parquet_path=MAIN_LISTING_PARQUET):
+    """True when the listings are stored as per-zipcode partitions that can be rewritten one by one."""
+    return pq is not None and bool(partition_files(parquet_path))
+
+def _zipcodes(df):
+    return df['ZIPCODE'].astype('string').fillna('') if 'ZIPCODE' in df.columns else pd.Series('', index=df.index, dtype='string')
+
+def _arrow_schema(df):
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    # All-null columns would be typed null and clash with partitions that have values
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, pa.field(field.name, pa.string()))
+    return schema
+
+def write_partitions(df, zipcodes=None, parquet_path=MAIN_LISTING_PARQUET):
+    """Write df as one zstd Parquet file per ZIPCODE under parquet_path.
+
+    With zipcodes only those partitions are rewritten, from df's rows in
+    them (df has to hold all of their rows), and those left without rows
+    are removed. Without, every partition is written and stale ones are
+    removed. Files are written to a hidden temporary name and moved into
+    place, so readers never see a half-written partition.
+    """
+    if zipcodes is None or not partitioned(parquet_path):
+        zipcodes = None
+        if os.path.isfile(parquet_path):
+            # Single-file layout of older versions
+            os.remove(parquet_path)
+        os.makedirs(parquet_path, exist_ok=True)
+        schema = _arrow_schema(df)
+    else:
+        # Partitions written earlier fix the column types
+        schema = pq.read_schema(partition_files(parquet_path)[0])
+    keys = _zipcodes(df)
+    sort_by = [c for c in ('SOURCE', 'PRICE_NUM') if c in df.columns]
+    written = set()
+    for zipcode, part in df.groupby(keys, sort=False):
+        if zipcodes is not None and zipcode not in zipcodes:
+            continue
+        path = partition_file(zipcode, parquet_path)
+        tmp_file = os.path.join(parquet_path, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+        table = pa.Table.from_pandas(part.sort_values(sort_by), schema=schema, preserve_index=False)
+        pq.write_table(table, tmp_file, compression='zstd', row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_file, path)
+        written.add(path)
+    stale = partition_files(parquet_path) if zipcodes is None else [partition_file(z, parquet_path) for z in zipcodes]
+    for path in set(stale) - written:
+        if os.path.exists(path):
+            os.remove(path)
+
+def write_csv(df, csv_path=MAIN_LISTING_CSV):
+    tmp_csv = f"{csv_path}.{os.getpid()}.tmp"
+    df.to_csv(tmp_csv, index=False)
+    os.replace(tmp_csv, csv_path)
+
+def export_csv(csv_path=MAIN_LISTING_CSV, parquet_path=MAIN_LISTING_PARQUET):
+    """Rewrite the CSV from all Parquet partitions."""
+    write_csv(_read_listings(None, [], parquet_path, None), csv_path)
+    # The CSV is no newer than the partitions, readers keep using them
+    os.utime(parquet_path)
+
+def write_listings(df, csv_path=MAIN_LISTING_CSV, parquet_path=MAIN_LISTING_PARQUET, appended=None, zipcodes=None, csv=True):
+    """Write the compiled listings as CSV and, when pyarrow is installed, as Parquet partitions.
+
+    Everything is written to a temporary name first and then moved into
+    place, so readers never see a half-written file. appended, the rows
+    added at the end of df since the CSV was last written, lets the CSV be
+    extended in place instead of rewritten.
+
+    With zipcodes, df only holds the listings of those zipcodes and only
+    their partitions are rewritten; the CSV is then appended to, or
+    re-exported from all partitions when existing rows changed, unless csv
+    is False (the caller exports it later).
+    """
+    if zipcodes is not None and partitioned(parquet_path):
+        write_partitions(df, zipcodes, parquet_path)
+        if not csv:
+            return
+        if appended is None or not _append_csv(appended, csv_path):
+            export_csv(csv_path, parquet_path)
+        else:
+            # Appending made the CSV newer than the partitions
+            os.utime(parquet_path)
+        return
+    if appended is None or not _append_csv(appended, csv_path):
+        write_csv(df, csv_path)
+    if pq is None:
+        logging.warning(f"pyarrow is not installed, not writing {parquet_path}.")
+        return
+    write_partitions(df, parquet_path=parquet_path)
+
+def _append_csv(rows, csv_path):
+    if not os.path.exists(csv_path):
+        return False
+    header = pd.read_csv(csv_path, nrows=0).columns
+    if not set(rows.columns) <= set(header):
+        return False
+    rows.reindex(columns=header).to_csv(csv_path, mode='a', header=False, index=False)
+    return True
+
+def listing_columns(parquet_path=MAIN_LISTING_PARQUET, csv_path=MAIN_LISTING_CSV):
+    """Column names of the compiled listings, [] when there are none."""
+    if _use_parquet(parquet_path, csv_path):
+        files = partition_files(parquet_path) or [parquet_path]
+        return list(pq.read_schema(files[0]).names)
+    if csv_path and os.path.exists(csv_path):
+        return list(pd.read_csv(csv_path, nrows=0).columns)
+    return []
+
+def _filters(zipcode=None, source=None, min_price=None, max_price=None):
+    filters = []
+    if zipcode is not None:
+        filters.append(('ZIPCODE', '=', str(zipcode)))
+    if source is not None:
+        filters.append(('SOURCE', '=', source))
+    if min_price is not None:
+        filters.append(('PRICE_NUM', '>=', int(min_price)))
+    if max_price is not None:
+        filters.append(('PRICE_NUM', '<=', int(max_price)))
+    return filters
+
+def load_listings(columns=None, zipcode=None, source=None, min_price=None, max_price=None,
+                  parquet_path=MAIN_LISTING_PARQUET, csv_path=MAIN_LISTING_CSV):
+    """Read the compiled listings, only the requested columns and rows.
+
+    Uses the memory-mapped Parquet partitions with the zipcode/source/price
+    filters pushed down to the files and row groups, and falls back to
+    parsing the CSV when there is no Parquet copy, the CSV was rewritten
+    after it or pyarrow is missing. Agent emails found since the last compile are
+    joined in from the enrichment cache. Returns an empty DataFrame when
+    neither file exists.
+    """
+    df = _read_listings(columns, _filters(zipcode, source, min_price, max_price), parquet_path, csv_path)
+    if columns is None or 'EMAIL' in columns:
+        df = attach_emails(df)
+    return df
+
+def read_listings_where(column, values, columns=None, parquet_path=MAIN_LISTING_PARQUET, csv_path=MAIN_LISTING_CSV):
+    """Compiled listings whose column is one of values, as stored (no email join)."""
+    values = sorted(set(values))
+    if not values:
+        return _read_listings(columns, [], parquet_path, csv_path).iloc[0:0]
+    return _read_listings(columns, [(column, 'in', values)], parquet_path, csv_path)
+
+def _use_parquet(parquet_path, csv_path):
+    if pq is None or not (os.path.isfile(parquet_path) or partition_files(parquet_path)):
+        return False
+    return not csv_path or not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+def _read_listings(columns, filters, parquet_path, csv_path):
+    if _use_parquet(parquet_path, csv_path):
+        df = pq.read_table(parquet_path, columns=columns, filters=filters or None, memory_map=True).to_pandas()
+        # All-null columns come back untyped from Parquet
+        df = df.astype({c: t for c, t in NORMALIZED_DTYPES.items() if c in df.columns})
+        for column in DATE_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], utc=True)
+        return df
+    if not csv_path or not os.path.exists(csv_path):
+        return pd.DataFrame(columns=columns or [])
+    df = read_listings(csv_path)
+    # Listing files compiled before the normalization stage lack the typed columns
+    if not set(NORMALIZED_COLUMNS) <= set(df.columns):
+        df = normalize(df)
+    for column, op, value in filters:
+        if op == '=':
+            mask = df[column] == value
+        elif op == 'in':
+            mask = df[column].isin(value)
+        elif op == '>=':
+            mask = df[column] >= value
+        else:
+            mask = df[column] <= value
+        df = df[mask.fillna(False).astype(bool)]
+    return df[columns] if columns else df
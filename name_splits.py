@@ -0,0 +1,68 @@
+import threading
+from collections import Counter
+from agent_cache import normalize_agent_name, NAME_SUFFIXES, FOUND
+
+# How a name's tokens were split into the directory's first/last name fields,
+# one letter per token: 'F' first name, 'L' last name, '-' left out. For
+# 'Melissa Lynn Aptakin', 'F-L' searches 'Melissa' / 'Aptakin' and '--L' is a
+# last-name-only search whose results are filtered locally.
+PATTERN_COLUMN = 'SPLIT_PATTERN'
+
+def candidate_patterns(count):
+    """Split patterns for a name of count tokens, most likely first before anything is learned."""
+    if count < 2:
+        return []
+    if count == 2:
+        return ['FL', '-L']
+    # With middle names the split is a guess, one surname query can replace several
+    patterns = ['-' * (count - 1) + 'L', 'F' + '-' * (count - 2) + 'L']
+    patterns += ['F' * i + 'L' * (count - i) for i in range(1, count)]
+    if count > 3:
+        patterns.append('F' + '-' * (count - 3) + 'LL')
+    return list(dict.fromkeys(patterns))
+
+def split_name(tokens, pattern):
+    """(first, last) search fields for the name tokens under pattern."""
+    first = ' '.join(t for t, p in zip(tokens, pattern) if p == 'F')
+    last = ' '.join(t for t, p in zip(tokens, pattern) if p == 'L')
+    return first, last
+
+def is_confident_match(text, agent_name):
+    """True when text (a search result) contains both the first and the last token of agent_name."""
+    wanted = normalize_agent_name(agent_name).split()
+    found = set(normalize_agent_name(text).split())
+    return len(wanted) >= 2 and wanted[0] in found and wanted[-1] in found
+
+class NameSplitter:
+    """Orders the split patterns tried for a name by how often each one found an email.
+
+    hits counts found emails per pattern; from_cache learns them from the
+    SPLIT_PATTERN recorded with earlier results, and record() keeps
+    counting during a run, also from several enrichment threads.
+    """
+
+    def __init__(self, hits=None):
+        self.hits = Counter(hits or {})
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_cache(cls, cache):
+        return cls(Counter(entry.get(PATTERN_COLUMN) for entry in cache.entries.values()
+                           if entry['STATUS'] == FOUND and entry.get(PATTERN_COLUMN)))
+
+    def splits(self, agent_name):
+        """[(pattern, first, last)] to search for agent_name, best pattern first."""
+        tokens = str(agent_name or '').replace(',', ' ').split()
+        # 'Melissa L. Aptakin, P.A.' is searched as 'Melissa L. Aptakin'
+        while len(tokens) > 2 and normalize_agent_name(tokens[-1]) in NAME_SUFFIXES:
+            tokens.pop()
+        patterns = candidate_patterns(len(tokens))
+        with self.lock:
+            # Stable sort: unlearned patterns keep the candidate_patterns order
+            patterns.sort(key=lambda p: -self.hits[p])
+        return [(pattern,) + split_name(tokens, pattern) for pattern in patterns]
+
+    def record(self, pattern):
+        if pattern:
+            with self.lock:
+                self.hits[pattern] += 1
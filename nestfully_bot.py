@@ -1,200 +1,149 @@
-import pandas as pd
-import time
-import undetected_chromedriver as uc
+import os
+import argparse
+import threading
+from urllib.parse import urljoin
+import browser
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
+from waits import wait_for_element, wait_for_navigation
+from agent_cache import AgentEmailCache, normalize_agent_phone
+from enrichment import run_enrichment
+from name_splits import NameSplitter, is_confident_match
+from nestfully_http import HttpWorker, BASE_URL, SEARCH_PATH, phones_in
+from agents import load_agents, AGENTS_CSV
 
-def setup_browser():
-	driver = uc.Chrome()
+# Parallel workers for the enrichment run
+WORKERS = int(os.environ.get('NESTFULLY_WORKERS', '3'))
+
+_launch_lock = threading.Lock()
+
+def setup_browser(headless=None):
+	# Workers that fall back to Chrome mid-run launch it from their own thread
+	with _launch_lock:
+		driver = browser.setup_browser(headless=headless)
 	driver.set_window_size(1200, 800)
 	return driver
 
-def get_agent_email(driver, agent_name):
-	search_url = 'https://www.nestfully.com/agentsearch/search.aspx'
-	driver.get(search_url)
-	time.sleep(2)
-	parts = agent_name.split()
-	n = len(parts)
-	tried = set()
-	# Build all possible combinations
-	combos = []
-	for i in range(1, n):
-		combos.append(( ' '.join(parts[:i]), ' '.join(parts[i:]) ))
-	if n > 1:
-		combos.append((parts[0], ' '.join(parts[1:])))
-	if n > 2:
-		combos.append((' '.join(parts[:2]), ' '.join(parts[2:])))
-		combos.append((parts[0], ' '.join(parts[-2:])))
-	if n > 1:
-		combos.append((' '.join(parts[:-1]), parts[-1]))
-		combos.append((parts[0], parts[-1]))
+class BrowserWorker:
+	"""Enrichment worker that searches Nestfully in its own Chrome (or in driver, which it then leaves open)."""
 
-	tried = set()
-	for firstname, lastname in combos:
-		combo = (firstname, lastname)
-		if combo in tried:
-			continue
-		tried.add(combo)
+	def __init__(self, limiter=None, driver=None, headless=None, splitter=None):
+		self.limiter = limiter
+		self.splitter = splitter
+		self.owned = driver is None
+		self.driver = setup_browser(headless) if driver is None else driver
+
+	def lookup(self, agent_name, phone=''):
+		return get_agent_email(self.driver, agent_name, self.limiter, self.splitter, phone)
+
+	def close(self):
+		if self.owned:
+			self.driver.quit()
+
+RESULT_LINKS_SELECTOR = 'a.ao_results_icon_text.A.detail-page'
+
+# Text of a result link's entry: its largest ancestor that holds no other result
+RESULT_ENTRY_JS = """
+let entry = arguments[0];
+while (entry.parentElement && entry.parentElement.querySelectorAll(arguments[1]).length === 1) entry = entry.parentElement;
+return entry.innerText;
+"""
+
+def get_agent_email(driver, agent_name, limiter=None, splitter=None, phone=''):
+	"""(email, split pattern) of the agent on Nestfully, ('', '') when there is none.
+
+	The name splits are tried best first (name_splits.NameSplitter) and the
+	search stops at the first result that names both the agent's first and
+	last name, whether or not its page has an email. When several results
+	name the agent, the one whose entry shows phone is taken.
+	"""
+	search_url = urljoin(BASE_URL, SEARCH_PATH)
+	splitter = splitter or NameSplitter()
+	for pattern, firstname, lastname in splitter.splits(agent_name):
 		print(f"Trying: First name='{firstname}', Last name='{lastname}'")
 		try:
+			if limiter:
+				limiter.wait()
 			driver.get(search_url)
-			time.sleep(1)
-			first_box = driver.find_element(By.ID, 'Master_FirstName')
+			first_box = wait_for_element(driver, (By.ID, 'Master_FirstName'))
+			if first_box is None:
+				raise Exception("search form did not load")
 			last_box = driver.find_element(By.ID, 'Master_LastName')
 			first_box.clear()
 			last_box.clear()
 			first_box.send_keys(firstname)
 			last_box.send_keys(lastname)
+			old_url = driver.current_url
 			last_box.send_keys(Keys.RETURN)
-			time.sleep(2)
-			links = driver.find_elements(By.CSS_SELECTOR, 'a.ao_results_icon_text.A.detail-page')
-			for link in links:
-				if lastname.lower() in link.text.lower() or firstname.lower() in link.text.lower():
-					link.click()
-					time.sleep(2)
-					try:
-						email_link = driver.find_element(By.ID, 'hlAgentEmailAddress')
-						email = email_link.text.strip()
-						if '@' in email:
-							return email
-					except Exception:
-						email_elements = driver.find_elements(By.XPATH, "//*[contains(text(), '@')]")
-						for elem in email_elements:
-							email = elem.text.strip()
-							if '@' in email:
-								return email
-					break  # After clicking a link, break to reload for next combo
+			# The search posts back to the same page, so wait for the old form to go away
+			wait_for_navigation(driver, old_url, stale_element=last_box)
+			links = driver.find_elements(By.CSS_SELECTOR, RESULT_LINKS_SELECTOR)
+			# Last-name-only searches list every agent with that surname, pick ours locally
+			links = [l for l in links if is_confident_match(l.text, agent_name)]
+			if not links:
+				continue
+			link = links[0]
+			known_phone = normalize_agent_phone(phone)
+			if len(links) > 1 and known_phone:
+				# Namesakes, tell them apart by the phone shown in their entries
+				entries = ((l, driver.execute_script(RESULT_ENTRY_JS, l, RESULT_LINKS_SELECTOR)) for l in links)
+				link = next((l for l, text in entries if known_phone in phones_in(text)), link)
+			old_url = driver.current_url
+			if limiter:
+				limiter.wait()
+			link.click()
+			wait_for_navigation(driver, old_url, stale_element=link)
+			email_links = driver.find_elements(By.ID, 'hlAgentEmailAddress')
+			if email_links:
+				candidates = [email_links[0].text.strip()]
+			else:
+				candidates = [elem.text.strip() for elem in driver.find_elements(By.XPATH, "//*[contains(text(), '@')]")]
+			email = next((c for c in candidates if '@' in c), '')
+			if not email:
+				return '', ''
+			splitter.record(pattern)
+			return email, pattern
 		except Exception as e:
-			print(f"Error trying combination {combo}: {e}")
+			print(f"Error trying combination {(firstname, lastname)}: {e}")
 			continue
-	return ''
-	if n > 1:
-		firstname = parts[0]
-		lastname = ' '.join(parts[1:])
-		combo = (firstname, lastname)
-		if combo not in tried:
-			tried.add(combo)
-			try:
-				first_box = driver.find_element(By.ID, 'Master_FirstName')
-				last_box = driver.find_element(By.ID, 'Master_LastName')
-				first_box.clear()
-				last_box.clear()
-				first_box.send_keys(firstname)
-				last_box.send_keys(lastname)
-				last_box.send_keys(Keys.RETURN)
-				time.sleep(2)
-				links = driver.find_elements(By.CSS_SELECTOR, 'a.ao_results_icon_text.A.detail-page')
-				for link in links:
-					if lastname.lower() in link.text.lower() or firstname.lower() in link.text.lower():
-						link.click()
-						time.sleep(2)
-						try:
-							email_link = driver.find_element(By.ID, 'hlAgentEmailAddress')
-							email = email_link.text.strip()
-							if '@' in email:
-								return email
-						except Exception:
-							email_elements = driver.find_elements(By.XPATH, "//*[contains(text(), '@')]")
-							for elem in email_elements:
-								email = elem.text.strip()
-								if '@' in email:
-									return email
-						driver.get(search_url)
-						time.sleep(1)
-			except Exception:
-				pass
-	# Try all but last word as first name, last word as last name
-	if n > 1:
-		firstname = ' '.join(parts[:-1])
-		lastname = parts[-1]
-		combo = (firstname, lastname)
-		if combo not in tried:
-			tried.add(combo)
-			try:
-				first_box = driver.find_element(By.ID, 'Master_FirstName')
-				last_box = driver.find_element(By.ID, 'Master_LastName')
-				first_box.clear()
-				last_box.clear()
-				first_box.send_keys(firstname)
-				last_box.send_keys(lastname)
-				last_box.send_keys(Keys.RETURN)
-				time.sleep(2)
-				links = driver.find_elements(By.CSS_SELECTOR, 'a.ao_results_icon_text.A.detail-page')
-				for link in links:
-					if lastname.lower() in link.text.lower() or firstname.lower() in link.text.lower():
-						link.click()
-						time.sleep(2)
-						try:
-							email_link = driver.find_element(By.ID, 'hlAgentEmailAddress')
-							email = email_link.text.strip()
-							if '@' in email:
-								return email
-						except Exception:
-							email_elements = driver.find_elements(By.XPATH, "//*[contains(text(), '@')]")
-							for elem in email_elements:
-								email = elem.text.strip()
-								if '@' in email:
-									return email
-						driver.get(search_url)
-						time.sleep(1)
-			except Exception:
-				pass
-	# Try first word as first name, last word as last name
-	if n > 1:
-		firstname = parts[0]
-		lastname = parts[-1]
-		combo = (firstname, lastname)
-		if combo not in tried:
-			tried.add(combo)
-			try:
-				first_box = driver.find_element(By.ID, 'Master_FirstName')
-				last_box = driver.find_element(By.ID, 'Master_LastName')
-				first_box.clear()
-				last_box.clear()
-				first_box.send_keys(firstname)
-				last_box.send_keys(lastname)
-				last_box.send_keys(Keys.RETURN)
-				time.sleep(2)
-				links = driver.find_elements(By.CSS_SELECTOR, 'a.ao_results_icon_text.A.detail-page')
-				for link in links:
-					if lastname.lower() in link.text.lower() or firstname.lower() in link.text.lower():
-						link.click()
-						time.sleep(2)
-						try:
-							email_link = driver.find_element(By.ID, 'hlAgentEmailAddress')
-							email = email_link.text.strip()
-							if '@' in email:
-								return email
-						except Exception:
-							email_elements = driver.find_elements(By.XPATH, "//*[contains(text(), '@')]")
-							for elem in email_elements:
-								email = elem.text.strip()
-								if '@' in email:
-									return email
-						driver.get(search_url)
-						time.sleep(1)
-			except Exception:
-				pass
-	return ''
+	return '', ''
 
-def main():
-	df = pd.read_csv('main_listing.csv')
-	if 'EMAIL' not in df.columns:
-		df['EMAIL'] = pd.NA
-	driver = setup_browser()
-	try:
-		for idx, row in df.iterrows():
-			agent_name = str(row.get('AGENT_NAME', '')).strip()
-			if not agent_name or (pd.notna(row.get('EMAIL')) and str(row.get('EMAIL')).strip()):
-				continue
-			email = get_agent_email(driver, agent_name)
-			if email:
-				df.at[idx, 'EMAIL'] = email
-			df.to_csv('main_listing.csv', index=False)
-			time.sleep(1)
-	finally:
-		driver.quit()
+def worker_opener(mode='http', headless=None, splitter=None):
+	"""open_worker(limiter) for enrichment.EnrichmentPool: HTTP workers that fall back to Chrome, or Chrome only."""
+	def open_worker(limiter):
+		open_browser = lambda: BrowserWorker(limiter, headless=headless, splitter=splitter)
+		if mode == 'http':
+			return HttpWorker(limiter, splitter, open_browser=open_browser)
+		return open_browser()
+	return open_worker
+
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(description="Look up the agents' emails on Nestfully.")
+	parser.add_argument('--workers', type=int, default=WORKERS,
+						help="Workers searching in parallel; all of them share one rate limit")
+	parser.add_argument('--mode', choices=['http', 'browser'], default='http',
+						help="Search over plain HTTP (falling back to Chrome when blocked) or only in Chrome")
+	parser.add_argument('--headless', action='store_true',
+						help="Run the browsers headless (automatic without a display)")
+	args = parser.parse_args(argv)
+	if args.workers < 1:
+		parser.error("--workers must be at least 1")
+	return args
+
+def main(argv=None):
+	args = parse_args(argv)
+	# One search per agent of the compiler's agent table, not per name spelling in the listings.
+	# Emails go to the agent cache only; the compiler and load_listings join them into the listings
+	agents = load_agents()
+	if agents.empty:
+		print(f"No agents in {AGENTS_CSV}, run listings_compiler.py first.")
+		return
+	agents = agents[agents['EMAIL'].str.strip() == '']
+	cache = AgentEmailCache()
+	# One splitter for all workers, so a pattern that starts hitting is tried first everywhere
+	splitter = NameSplitter.from_cache(cache)
+	open_worker = worker_opener(args.mode, True if args.headless else None, splitter)
+	run_enrichment(zip(agents['AGENT_NAME'], agents['AGENT_PHONE']), open_worker, workers=args.workers, cache=cache)
 
 if __name__ == "__main__":
 	main()
-
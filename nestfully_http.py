@@ -0,0 +1,166 @@
+import os
+import re
+import logging
+import requests
+from urllib.parse import urljoin
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from fetcher import DEFAULT_HEADERS, is_bot_wall
+from normalize import PHONE_PATTERN
+from agent_cache import normalize_agent_phone
+from name_splits import NameSplitter, is_confident_match
+
+# Overridable so the client can be pointed at a local stand-in of the directory
+BASE_URL = os.environ.get('NESTFULLY_BASE_URL', 'https://www.nestfully.com')
+SEARCH_PATH = '/agentsearch/search.aspx'
+
+# Result links of the agent search and the email link of an agent's page
+RESULT_LINKS_XPATH = (".//a[contains(concat(' ', normalize-space(@class), ' '), ' ao_results_icon_text ')"
+                      " and contains(concat(' ', normalize-space(@class), ' '), ' detail-page ')]")
+EMAIL_XPATH = "//*[@id='hlAgentEmailAddress']"
+EMAIL_RE = re.compile(r'[\w.+\-]+@[\w\-]+(?:\.[\w\-]+)+')
+POSTBACK_RE = re.compile(r"__doPostBack\('([^']*)','([^']*)'\)")
+
+class NestfullyBlocked(Exception):
+    """The directory answered with a bot wall; the lookup has to go through the browser."""
+
+def form_fields(tree):
+    """Name -> value of the hidden inputs of the page's form (__VIEWSTATE, __EVENTVALIDATION, ...)."""
+    return {node.get('name'): node.get('value', '') for node in tree.xpath("//form//input[@type='hidden'][@name]")}
+
+def input_name(tree, element_id, default):
+    """Posted name of the input with element_id ('Master_FirstName' is posted as e.g. 'ctl00$Master$FirstName')."""
+    names = tree.xpath(f"//input[@id='{element_id}']/@name")
+    return names[0] if names else default
+
+def phones_in(text):
+    """Every US phone number in text, as +1XXXXXXXXXX."""
+    return {'+1' + ''.join(match.groups()) for match in re.finditer(PHONE_PATTERN, text or '')}
+
+def _result_entry(link):
+    # The largest ancestor of a result link that holds no other result: its entry in the list
+    entry, parent = link, link.getparent()
+    while parent is not None and len(parent.xpath(RESULT_LINKS_XPATH)) == 1:
+        entry, parent = parent, parent.getparent()
+    return entry
+
+def parse_results(tree):
+    """[(agent name, href, phones shown in its entry)] of the search result links."""
+    return [(' '.join(link.text_content().split()), link.get('href', ''), phones_in(_result_entry(link).text_content()))
+            for link in tree.xpath(RESULT_LINKS_XPATH)]
+
+def pick_result(results, agent_name, phone=''):
+    """href of the result for agent_name among parse_results' [(name, href, phones)], None without a confident match.
+
+    Agents are told apart by name only; when several results match the
+    name, the first one whose entry shows phone is taken, else the first.
+    """
+    matches = [result for result in results if is_confident_match(result[0], agent_name)]
+    phone = normalize_agent_phone(phone)
+    if len(matches) > 1 and phone:
+        matches.sort(key=lambda result: phone not in result[2])
+    return matches[0][1] if matches else None
+
+def parse_email(tree):
+    """The agent's email from its detail page, '' when it shows none."""
+    nodes = tree.xpath(EMAIL_XPATH)
+    texts = [nodes[0].text_content(), nodes[0].get('href', '')] if nodes else [tree.text_content()]
+    for text in texts:
+        match = EMAIL_RE.search(text.replace('mailto:', ' '))
+        if match:
+            return match.group(0)
+    return ''
+
+class NestfullyClient:
+    """Agent search over plain HTTP: the ASP.NET form is posted back with its
+    __VIEWSTATE/__EVENTVALIDATION fields on a pooled keep-alive session.
+
+    Not thread-safe, the form state belongs to one session; use one client
+    per enrichment worker. Raises NestfullyBlocked on bot walls.
+    """
+
+    def __init__(self, base_url=BASE_URL, limiter=None, splitter=None, timeout=15, pool_size=4):
+        self.search_url = urljoin(base_url, SEARCH_PATH)
+        self.limiter = limiter
+        self.splitter = splitter or NameSplitter()
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+
+    def _request(self, method, url, **kwargs):
+        if self.limiter:
+            self.limiter.wait()
+        response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        if is_bot_wall(response.status_code, response.text):
+            raise NestfullyBlocked(f"{response.status_code} from {url}")
+        response.raise_for_status()
+        return lxml_html.fromstring(response.text), response.url
+
+    def search(self, first_name, last_name):
+        """Result page tree and URL for a first/last name search."""
+        tree, url = self._request('GET', self.search_url)
+        data = form_fields(tree)
+        data[input_name(tree, 'Master_FirstName', 'Master$FirstName')] = first_name
+        data[input_name(tree, 'Master_LastName', 'Master$LastName')] = last_name
+        # The browser submits with RETURN, which posts the form's default submit button
+        for button in tree.xpath("//form//input[@type='submit'][@name]")[:1]:
+            data[button.get('name')] = button.get('value', '')
+        return self._request('POST', url, data=data, headers={'Referer': url})
+
+    def open_result(self, tree, url, href):
+        """Detail page tree of a result link, following __doPostBack links with a form post."""
+        postback = POSTBACK_RE.search(href)
+        if postback:
+            data = form_fields(tree)
+            data['__EVENTTARGET'], data['__EVENTARGUMENT'] = postback.groups()
+            return self._request('POST', url, data=data, headers={'Referer': url})[0]
+        return self._request('GET', urljoin(url, href), headers={'Referer': url})[0]
+
+    def lookup(self, agent_name, phone=''):
+        """(email, split pattern) like nestfully_bot.get_agent_email, ('', '') when there is none."""
+        for pattern, first_name, last_name in self.splitter.splits(agent_name):
+            try:
+                tree, url = self.search(first_name, last_name)
+            except requests.RequestException as e:
+                logging.info(f"Nestfully search '{first_name}' '{last_name}' failed: {e}")
+                continue
+            href = pick_result(parse_results(tree), agent_name, phone)
+            if href is None:
+                continue
+            email = parse_email(self.open_result(tree, url, href))
+            if not email:
+                return '', ''
+            self.splitter.record(pattern)
+            return email, pattern
+        return '', ''
+
+    def close(self):
+        self.session.close()
+
+class HttpWorker:
+    """Enrichment worker that looks agents up with a NestfullyClient and, once the
+    site starts blocking plain HTTP, with the worker open_browser() returns."""
+
+    def __init__(self, limiter=None, splitter=None, open_browser=None, base_url=BASE_URL):
+        self.client = NestfullyClient(base_url, limiter, splitter)
+        self.open_browser = open_browser
+        self.browser = None
+
+    def lookup(self, agent_name, phone=''):
+        if self.browser is None:
+            try:
+                return self.client.lookup(agent_name, phone)
+            except NestfullyBlocked as e:
+                if self.open_browser is None:
+                    raise
+                logging.warning(f"Nestfully blocked the HTTP client ({e}), switching this worker to Chrome.")
+                self.browser = self.open_browser()
+        return self.browser.lookup(agent_name, phone)
+
+    def close(self):
+        self.client.close()
+        if self.browser is not None:
+            self.browser.close()
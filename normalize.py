@@ -0,0 +1,71 @@
+import pandas as pd
+
+# Typed columns added next to the scraped text columns, with their dtypes
+NORMALIZED_DTYPES = {
+    'PRICE_NUM': 'Int64',
+    'BEDS_NUM': 'Float64',
+    'BATHS_NUM': 'Float64',
+    'SQFT_NUM': 'Int64',
+    'HOURS_ON_MARKET': 'Float64',
+    'PHONE_E164': 'string',
+}
+# Parsed separately, read_csv has no dtype for timezone-aware timestamps
+DATE_COLUMNS = ['LISTED_AT']
+NORMALIZED_COLUMNS = list(NORMALIZED_DTYPES) + DATE_COLUMNS
+
+# US phone number with optional +1 and any of the usual separators
+PHONE_PATTERN = r'(?:\+?1[\s.\-]?)?\(?(\d{3})\)?[\s.\-]*(\d{3})[\s.\-]*(\d{4})'
+
+HOURS_PER_UNIT = {'minute': 1 / 60, 'hour': 1, 'day': 24, 'week': 24 * 7, 'month': 24 * 30}
+
+def _text(df, column):
+    if column not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype='string')
+    return df[column].astype('string').str.strip()
+
+def _number(text):
+    """Float parse of '$295,000' / '1,250' / '2.5' style text; anything else is NA."""
+    text = text.str.replace(r'[$,\s]', '', regex=True)
+    return pd.to_numeric(text.where(text.str.fullmatch(r'\d+(\.\d+)?')), errors='coerce')
+
+def hours_on_market(text):
+    """Hours from '18 hours' / '3 days' / '2 minutes' text."""
+    parts = text.str.lower().str.extract(r'^(\d+(?:\.\d+)?)\s*(minute|hour|day|week|month)s?\b')
+    return pd.to_numeric(parts[0], errors='coerce') * parts[1].map(HOURS_PER_UNIT).astype(float)
+
+def phone_e164(text):
+    """First US phone number in the text as +1XXXXXXXXXX ('(954) 545-5583', '754-802-9634,')."""
+    match = text.str.extract(PHONE_PATTERN)
+    return ('+1' + match[0] + match[1] + match[2]).astype('string')
+
+def normalize(df):
+    """Return df with the NORMALIZED_COLUMNS computed from the scraped text columns.
+
+    LISTED_AT is SCRAPED_AT minus the time on market, so it is only set for
+    rows that carry a scrape timestamp.
+    """
+    df = df.copy()
+    df['PRICE_NUM'] = _number(_text(df, 'PRICE')).round()
+    df['BEDS_NUM'] = _number(_text(df, 'BEDS'))
+    df['BATHS_NUM'] = _number(_text(df, 'BATHS'))
+    df['SQFT_NUM'] = _number(_text(df, 'SQFT')).round()
+    df['HOURS_ON_MARKET'] = hours_on_market(_text(df, 'DAYS_ON_MARKET'))
+    df['PHONE_E164'] = phone_e164(_text(df, 'AGENT_PHONE'))
+    scraped_at = pd.to_datetime(_text(df, 'SCRAPED_AT'), errors='coerce', utc=True)
+    df['LISTED_AT'] = scraped_at - pd.to_timedelta(df['HOURS_ON_MARKET'].astype(float), unit='h')
+    return df.astype(NORMALIZED_DTYPES)
+
+def read_listings(path, **kwargs):
+    """Read a cleaned or compiled listings CSV with the scraped columns as text and typed normalized columns.
+
+    path may also be a seekable file object.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    if hasattr(path, 'seek'):
+        path.seek(0)
+    dtypes = {column: NORMALIZED_DTYPES.get(column, 'string') for column in header if column not in DATE_COLUMNS}
+    df = pd.read_csv(path, dtype=dtypes, keep_default_na=False, na_values={c: [''] for c in NORMALIZED_COLUMNS}, **kwargs)
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce', utc=True)
+    return df
@@ -1,10 +1,19 @@
-
+import argparse
 import subprocess
+import threading
+import queue
 import time
 import sys
 import logging
 import random
 import os
+import pandas as pd
+from storage import RESULT_HEADERS, parse_emitted
+from listings_compiler import compile_rows
+from agent_cache import AgentEmailCache
+from enrichment import EnrichmentPool
+from name_splits import NameSplitter
+from nestfully_bot import worker_opener, WORKERS as ENRICH_WORKERS
 
 logging.basicConfig(
     filename='orchestrator.log',
@@ -14,44 +23,176 @@ logging.basicConfig(
 
 PYTHON_EXECUTABLE = sys.executable
 
-def run_scraper(script_path, user_data_dir=None, extra_args=None):
-    """Run a Zillow scraper script as a subprocess with a unique user data dir and optional extra args."""
-    logging.info(f"Starting {script_path}")
-    cmd = [PYTHON_EXECUTABLE, script_path]
-    process = subprocess.Popen(cmd)
+SCRAPER_SCRIPTS = [
+    'zillow_scraper.py',
+    'realtor_scraper.py',
+    'redfin_scraper.py'
+]
+
+# Pipelined runs: emitted rows wait in a bounded queue (a full queue stalls
+# the scrapers' output) and are compiled in batches of COMPILE_BATCH rows,
+# or after COMPILE_INTERVAL seconds, whichever comes first
+ROW_QUEUE_SIZE = 2000
+COMPILE_BATCH = 200
+COMPILE_INTERVAL = 60
+
+def run_scraper(script_path, user_data_dir=None, extra_args=None, stdout=None):
+    """Run a scraper script as a subprocess with optional extra args."""
+    logging.info(f"Starting {script_path} {' '.join(extra_args or [])}".strip())
+    cmd = [PYTHON_EXECUTABLE, script_path] + list(extra_args or [])
+    process = subprocess.Popen(cmd, stdout=stdout, text=True)
     return process
 
-def main():
-    logging.info("Orchestrator starting scrapers sequentially...")
-    scraper_scripts = [
-        'zillow_scraper.py',
-        'realtor_scraper.py',
-        'redfin_scraper.py'
-    ]
-    processes = []
-    for idx, script in enumerate(scraper_scripts):
-        logging.info(f"Starting {script}...")
-        proc = run_scraper(script)
-        processes.append(proc)
-        if idx < len(scraper_scripts) - 1:
-            logging.info(f"Waiting 30 seconds before starting next scraper...")
-            time.sleep(30)
-    # Wait for all scrapers to finish
-    for idx, proc in enumerate(processes):
+def shard_args(index, count, headless=False, resume=False):
+    """Arguments that make one scraper worker handle shard index/count of the zipcodes."""
+    args = ['--shard', f'{index}/{count}', '--skip-clean']
+    if headless:
+        args.append('--headless')
+    if resume:
+        args.append('--resume')
+    return args
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the scrapers, compiler and Nestfully enrichment.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Browser workers per source; each one scrapes a shard of the zipcodes")
+    parser.add_argument('--headless', action='store_true',
+                        help="Run the scraper browsers headless with resource blocking (automatic without a display)")
+    parser.add_argument('--stagger', type=float, default=30,
+                        help="Seconds to wait between two browser launches against the same site")
+    parser.add_argument('--enrich-workers', type=int, default=ENRICH_WORKERS,
+                        help="Parallel Nestfully lookups")
+    parser.add_argument('--resume', action='store_true',
+                        help="Let every scraper shard continue from its checkpoint of an interrupted run")
+    parser.add_argument('--sequential', action='store_true',
+                        help="Run scraping, compiling and enrichment one after the other instead of pipelined")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.enrich_workers < 1:
+        parser.error("--workers and --enrich-workers must be at least 1")
+    return args
+
+def launch_scrapers(args, work_units, stdout=None):
+    """Start one scraper per (script, shard) work unit; yields (script, index, process).
+
+    Launches are only staggered per site: a script's next shard starts
+    args.stagger seconds after its previous one, other sites start meanwhile.
+    """
+    last_launch = {}
+    for script, index in work_units:
+        wait = last_launch.get(script, float('-inf')) + args.stagger - time.monotonic()
+        if wait > 0:
+            logging.info(f"Waiting {wait:.0f} seconds before starting the next {script} worker...")
+            time.sleep(wait)
+        extra_args = shard_args(index, args.workers, args.headless, args.resume) + (['--emit'] if stdout else [])
+        last_launch[script] = time.monotonic()
+        yield script, index, run_scraper(script, extra_args=extra_args, stdout=stdout)
+
+def run_sequential(args, work_units):
+    """Scrape everything first; enrichment runs after the final compile."""
+    processes = list(launch_scrapers(args, work_units))
+    # Wait for all scraper workers to finish
+    for script, index, proc in processes:
         proc.wait()
-        logging.info(f"{scraper_scripts[idx]} exited with code {proc.returncode}")
+        logging.info(f"{script} shard {index}/{args.workers} exited with code {proc.returncode}")
+
+def read_emitted(script, proc, rows):
+    """Put the rows a scraper emits on the rows queue, logging its other output."""
+    for line in proc.stdout:
+        row = parse_emitted(line)
+        if row is None:
+            if line.strip():
+                logging.info(f"{script}: {line.rstrip()}")
+            continue
+        rows.put(row)
+    proc.wait()
+    logging.info(f"{script} exited with code {proc.returncode}")
+
+def compile_batch(batch, pool):
+    """Merge a batch of emitted rows into main_listing.* and queue their agents without an email."""
+    try:
+        agents = compile_rows(pd.DataFrame(batch).reindex(columns=RESULT_HEADERS + ['SOURCE']))
+    except Exception as e:
+        # The end-of-run compile picks these rows up from the cleaned CSVs
+        logging.error(f"Incremental compile of {len(batch)} rows failed: {e}")
+        return
+    agents = agents[agents['EMAIL'].astype('string').fillna('').str.strip() == '']
+    # Never wait for the enrichment queue here, agents that do not fit go to the pool's backlog
+    queued = sum(pool.submit(name, phone, block=False) for name, phone in zip(agents['AGENT_NAME'], agents['AGENT_PHONE']))
+    logging.info(f"Compiled {len(batch)} emitted rows, {queued} new agents queued for enrichment.")
+
+def run_pipeline(args, work_units, pool):
+    """Scrapers -> incremental compile -> enrichment, connected by bounded queues.
+
+    Each scraper emits its rows as it stores them; reader threads put them
+    on the rows queue, this thread merges them into main_listing.* in
+    batches and submits new agents to the enrichment pool. Agents that do
+    not fit in the pool's bounded queue wait in its backlog, so a slow
+    enrichment never holds back the compile stage.
+    """
+    rows = queue.Queue(maxsize=ROW_QUEUE_SIZE)
+    readers = []
+
+    def launch():
+        for script, index, proc in launch_scrapers(args, work_units, stdout=subprocess.PIPE):
+            reader = threading.Thread(target=read_emitted, args=(f"{script} shard {index}/{args.workers}", proc, rows), daemon=True)
+            reader.start()
+            readers.append(reader)
+
+    launcher = threading.Thread(target=launch, daemon=True)
+    launcher.start()
+    batch = []
+    deadline = time.monotonic() + COMPILE_INTERVAL
+    while True:
+        done = not launcher.is_alive() and not any(reader.is_alive() for reader in readers)
+        try:
+            batch.append(rows.get(timeout=1))
+        except queue.Empty:
+            pass
+        if batch and (len(batch) >= COMPILE_BATCH or time.monotonic() >= deadline or (done and rows.empty())):
+            compile_batch(batch, pool)
+            batch = []
+            deadline = time.monotonic() + COMPILE_INTERVAL
+        if done and rows.empty() and not batch:
+            break
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.info(f"Orchestrator starting {len(SCRAPER_SCRIPTS)} scrapers with {args.workers} worker(s) each...")
+    # One (script, shard) work unit per browser; interleave sources so each site
+    # gets its first worker early instead of waiting behind another site's shards.
+    work_units = [(script, index) for index in range(args.workers) for script in SCRAPER_SCRIPTS]
+    pool = None
+    if args.sequential:
+        run_sequential(args, work_units)
+    else:
+        cache = AgentEmailCache()
+        open_worker = worker_opener(headless=True if args.headless else None, splitter=NameSplitter.from_cache(cache))
+        pool = EnrichmentPool(open_worker, args.enrich_workers, cache)
+        run_pipeline(args, work_units, pool)
+
+    # Clean every source once, after all of its shards have been written
+    logging.info("Running cleaning.py...")
+    clean_proc = subprocess.Popen([PYTHON_EXECUTABLE, 'cleaning.py'])
+    clean_proc.wait()
+    logging.info(f"cleaning.py exited with code {clean_proc.returncode}")
 
-    # Run listings_compiler.py after all scrapers are done
+    # The final compile brings the watermarks and the quarantine files up to date
     logging.info("Running listings_compiler.py...")
     compiler_proc = subprocess.Popen([PYTHON_EXECUTABLE, 'listings_compiler.py'])
     compiler_proc.wait()
     logging.info(f"listings_compiler.py exited with code {compiler_proc.returncode}")
 
-    # Run nestfully_bot.py after listings_compiler.py is done
-    logging.info("Running nestfully_bot.py...")
-    nestfully_proc = subprocess.Popen([PYTHON_EXECUTABLE, 'nestfully_bot.py'])
-    nestfully_proc.wait()
-    logging.info(f"nestfully_bot.py exited with code {nestfully_proc.returncode}")
+    if pool is not None:
+        logging.info("Waiting for the queued Nestfully lookups...")
+        results = pool.close()
+        logging.info(f"Enrichment looked up {len(results)} agents, {sum(1 for email in results.values() if email)} with an email.")
+    else:
+        # Run nestfully_bot.py after listings_compiler.py is done
+        logging.info("Running nestfully_bot.py...")
+        nestfully_args = ['--workers', str(args.enrich_workers)] + (['--headless'] if args.headless else [])
+        nestfully_proc = subprocess.Popen([PYTHON_EXECUTABLE, 'nestfully_bot.py'] + nestfully_args)
+        nestfully_proc.wait()
+        logging.info(f"nestfully_bot.py exited with code {nestfully_proc.returncode}")
     logging.info("Orchestration complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+import json
+import re
+import logging
+from datetime import datetime, timezone
+
+NEXT_DATA_RE = re.compile(r'<script[^>]*\bid=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.S | re.I)
+LD_JSON_RE = re.compile(r'<script[^>]*\btype=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+
+def next_data(html):
+    """Return the parsed __NEXT_DATA__ blob of a Next.js page, or None."""
+    match = NEXT_DATA_RE.search(html or '')
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except ValueError as e:
+        logging.debug(f"Could not parse __NEXT_DATA__: {e}")
+        return None
+
+def ld_json_items(html):
+    """Return every JSON-LD object embedded in the page, flattened into one list."""
+    items = []
+    for match in LD_JSON_RE.finditer(html or ''):
+        try:
+            value = json.loads(match.group(1))
+        except ValueError:
+            continue
+        items.extend(value if isinstance(value, list) else [value])
+    return [item for item in items if isinstance(item, dict)]
+
+def find_dict(obj, predicate, max_depth=25):
+    """Depth-first search for the first nested dict matching predicate."""
+    stack = [(obj, 0)]
+    while stack:
+        value, depth = stack.pop()
+        if isinstance(value, dict):
+            if predicate(value):
+                return value
+            children = value.values()
+        elif isinstance(value, list):
+            children = value
+        else:
+            continue
+        if depth < max_depth:
+            stack.extend((child, depth + 1) for child in reversed(list(children)))
+    return None
+
+def dig(obj, *path, default=''):
+    """Follow a path of dict keys / list indexes, returning default when it breaks."""
+    for key in path:
+        try:
+            obj = obj[key]
+        except (KeyError, IndexError, TypeError):
+            return default
+    return default if obj is None else obj
+
+def join_address(street, city, state, zipcode):
+    """Build a 'street, city, ST 12345' address line, or '' without a street."""
+    if not street:
+        return ''
+    state_zip = ' '.join(part for part in (state, zipcode) if part)
+    return ', '.join(part for part in (street, city, state_zip) if part)
+
+def format_price(value):
+    """Format a numeric price the way the sites display it, e.g. '$295,000'."""
+    try:
+        return f"${float(value):,.0f}"
+    except (TypeError, ValueError):
+        return ''
+
+def format_number(value, thousands=False):
+    """Format beds/baths/sqft numbers as text, dropping a trailing '.0'."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return ''
+    if number.is_integer():
+        return f"{int(number):,}" if thousands else str(int(number))
+    return str(number)
+
+def time_on_market(listed_at, now=None):
+    """Turn an ISO listing date into '18 hours' / '3 days' text like the detail pages show."""
+    if not listed_at:
+        return ''
+    try:
+        listed = datetime.fromisoformat(str(listed_at).replace('Z', '+00:00'))
+    except ValueError:
+        return ''
+    if listed.tzinfo is None:
+        listed = listed.replace(tzinfo=timezone.utc)
+    hours = int(((now or datetime.now(timezone.utc)) - listed).total_seconds() // 3600)
+    if hours < 0:
+        return ''
+    if hours < 48:
+        return f"{hours} hours"
+    return f"{hours // 24} days"
+
+# Fields the embedded JSON must provide before the DOM selectors are skipped
+KEY_FIELDS = ('MLS', 'PRICE', 'ADDRESS')
+
+def needs_dom_fallback(data):
+    """True when the JSON extraction found nothing or missed one of KEY_FIELDS."""
+    return data is None or not all(data.get(field) for field in KEY_FIELDS)
+
+def fill_missing(data, fallback):
+    """Fill empty fields of data from fallback, keeping the values data already has."""
+    for field, value in fallback.items():
+        if not data.get(field):
+            data[field] = value
+    return data
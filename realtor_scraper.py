@@ -1,11 +1,24 @@
 import logging
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 import time
-import csv
 import re
+from scraper_args import parse_scraper_args, select_zipcodes
+from extraction import extract_fields, page_source, page_text, harvest_cards, maps_url
+from fetcher import HttpFetcher, load_listing
+from seen_index import SeenIndex
+from storage import open_store
+from checkpoint import Checkpoint
+import cleaning
+import browser
+from browser import DetailTab
+from waits import wait_for_element, wait_for_navigation, polite_delay
+from page_json import next_data, find_dict, dig, join_address, format_price, format_number, time_on_market, needs_dom_fallback, fill_missing
+
+# Source code used in the seen-listing index and the compiled SOURCE column
+SOURCE = 'RLTR'
+RESULTS_CSV = 'realtor_results.csv'
 
 ZIPCODES = [
     '33009', '33019', '33119', '33128', '33129', '33130',
@@ -13,68 +26,81 @@ ZIPCODES = [
     '33160', '33180', '33239'
 ]
 
-def setup_browser():
-    logging.info("Setting up browser...")
-    options = uc.ChromeOptions()
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-gpu')
-    driver = uc.Chrome(options=options, use_subprocess=True)
-    logging.info("Browser launched.")
-    # Set window to 1/4 of the screen and position it in the lower-right corner
-    import ctypes
-    user32 = ctypes.windll.user32
-    screen_width = user32.GetSystemMetrics(0)
-    screen_height = user32.GetSystemMetrics(1)
-    window_width = int(screen_width / 2)
-    window_height = int(screen_height / 2)
-    window_x = screen_width - window_width
-    window_y = screen_height - window_height
-    driver.set_window_rect(window_x, window_y, window_width, window_height)
-    logging.info(f"Set window size to {window_width}x{window_height} at position ({window_x}, {window_y})")
-    return driver
+def setup_browser(args=None):
+    """Launch Chrome with the browser profile selected on the command line."""
+    return browser.setup_browser(
+        headless=True if args and args.headless else None,
+        block_resources=True if args and args.block_resources else None,
+        corner=None if args and args.no_window_layout else 'lower-right',
+    )
 
-def extract_mls(driver):
-    """Extract MLS number using multiple strategies"""
-    mls_patterns = [
-        # Pattern 1: Look for elements containing "MLS"
-        "//*[contains(translate(text(), 'MLS', 'mls'), 'mls')]",
-        # Pattern 2: Look for elements containing "Listing ID" or "Property ID"
-        "//*[contains(translate(text(), 'LISTINGID', 'listingid'), 'listing id')]",
-        "//*[contains(translate(text(), 'PROPERTYID', 'propertyid'), 'property id')]",
-        # Pattern 3: Look for ID-like patterns in spans and divs
-        "//span[contains(@class, 'id') or contains(@class, 'mls')]",
-        "//div[contains(@class, 'id') or contains(@class, 'mls')]",
-    ]
-    
-    # Try each pattern
-    for pattern in mls_patterns:
-        try:
-            elements = driver.find_elements(By.XPATH, pattern)
-            for elem in elements:
-                text = elem.text.strip()
-                if not text or text.lower() == 'matrix':
-                    continue
-                # Pattern 1: MLS # A12345678 or similar
-                mls_match = re.search(r'MLS[#:\s]*([A-Z0-9\-]{6,})', text, re.IGNORECASE)
-                if mls_match:
-                    candidate = mls_match.group(1).strip()
-                    if candidate.lower() != 'matrix':
-                        if candidate != '2121192':
-                            return candidate
-                # Pattern 2: Just the ID itself (A followed by numbers)
-                if re.match(r'^A\d{6,}$', text) and text.lower() != 'matrix' and text != '2121192':
-                    return text
-                # Pattern 3: Any alphanumeric ID of reasonable length, not 'Matrix' or '2121192'
-                if re.match(r'^[A-Z0-9\-]{6,}$', text) and len(text) >= 6 and text.lower() != 'matrix' and text != '2121192':
-                    return text
-        except Exception as e:
+MLS_XPATHS = [
+    # Pattern 1: Look for elements containing "MLS"
+    "//*[contains(translate(text(), 'MLS', 'mls'), 'mls')]",
+    # Pattern 2: Look for elements containing "Listing ID" or "Property ID"
+    "//*[contains(translate(text(), 'LISTINGID', 'listingid'), 'listing id')]",
+    "//*[contains(translate(text(), 'PROPERTYID', 'propertyid'), 'property id')]",
+    # Pattern 3: Look for ID-like patterns in spans and divs
+    "//span[contains(@class, 'id') or contains(@class, 'mls')]",
+    "//div[contains(@class, 'id') or contains(@class, 'mls')]",
+]
+
+# Detail page selectors, evaluated in one round trip by extraction.extract_fields
+DETAIL_FIELDS = {
+    'ADDRESS': [(By.XPATH, "//h1[contains(@class,'sc-fa97e35a-3')]")],
+    'PRICE': [(By.XPATH, "//span[contains(@class, 'base__StyledType-rui__sc-18muj27-0') and contains(@class, 'idlIli')]")],
+    'BEDS': [(By.XPATH, "//li[@data-testid='property-meta-beds']//span[@data-testid='meta-value']")],
+    'BATHS': [(By.XPATH, "//li[@data-testid='property-meta-baths']//span[@data-testid='meta-value']")],
+    'SQFT': [(By.XPATH, "//span[@class='meta-value' and @data-testid='meta-value']")],
+    'AGENT_NAME': [
+        (By.XPATH, "//a[@data-testid='provider-link']"),
+        # Fallback to previous method if provider-link not found
+        (By.XPATH, "//li[contains(., 'Listed by')]/span[last()]"),
+    ],
+    'DAYS_ON_MARKET': [(By.XPATH, "//li[contains(@class, 'sc-c1d03842-0')]//p[contains(text(), 'hour') or contains(text(), 'day')]")],
+    'AGENT_PHONE': [(By.XPATH, "//a[@data-testid='office-phone-link']")],
+    # Property id from the meta div, used as the last MLS fallback
+    'META_ID': [(By.XPATH, "//div[@class='meta']/div[2]")],
+}
+
+# Key content of a detail page, waited for before extracting it in the browser
+DETAIL_READY = DETAIL_FIELDS['PRICE'] + DETAIL_FIELDS['ADDRESS']
+
+# Every element text matched by each MLS_XPATHS pattern, in page order
+MLS_CANDIDATE_FIELDS = {f'MLS_CANDIDATES_{i}': (By.XPATH, xpath) for i, xpath in enumerate(MLS_XPATHS)}
+
+def mls_from_texts(texts):
+    """Pick an MLS number out of candidate element texts"""
+    for text in texts:
+        text = text.strip()
+        if not text or text.lower() == 'matrix':
             continue
+        # Pattern 1: MLS # A12345678 or similar
+        mls_match = re.search(r'MLS[#:\s]*([A-Z0-9\-]{6,})', text, re.IGNORECASE)
+        if mls_match:
+            candidate = mls_match.group(1).strip()
+            if candidate.lower() != 'matrix':
+                if candidate != '2121192':
+                    return candidate
+        # Pattern 2: Just the ID itself (A followed by numbers)
+        if re.match(r'^A\d{6,}$', text) and text.lower() != 'matrix' and text != '2121192':
+            return text
+        # Pattern 3: Any alphanumeric ID of reasonable length, not 'Matrix' or '2121192'
+        if re.match(r'^[A-Z0-9\-]{6,}$', text) and len(text) >= 6 and text.lower() != 'matrix' and text != '2121192':
+            return text
+    return ''
+
+def extract_mls(page, fields):
+    """Extract MLS number using multiple strategies, given the extracted detail fields"""
+    for candidate_field in MLS_CANDIDATE_FIELDS:
+        mls_candidate = mls_from_texts(fields.get(candidate_field, []))
+        if mls_candidate:
+            return mls_candidate
 
     # Final fallback: scan all text on page for MLS-like patterns
     mls_candidate = ''
     try:
-        body = driver.find_element(By.TAG_NAME, "body")
-        page_text = body.text
+        body_text = page_text(page)
         fallback_patterns = [
             r'MLS[#:\s]*([A-Z0-9\-]{6,})',
             r'Listing ID[#:\s]*([A-Z0-9\-]{6,})',
@@ -83,7 +109,7 @@ def extract_mls(driver):
             r'\b([A-Z]{2,3}\d{6,})\b'  # For patterns like RX-10958722
         ]
         for pattern in fallback_patterns:
-            matches = re.findall(pattern, page_text, re.IGNORECASE)
+            matches = re.findall(pattern, body_text, re.IGNORECASE)
             for match in matches:
                 if match.lower() != 'matrix' and match != '2121192':
                     mls_candidate = match
@@ -95,302 +121,205 @@ def extract_mls(driver):
 
     # If still not found, use property_id from meta div as last fallback
     if not mls_candidate:
-        try:
-            property_id = driver.find_element(By.XPATH, "//div[@class='meta']/div[2]").text.strip()
-            if property_id and property_id != '2121192':
-                mls_candidate = property_id
-        except Exception:
-            pass
+        property_id = fields.get('META_ID', '').strip()
+        if property_id and property_id != '2121192':
+            mls_candidate = property_id
 
     return mls_candidate
 
-def search_zipcode(driver, zipcode):
-    """Scrape Realtor.com for a given zipcode and save results to CSV."""
-    # Prepare CSV file
-    csv_file = 'realtor_results.csv'
-    headers = ['ZIPCODE', 'MLS', 'PRICE','ADDRESS', 'BEDS', 'BATHS', 'SQFT', 'URL', 'MAPS_URL', 'DAYS_ON_MARKET', 'AGENT_NAME', 'AGENT_PHONE', 'EMAIL']
-    import os
-    if not os.path.exists(csv_file):
-        with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
+def listing_from_json(html):
+    """Map the property record in a Realtor.com detail page's __NEXT_DATA__ to CSV fields, or None."""
+    page_data = next_data(html)
+    if not page_data:
+        return None
+    prop = find_dict(page_data, lambda d: 'list_price' in d and 'description' in d and 'location' in d)
+    if prop is None:
+        return None
+    address = dig(prop, 'location', 'address', default={})
+    description = prop.get('description') or {}
+    advertisers = prop.get('advertisers') or []
+    agent = next((a for a in advertisers if a.get('type') == 'seller'), advertisers[0] if advertisers else {})
+    return {
+        'MLS': str(dig(prop, 'source', 'listing_id')),
+        'ADDRESS': join_address(address.get('line'), address.get('city'), address.get('state_code'), address.get('postal_code')),
+        'PRICE': format_price(prop.get('list_price')),
+        'BEDS': format_number(description.get('beds')),
+        'BATHS': format_number(description.get('baths_consolidated') or description.get('baths')),
+        'SQFT': format_number(description.get('sqft'), thousands=True),
+        'AGENT_NAME': agent.get('name') or '',
+        # Same number as the page's office-phone-link
+        'AGENT_PHONE': str(dig(agent, 'office', 'phones', 0, 'number')),
+        'DAYS_ON_MARKET': time_on_market(prop.get('list_date')),
+    }
 
-    # Load already-saved URLs from CSV
-    saved_urls = set()
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if 'URL' in row and row['URL']:
-                    saved_urls.add(row['URL'])
-    except Exception:
-        pass
+def listing_from_dom(page, mls=True):
+    """Extract the detail fields with the DETAIL_FIELDS selectors, and the MLS strategies when mls is set.
 
-    # Go to Realtor.com search page for the zipcode, with filters and sorting by Newest
-    search_url = f"https://www.realtor.com/realestateandhomes-search/{zipcode}/beds-2/price-200000-na/sby-6"
-    driver.get(search_url)
-    time.sleep(2)
+    The MLS_CANDIDATE_FIELDS return every matching element's text, so they
+    are only queried when the MLS is not known yet.
+    """
+    fields = extract_fields(page, DETAIL_FIELDS, MLS_CANDIDATE_FIELDS if mls else None)
+    data = {field: fields[field] for field in DETAIL_FIELDS if field != 'META_ID'}
+    data['MLS'] = extract_mls(page, fields) if mls else ''
+    return data
 
-    # Scroll only to elements with '/realestateandhomes-detail/' in href
-    seen_hrefs = set()
-    for _ in range(20):
-        anchors = driver.find_elements(By.XPATH, "//a[contains(@class, 'LinkComponent_anchor__') and contains(@href, '/realestateandhomes-detail/')]")
-        for a in anchors:
-            href = a.get_attribute('href')
-            if href and '/realestateandhomes-detail/' in href and href not in seen_hrefs:
-                driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", a)
-                time.sleep(0.5)
-                seen_hrefs.add(href)
-        time.sleep(0.5)
+def extract_listing(page, zipcode, href):
+    """Extract one Realtor.com detail page (a driver that has loaded it, or its HTML) into a CSV row dict.
 
-    # Collect anchor elements for all unique hrefs, preserving page order
-    filtered_anchors = []
-    anchors = driver.find_elements(By.XPATH, "//a[contains(@class, 'LinkComponent_anchor__') and contains(@href, '/realestateandhomes-detail/')]")
-    seen = set()
-    for a in anchors:
-        href = a.get_attribute('href')
-        if href and href not in seen_hrefs:
-            continue  # Only process discovered hrefs
-        if href and href not in seen:
-            filtered_anchors.append(a)
-            seen.add(href)
+    The listing JSON embedded in the page source is used when present, which also
+    spares extract_mls its page text scan; the DOM selectors only fill in what it
+    is missing.
+    """
+    data = listing_from_json(page_source(page))
+    if needs_dom_fallback(data):
+        data = fill_missing(data or {}, listing_from_dom(page, mls=not (data or {}).get('MLS')))
+    data['ZIPCODE'] = zipcode
+    data['URL'] = href
+    if not data['MLS']:
+        logging.warning("MLS not found for this listing.")
+    data['EMAIL'] = ''
+    # Construct Google Maps link from address if available
+    data['MAPS_URL'] = maps_url(data['ADDRESS'])
+    return data
 
-    # After scrolling, open and extract data from every property card
-    main_window = driver.current_window_handle
-    # Find all property cards using the recommended CSS selector
-    cards = driver.find_elements(By.CSS_SELECTOR, "div.BasePropertyCard_propertyCardWrap__gtWK6[data-listing-id][data-property-id]")
-    logging.info(f"Found {len(cards)} property cards to process.")
-    hrefs = []
-    for card in cards:
-        try:
-            anchor = card.find_element(By.XPATH, ".//a[contains(@href, '/realestateandhomes-detail/')]")
-            href = anchor.get_attribute('href')
-            if href:
-                hrefs.append(href)
-        except Exception as e:
-            logging.debug(f"Card anchor extraction error: {e}")
-    logging.info(f"Found {len(hrefs)} property card hrefs to process.")
+# Search results cards and their detail links, for extraction.harvest_cards
+CARD_SELECTOR = "div.BasePropertyCard_propertyCardWrap__gtWK6[data-listing-id][data-property-id]"
+CARD_LINK_SELECTOR = "a[href*='/realestateandhomes-detail/']"
+
+def page_url(search_url, page):
+    """Search URL of results page page (Realtor.com takes it as a '/pg-2' suffix)."""
+    return f"{search_url.rstrip('/')}/pg-{page}"
+
+def search_zipcode(driver, zipcode, seen, store, fetcher=None, checkpoint=None, start=(1, 0, 0)):
+    """Scrape Realtor.com for a given zipcode, adding new listings to store.
+
+    start is the (page, card index, listings saved) to continue from, as
+    returned by Checkpoint.resume; progress is recorded in checkpoint.
+    """
+    # Go to Realtor.com search page for the zipcode, with filters and sorting by Newest
+    search_url = f"https://www.realtor.com/realestateandhomes-search/{zipcode}/beds-2/price-200000-na/sby-6"
+    start_page, skip, listings_processed = start
+    # A resumed run opens its results page directly instead of paging through the earlier ones
+    driver.get(page_url(search_url, start_page) if start_page > 1 else search_url)
+    wait_for_element(driver, (By.CSS_SELECTOR, CARD_SELECTOR))
+    # Detail pages are fetched over HTTP with this browser's cookies where possible
+    if fetcher:
+        fetcher.borrow_session(driver)
 
-    # Extract data from each property card by navigating in the same tab
-    search_results_url = driver.current_url
-    anchors_xpath = "//a[contains(@class, 'LinkComponent_anchor__') and contains(@href, '/realestateandhomes-detail/')]"
-    seen_hrefs = set()
-    hrefs = []
-    for _ in range(20):
-        try:
-            anchors = WebDriverWait(driver, 4).until(
-                EC.presence_of_all_elements_located((By.XPATH, anchors_xpath)))
-        except Exception:
-            anchors = driver.find_elements(By.XPATH, anchors_xpath)
-        for a in anchors:
-            href = a.get_attribute('href')
-            if href and '/realestateandhomes-detail/' in href and href not in seen_hrefs:
-                driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", a)
-                time.sleep(0.2)
-                seen_hrefs.add(href)
-                hrefs.append(href)
-        time.sleep(0.2)
+    # Scroll the lazy-loaded results and collect all property cards in one call
+    hrefs = harvest_cards(driver, CARD_SELECTOR, CARD_LINK_SELECTOR)
+    logging.info(f"Found {len(hrefs)} property card hrefs to process.")
 
     # Now iterate over hrefs for scraping
-    page_num = 1
-    listings_processed = 0
+    page_num = start_page
     MAX_LISTINGS = 20
-    while True:
-        consecutive_skips = 0
-        for href in hrefs:
-            if listings_processed >= MAX_LISTINGS:
-                logging.info(f"Reached {MAX_LISTINGS} listings for zipcode {zipcode}. Stopping.")
-                return
-            if href in saved_urls:
-                logging.info(f"Skipping already-saved property: {href}")
-                consecutive_skips += 1
-                if consecutive_skips >= 3:
-                    logging.info(f"Skipped 3 consecutive listings for zipcode {zipcode}. Assuming latest listings reached. Stopping.")
+    # Detail pages open in a side tab so the results page never has to be reloaded
+    with DetailTab(driver) as tab:
+        while True:
+            consecutive_skips = 0
+            for index, href in enumerate(hrefs):
+                if index < skip:
+                    continue
+                if checkpoint:
+                    checkpoint.position(zipcode, page_num, index, listings_processed, store)
+                if listings_processed >= MAX_LISTINGS:
+                    logging.info(f"Reached {MAX_LISTINGS} listings for zipcode {zipcode}. Stopping.")
                     return
-                continue
-            else:
-                consecutive_skips = 0
-            try:
-                logging.info(f"Navigating to property card: {href}")
-                driver.get(href)
-                data = {}
-                data['ZIPCODE'] = zipcode
-                data['URL'] = href
-                data['MLS'] = extract_mls(driver)
-                if not data['MLS']:
-                    logging.warning("MLS not found for this listing.")
-                try:
-                    address_elem = driver.find_element(By.XPATH, "//h1[contains(@class,'sc-fa97e35a-3')]")
-                    data['ADDRESS'] = address_elem.text.strip()
-                except Exception:
-                    data['ADDRESS'] = ''
-                # Extract price
-                try:
-                    price_elem = driver.find_element(By.XPATH, "//span[contains(@class, 'base__StyledType-rui__sc-18muj27-0') and contains(@class, 'idlIli')]")
-                    data['PRICE'] = price_elem.text.strip()
-                except Exception:
-                    data['PRICE'] = ''
-                try:
-                    beds_elem = driver.find_element(By.XPATH, "//li[@data-testid='property-meta-beds']//span[@data-testid='meta-value']")
-                    data['BEDS'] = beds_elem.text.strip()
-                except Exception:
-                    data['BEDS'] = ''
-                try:
-                    baths_elem = driver.find_element(By.XPATH, "//li[@data-testid='property-meta-baths']//span[@data-testid='meta-value']")
-                    data['BATHS'] = baths_elem.text.strip()
-                except Exception:
-                    data['BATHS'] = ''
-                try:
-                    sqft_elem = driver.find_element(By.XPATH, "//span[@class='meta-value' and @data-testid='meta-value']")
-                    data['SQFT'] = sqft_elem.text.strip()
-                except Exception:
-                    data['SQFT'] = ''
-                # Extract agent name
-                try:
-                    agent_elem = driver.find_element(By.XPATH, "//a[@data-testid='provider-link']")
-                    data['AGENT_NAME'] = agent_elem.text.strip()
-                except Exception:
-                    try:
-                        # Fallback to previous method if provider-link not found
-                        agent_elem = driver.find_element(By.XPATH, "//li[contains(., 'Listed by')]/span[last()]")
-                        data['AGENT_NAME'] = agent_elem.text.strip()
-                    except Exception:
-                        data['AGENT_NAME'] = ''
-                # Extract days on market
-                try:
-                    days_elem = driver.find_element(By.XPATH, "//li[contains(@class, 'sc-c1d03842-0')]//p[contains(text(), 'hour') or contains(text(), 'day')]")
-                    data['DAYS_ON_MARKET'] = days_elem.text.strip()
-                except Exception:
-                    data['DAYS_ON_MARKET'] = ''
-                # Extract agent phone number
-                try:
-                    phone_elem = driver.find_element(By.XPATH, "//a[@data-testid='office-phone-link']")
-                    data['AGENT_PHONE'] = phone_elem.text.strip()
-                except Exception:
-                    data['AGENT_PHONE'] = ''
-                # Update headers if AGENT_NAME or AGENT_PHONE not present
-                if 'AGENT_NAME' not in headers:
-                    headers.append('AGENT_NAME')
-                if 'AGENT_PHONE' not in headers:
-                    headers.append('AGENT_PHONE')
-                if 'EMAIL' not in data:
-                    data['EMAIL'] = ''
-                # Construct Google Maps link from address if available
-                if data['ADDRESS']:
-                    maps_query = data['ADDRESS'].replace(' ', '+')
-                    data['MAPS_URL'] = f"https://www.google.com/maps/search/?api=1&query={maps_query}"
+                if seen.has(href):
+                    logging.info(f"Skipping already-saved property: {href}")
+                    consecutive_skips += 1
+                    if consecutive_skips >= 3:
+                        logging.info(f"Skipped 3 consecutive listings for zipcode {zipcode}. Assuming latest listings reached. Stopping.")
+                        return
+                    continue
                 else:
-                    data['MAPS_URL'] = ''
-                # Update headers if AGENT_NAME not present
-                if 'AGENT_NAME' not in headers:
-                    headers.append('AGENT_NAME')
-                with open(csv_file, 'a', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=headers)
-                    writer.writerow(data)
-                logging.info(f"Extracted and saved property data: {data}")
-                listings_processed += 1
-                saved_urls.add(href)
-                # Return to search results page
-                driver.get(search_results_url)
-            except Exception as e:
-                logging.error(f"Error processing property card: {e}")
-        # After all listings, try to go to next page
-        if listings_processed >= MAX_LISTINGS:
-            logging.info(f"Reached {MAX_LISTINGS} listings for zipcode {zipcode}. Stopping.")
-            break
-        try:
-            next_page_num = page_num + 1
-            # Scroll pagination bar into view first
-            try:
-                pagination_bar = driver.find_element(By.XPATH, "//nav[contains(@class, 'pagination')] | //ul[contains(@class, 'pagination')]")
-                driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", pagination_bar)
-                time.sleep(0.5)
-            except Exception:
-                pass
-
-            next_btn = None
-            # Try numbered page link by aria-label
+                    consecutive_skips = 0
+                try:
+                    logging.info(f"Navigating to property card: {href}")
+                    data = load_listing(driver, fetcher, href, lambda page: extract_listing(page, zipcode, href), open_page=tab.get, ready=DETAIL_READY)
+                    other_source = seen.captured_elsewhere(data.get('MLS'))
+                    if other_source:
+                        logging.info(f"Skipping MLS {data.get('MLS')}, already captured from {other_source}: {href}")
+                        seen.add(href)
+                        continue
+                    store.add(data)
+                    logging.info(f"Extracted and saved property data: {data}")
+                    listings_processed += 1
+                    # Persisted in the seen index once the store has flushed the row
+                    seen.mark(href)
+                except Exception as e:
+                    logging.error(f"Error processing property card: {e}")
+            # After all listings, go back to the results tab and try to go to next page
+            tab.back_to_results()
+            if listings_processed >= MAX_LISTINGS:
+                logging.info(f"Reached {MAX_LISTINGS} listings for zipcode {zipcode}. Stopping.")
+                break
             try:
-                next_btn = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((
-                        By.XPATH,
-                        f"//a[contains(@class, 'pagination-item') and contains(@aria-label, 'Go to page {next_page_num}')]")
-                    )
-                )
-            except Exception:
-                pass
-            # Fallback: try numbered page link by text content
-            if not next_btn:
+                next_page_num = page_num + 1
+                # Scroll pagination bar into view first
                 try:
-                    next_btn = WebDriverWait(driver, 2).until(
-                        EC.element_to_be_clickable((
-                            By.XPATH,
-                            f"//a[contains(@class, 'pagination-item') and normalize-space(text())='{next_page_num}']"
-                        ))
-                    )
+                    pagination_bar = driver.find_element(By.XPATH, "//nav[contains(@class, 'pagination')] | //ul[contains(@class, 'pagination')]")
+                    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", pagination_bar)
                 except Exception:
                     pass
-            # Fallback: try a 'Next' button
-            if not next_btn:
+
+                next_btn = None
+                # Try numbered page link by aria-label
                 try:
-                    next_btn = WebDriverWait(driver, 2).until(
+                    next_btn = WebDriverWait(driver, 3).until(
                         EC.element_to_be_clickable((
                             By.XPATH,
-                            "//a[contains(@class, 'pagination-item') and (contains(text(), 'Next') or contains(@aria-label, 'Next'))]"
-                        ))
+                            f"//a[contains(@class, 'pagination-item') and contains(@aria-label, 'Go to page {next_page_num}')]")
+                        )
                     )
                 except Exception:
                     pass
-            if next_btn and next_btn.is_displayed() and next_btn.is_enabled():
-                # Wait before clicking next page
-                time.sleep(2)
-                next_btn.click()
-                logging.info(f"Successfully clicked next page link for page {next_page_num}.")
-                time.sleep(2)
-                search_results_url = driver.current_url
-                # Scroll to reveal all property cards on the new page
-                seen_hrefs = set()
-                for _ in range(20):
-                    anchors = driver.find_elements(By.XPATH, "//a[contains(@class, 'LinkComponent_anchor__') and contains(@href, '/realestateandhomes-detail/')]")
-                    for a in anchors:
-                        href = a.get_attribute('href')
-                        if href and '/realestateandhomes-detail/' in href and href not in seen_hrefs:
-                            driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", a)
-                            time.sleep(0.5)
-                            seen_hrefs.add(href)
-                    time.sleep(0.5)
-                # Collect anchor elements for all unique hrefs, preserving page order
-                filtered_anchors = []
-                anchors = driver.find_elements(By.XPATH, "//a[contains(@class, 'LinkComponent_anchor__') and contains(@href, '/realestateandhomes-detail/')]")
-                seen = set()
-                for a in anchors:
-                    href = a.get_attribute('href')
-                    if href and href not in seen_hrefs:
-                        continue  # Only process discovered hrefs
-                    if href and href not in seen:
-                        filtered_anchors.append(a)
-                        seen.add(href)
-                # Find all property cards
-                cards = driver.find_elements(By.CSS_SELECTOR, "div.BasePropertyCard_propertyCardWrap__gtWK6[data-listing-id][data-property-id]")
-                logging.info(f"Found {len(cards)} property cards to process on page {next_page_num}.")
-                hrefs = []
-                for card in cards:
+                # Fallback: try numbered page link by text content
+                if not next_btn:
+                    try:
+                        next_btn = WebDriverWait(driver, 2).until(
+                            EC.element_to_be_clickable((
+                                By.XPATH,
+                                f"//a[contains(@class, 'pagination-item') and normalize-space(text())='{next_page_num}']"
+                            ))
+                        )
+                    except Exception:
+                        pass
+                # Fallback: try a 'Next' button
+                if not next_btn:
                     try:
-                        anchor = card.find_element(By.XPATH, ".//a[contains(@href, '/realestateandhomes-detail/')]")
-                        href = anchor.get_attribute('href')
-                        if href:
-                            hrefs.append(href)
-                    except Exception as e:
-                        logging.debug(f"Card anchor extraction error: {e}")
-                page_num += 1
-            else:
-                logging.info("Next page link not enabled, not visible, or not found. Scraping complete.")
+                        next_btn = WebDriverWait(driver, 2).until(
+                            EC.element_to_be_clickable((
+                                By.XPATH,
+                                "//a[contains(@class, 'pagination-item') and (contains(text(), 'Next') or contains(@aria-label, 'Next'))]"
+                            ))
+                        )
+                    except Exception:
+                        pass
+                if next_btn and next_btn.is_displayed() and next_btn.is_enabled():
+                    polite_delay()
+                    old_url = driver.current_url
+                    old_cards = driver.find_elements(By.CSS_SELECTOR, CARD_SELECTOR)
+                    next_btn.click()
+                    logging.info(f"Successfully clicked next page link for page {next_page_num}.")
+                    # Wait for the next results page to replace the current cards
+                    wait_for_navigation(driver, old_url, stale_element=old_cards[0] if old_cards else next_btn)
+                    # Scroll to reveal and collect all property cards on the new page
+                    hrefs = harvest_cards(driver, CARD_SELECTOR, CARD_LINK_SELECTOR)
+                    logging.info(f"Found {len(hrefs)} property cards to process on page {next_page_num}.")
+                    page_num += 1
+                    skip = 0
+                    if checkpoint:
+                        checkpoint.position(zipcode, page_num, 0, listings_processed, store)
+                else:
+                    logging.info("Next page link not enabled, not visible, or not found. Scraping complete.")
+                    break
+            except Exception:
+                logging.info("No more pages found or next page link not clickable. Scraping complete.")
                 break
-        except Exception:
-            logging.info("No more pages found or next page link not clickable. Scraping complete.")
-            break
 
 def main():
+    args = parse_scraper_args("Scrape Realtor.com listings by zipcode.")
     log_filename = 'realtor_scraper.log'
     # Create a visible separator between runs
     with open(log_filename, 'a', encoding='utf-8') as f:
@@ -411,64 +340,48 @@ def main():
     console.setFormatter(formatter)
     logging.getLogger('').addHandler(console)
 
+    if args.clean_only:
+        logging.info("Running cleaner only on realtor_results.csv...")
+        cleaning.clean_results(RESULTS_CSV)
+        return
+
     driver = None
+    seen = None
+    store = None
     try:
-        logging.info("Starting Realtor.com scraper...")
-        driver = setup_browser()
-        for zipcode in ZIPCODES:
+        zipcodes = select_zipcodes(ZIPCODES, args)
+        checkpoint = Checkpoint(SOURCE, zipcodes, args.shard)
+        zipcodes, start = checkpoint.resume() if args.resume else (zipcodes, (1, 0, 0))
+        logging.info(f"Starting Realtor.com scraper for {len(zipcodes)} zipcodes...")
+        driver = setup_browser(args)
+        fetcher = None if args.no_http else HttpFetcher()
+        seen = SeenIndex(SOURCE, skip_other_sources=args.skip_cross_source, bloom=args.seen_bloom)
+        seen.bootstrap(RESULTS_CSV)
+        store = open_store(args.storage, SOURCE, RESULTS_CSV, on_flush=seen.add_rows, emit=args.emit)
+        for zipcode in zipcodes:
             logging.info(f"Processing zipcode: {zipcode}")
-            search_zipcode(driver, zipcode)
-        logging.info("All zipcodes processed. Applying cleaner logic to realtor_results.csv...")
-        # Cleaner logic (copied from redfin_scraper.py)
-        import pandas as pd
-        import re
-        import os
-        csv_file = 'realtor_results.csv'
-        log_file = 'realtor_scraper_cleaner.log'
-        def valid_zipcode(val):
-            return bool(re.match(r'^\d{5}$', str(val).strip()))
-        def valid_mls(val):
-            s = str(val).strip()
-            return bool(re.match(r'^[A-Za-z0-9\-]+$', s)) and s and s.lower() != 'source'
-        def valid_price(val):
-            s = str(val).replace('$', '').replace(',', '').strip()
-            return bool(re.match(r'^\d+(\.\d+)?$', s)) and float(s) > 0
-        if os.path.exists(csv_file):
-            df = pd.read_csv(csv_file)
-            initial_count = len(df)
-            deleted_rows = []
-            # Clean ZIPCODE
-            if 'ZIPCODE' in df.columns:
-                mask_zip = df['ZIPCODE'].apply(valid_zipcode)
-                deleted_rows.extend(df[~mask_zip].to_dict('records'))
-                df = df[mask_zip]
-            # Clean MLS: remove rows where MLS is missing or invalid
-            if 'MLS' in df.columns:
-                mask_mls = df['MLS'].apply(lambda x: pd.notna(x) and str(x).strip() != '' and valid_mls(x))
-                deleted_rows.extend(df[~mask_mls].to_dict('records'))
-                df = df[mask_mls]
-            # Clean PRICE
-            if 'PRICE' in df.columns:
-                mask_price = df['PRICE'].apply(valid_price)
-                deleted_rows.extend(df[~mask_price].to_dict('records'))
-                df = df[mask_price]
-            final_count = len(df)
-            deleted_count = initial_count - final_count
-            cleaned_path = csv_file.replace('.csv', '_cleaned.csv')
-            df.to_csv(cleaned_path, index=False)
-            # Log deleted rows
-            with open(log_file, 'a', encoding='utf-8') as logf:
-                if deleted_count > 0:
-                    logf.write(f"{deleted_count} rows deleted from {csv_file}.\n")
-                    for row in deleted_rows:
-                        logf.write(f"Deleted from {csv_file}: {row}\n")
-            print(f"{deleted_count} rows deleted from {csv_file}. Cleaned file saved as {cleaned_path}.")
-        else:
-            print(f"{csv_file} not found for cleaning.")
-        logging.info("Cleaning complete. See realtor_scraper_cleaner.log for details.")
+            search_zipcode(driver, zipcode, seen, store, fetcher, checkpoint, start)
+            checkpoint.finish(zipcode, store)
+            start = (1, 0, 0)
+        checkpoint.clear()
+        if fetcher:
+            logging.info(f"Detail pages fetched over HTTP: {fetcher.stats['http']}, in the browser: {fetcher.stats['browser']}")
     finally:
+        if store:
+            try:
+                # Bring the results CSV up to date for the cleaner and compiler
+                store.export()
+            finally:
+                store.close()
+        if seen:
+            seen.close()
         if driver:
             driver.quit()
+    if args.skip_clean:
+        logging.info("All zipcodes processed. Skipping cleaner (--skip-clean).")
+    else:
+        logging.info("All zipcodes processed. Applying cleaner logic to realtor_results.csv...")
+        cleaning.clean_results(RESULTS_CSV)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,24 @@
 import logging
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 import time
-import csv
 import re
+from scraper_args import parse_scraper_args, select_zipcodes
+from extraction import extract_fields, page_source, harvest_cards, maps_url
+from fetcher import HttpFetcher, load_listing
+from seen_index import SeenIndex
+from storage import open_store
+from checkpoint import Checkpoint
+import cleaning
+import browser
+from browser import DetailTab
+from waits import wait_for_element, wait_for_navigation, polite_delay
+from page_json import ld_json_items, dig, join_address, format_price, format_number, time_on_market, needs_dom_fallback, fill_missing
+
+# Source code used in the seen-listing index and the compiled SOURCE column
+SOURCE = 'RDFN'
+RESULTS_CSV = 'redfin_results.csv'
 
 ZIPCODES = [
     '33009', '33019', '33119', '33128', '33129', '33130',
@@ -13,185 +26,240 @@ ZIPCODES = [
     '33160', '33180', '33239'
 ]
 
-def setup_browser():
-    logging.info("Setting up browser...")
-    options = uc.ChromeOptions()
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-gpu')
-    driver = uc.Chrome(options=options, use_subprocess=True)
-    logging.info("Browser launched.")
-    # Set window to 1/4 of the screen and position it in the upper left corner
-    import ctypes
-    user32 = ctypes.windll.user32
-    screen_width = user32.GetSystemMetrics(0)
-    screen_height = user32.GetSystemMetrics(1)
-    window_width = int(screen_width / 2)
-    window_height = int(screen_height / 2)
-    window_x = 0
-    window_y = 0
-    driver.set_window_rect(window_x, window_y, window_width, window_height)
-    logging.info(f"Set window size to {window_width}x{window_height} at position ({window_x}, {window_y})")
-    return driver
+def setup_browser(args=None):
+    """Launch Chrome with the browser profile selected on the command line."""
+    return browser.setup_browser(
+        headless=True if args and args.headless else None,
+        block_resources=True if args and args.block_resources else None,
+        corner=None if args and args.no_window_layout else 'upper-left',
+    )
 
-def extract_mls(driver):
-    """Extract MLS number from Redfin property page"""
-    try:
-        mls_elem = driver.find_element(By.XPATH, "//div[contains(text(), 'MLS#')]")
-        mls_match = re.search(r'MLS#\s*([A-Z0-9\-]+)', mls_elem.text)
-        if mls_match:
-            return mls_match.group(1)
-    except Exception:
-        pass
+def extract_mls(text):
+    """Extract MLS number from the text of Redfin's 'MLS#' element"""
+    mls_match = re.search(r'MLS#\s*([A-Z0-9\-]+)', text)
+    if mls_match:
+        return mls_match.group(1)
     return ''
 
-def search_zipcode(driver, zipcode):
-    """Scrape Redfin for a given zipcode and save results to CSV."""
-    csv_file = 'redfin_results.csv'
-    headers = ['ZIPCODE', 'MLS', 'PRICE', 'ADDRESS', 'BEDS', 'BATHS', 'SQFT', 'URL', 'MAPS_URL', 'DAYS_ON_MARKET', 'AGENT_NAME', 'AGENT_PHONE', 'EMAIL']
-    import os
-    # Always ensure headers are present in the CSV
-    # Only write headers if file does not exist
-    if not os.path.exists(csv_file):
-        with open(csv_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-    saved_urls = set()
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if 'URL' in row and row['URL']:
-                    saved_urls.add(row['URL'])
-    except Exception:
-        pass
+# Detail page selectors, evaluated in one round trip by extraction.extract_fields
+DETAIL_FIELDS = {
+    'MLS': [(By.CSS_SELECTOR, "span.ListingSource--mlsId")],
+    'MLS_TEXT': [(By.XPATH, "//div[contains(text(), 'MLS#')]")],
+    'ADDRESS': [(By.CSS_SELECTOR, "h1.full-address.addressBannerRevamp.street-address")],
+    'PRICE': [(By.CSS_SELECTOR, "div.statsValue.price")],
+    'BEDS': [(By.CSS_SELECTOR, "div.stat-block.beds-section div.statsValue")],
+    'BATHS': [(By.CSS_SELECTOR, "div.stat-block.baths-section span.bp-DefinitionFlyout.bath-flyout.bp-DefinitionFlyout__underline")],
+    'SQFT': [(By.CSS_SELECTOR, "div.stat-block.sqft-section span.statsValue")],
+    'AGENT_NAME': [(By.CSS_SELECTOR, "span.agent-basic-details--heading span")],
+    'AGENT_PHONE': [(By.CSS_SELECTOR, "span[data-rf-test-id='agentInfoItem-agentPhoneNumber']")],
+    'DAYS_ON_MARKET': [(By.CSS_SELECTOR, "div.keyDetails-row div.keyDetails-value span.valueText")],
+}
+
+# Key content of a detail page, waited for before extracting it in the browser
+DETAIL_READY = DETAIL_FIELDS['PRICE'] + DETAIL_FIELDS['ADDRESS']
+
+# Redfin's server state escapes its JSON inside a JS string, so match both forms
+MLS_JSON_RE = re.compile(r'\\?"mlsId\\?"\s*:\s*(?:\{[^{}]*?\\?"value\\?"\s*:\s*)?\\?"([A-Za-z0-9\-]+)\\?"')
+# Listing agent of the server state, which the JSON-LD leaves out
+AGENT_NAME_JSON_RE = re.compile(r'\\?"agentName\\?"\s*:\s*\\?"([^"\\]+)\\?"')
+AGENT_PHONE_JSON_RE = re.compile(r'\\?"agentPhoneNumber\\?"\s*:\s*(?:\{[^{}]*?\\?"phoneNumber\\?"\s*:\s*)?\\?"([0-9()+.\- ]{7,})\\?"')
+
+# The server state also describes similar and nearby homes, so its values are
+# only taken from objects of the detail page's own home: those with its
+# propertyId, or the API responses whose key asks for it ('...?propertyId=123')
+STATE_TOKEN_RE = re.compile(r'[{}]|\\?"propertyId\\?"\s*:\s*(\d+)|[?&]propertyId=(\d+)(?=[^"\\]*\\?"\s*:\s*\{)')
+HOME_ID_RE = re.compile(r'/home/(\d+)')
+
+# Selectors run when the JSON has the listing but not its agent
+AGENT_FIELDS = ('AGENT_NAME', 'AGENT_PHONE')
+
+def home_id(url):
+    """Redfin's propertyId from a detail URL ('.../home/123456'), '' when it has none."""
+    match = HOME_ID_RE.search(url or '')
+    return match.group(1) if match else ''
+
+def property_spans(html):
+    """(start, end, propertyId) of the server state objects that belong to a home."""
+    spans, stack, key_id = [], [], None
+    for token in STATE_TOKEN_RE.finditer(html):
+        if token.group(0) == '{':
+            stack.append([token.start(), key_id])
+            key_id = None
+        elif token.group(0) == '}':
+            if stack:
+                start, owner = stack.pop()
+                if owner:
+                    spans.append((start, token.end(), owner))
+        elif token.group(1):
+            if stack:
+                stack[-1][1] = token.group(1)
+        else:
+            key_id = token.group(2)
+    return spans
+
+def subject_match(pattern, html, spans, home):
+    """First match of pattern whose innermost home object is home, None when there is none."""
+    if not home:
+        return None
+    for match in pattern.finditer(html):
+        owners = [span for span in spans if span[0] <= match.start() < span[1]]
+        if owners and max(owners)[2] == home:
+            return match
+    return None
+
+def listing_from_json(html, url=''):
+    """Map the JSON-LD listing (and the server state's agent) of a Redfin detail page to CSV fields, or None.
+
+    MLS and agent are read from the server state objects of the home in url only.
+    """
+    listing = next((item for item in ld_json_items(html) if 'offers' in item), None)
+    if listing is None:
+        return None
+    home = listing.get('mainEntity') or listing
+    address = home.get('address') or {}
+    spans, subject = property_spans(html), home_id(url)
+    mls_match = subject_match(MLS_JSON_RE, html, spans, subject)
+    agent_match = subject_match(AGENT_NAME_JSON_RE, html, spans, subject)
+    phone_match = subject_match(AGENT_PHONE_JSON_RE, html, spans, subject)
+    return {
+        'MLS': mls_match.group(1) if mls_match else '',
+        'ADDRESS': join_address(address.get('streetAddress'), address.get('addressLocality'), address.get('addressRegion'), address.get('postalCode')),
+        'PRICE': format_price(dig(listing, 'offers', 'price')),
+        'BEDS': format_number(home.get('numberOfBedrooms') or home.get('numberOfRooms')),
+        'BATHS': format_number(home.get('numberOfBathroomsTotal')),
+        'SQFT': format_number(dig(home, 'floorSize', 'value'), thousands=True),
+        'AGENT_NAME': agent_match.group(1).strip() if agent_match else '',
+        'AGENT_PHONE': phone_match.group(1).strip() if phone_match else '',
+        'DAYS_ON_MARKET': time_on_market(listing.get('datePosted')),
+    }
+
+def listing_from_dom(page, fields=None):
+    """Extract the detail fields with the DETAIL_FIELDS selectors, only those named in fields if given."""
+    spec = DETAIL_FIELDS if fields is None else {field: DETAIL_FIELDS[field] for field in fields}
+    data = extract_fields(page, spec)
+    mls_text = data.pop('MLS_TEXT', '')
+    if 'MLS' in data:
+        if data['MLS'].startswith('#'):
+            data['MLS'] = data['MLS'][1:].strip()
+        if not data['MLS']:
+            data['MLS'] = extract_mls(mls_text)
+    if 'AGENT_PHONE' in data:
+        # Remove '(agent)' if present
+        data['AGENT_PHONE'] = data['AGENT_PHONE'].replace('(agent)', '').strip()
+    return data
+
+def extract_listing(page, zipcode, href):
+    """Extract one Redfin detail page (a driver that has loaded it, or its HTML) into a CSV row dict.
+
+    The listing JSON embedded in the page source is used when present; the DOM
+    selectors fill in what it is missing, just the agent ones when only the
+    agent is.
+    """
+    data = listing_from_json(page_source(page), href)
+    if needs_dom_fallback(data):
+        data = fill_missing(data or {}, listing_from_dom(page))
+    elif not data['AGENT_NAME'] or not data['AGENT_PHONE']:
+        data = fill_missing(data, listing_from_dom(page, AGENT_FIELDS))
+    data['ZIPCODE'] = zipcode
+    data['URL'] = href
+    data['EMAIL'] = ''
+    data['MAPS_URL'] = maps_url(data['ADDRESS'])
+    return data
+
+# Search results cards and their detail links, for extraction.harvest_cards
+CARD_SELECTOR = "div.HomeCardContainer"
+CARD_LINK_SELECTOR = "a[href*='/home/']"
+
+def page_url(search_url, page):
+    """Search URL of results page page (Redfin takes it as a '/page-2' suffix)."""
+    return f"{search_url.rstrip('/')}/page-{page}"
+
+def search_zipcode(driver, zipcode, seen, store, fetcher=None, checkpoint=None, start=(1, 0, 0)):
+    """Scrape Redfin for a given zipcode, adding new listings to store.
+
+    start is the (page, card index, listings saved) to continue from, as
+    returned by Checkpoint.resume; progress is recorded in checkpoint.
+    """
     search_url = f"https://www.redfin.com/zipcode/{zipcode}/filter/sort=lo-days,min-price=200k,min-beds=2"
-    driver.get(search_url)
-    time.sleep(2)
+    start_page, skip, listings_processed = start
+    # A resumed run opens its results page directly instead of paging through the earlier ones
+    driver.get(page_url(search_url, start_page) if start_page > 1 else search_url)
+    wait_for_element(driver, (By.CSS_SELECTOR, CARD_SELECTOR))
+    # Detail pages are fetched over HTTP with this browser's cookies where possible
+    if fetcher:
+        fetcher.borrow_session(driver)
     MAX_LISTINGS = 20
-    listings_processed = 0
-    page_num = 1
-    while True:
-        # Find all property cards
-        cards = driver.find_elements(By.CSS_SELECTOR, "div.HomeCardContainer")
-        logging.info(f"Found {len(cards)} property cards to process on page {page_num}.")
-        hrefs = []
-        for card in cards:
-            try:
-                anchor = card.find_element(By.XPATH, ".//a[contains(@href, '/home/')]")
-                href = anchor.get_attribute('href')
-                if href:
-                    hrefs.append(href)
-            except Exception as e:
-                logging.debug(f"Card anchor extraction error: {e}")
-        consecutive_skips = 0
-        for href in hrefs:
-            if listings_processed >= MAX_LISTINGS:
-                logging.info(f"Reached {MAX_LISTINGS} listings for zipcode {zipcode}. Stopping.")
-                return
-            if href in saved_urls:
-                logging.info(f"Skipping already-saved property: {href}")
-                consecutive_skips += 1
-                if consecutive_skips >= 3:
-                    logging.info(f"Skipped 3 consecutive listings for zipcode {zipcode}. Assuming latest listings reached. Stopping.")
+    page_num = start_page
+    # Detail pages open in a side tab so the results page never has to be reloaded
+    with DetailTab(driver) as tab:
+        while True:
+            # Scroll the results and collect all property cards in one call
+            hrefs = harvest_cards(driver, CARD_SELECTOR, CARD_LINK_SELECTOR)
+            logging.info(f"Found {len(hrefs)} property cards to process on page {page_num}.")
+            consecutive_skips = 0
+            for index, href in enumerate(hrefs):
+                if index < skip:
+                    continue
+                if checkpoint:
+                    checkpoint.position(zipcode, page_num, index, listings_processed, store)
+                if listings_processed >= MAX_LISTINGS:
+                    logging.info(f"Reached {MAX_LISTINGS} listings for zipcode {zipcode}. Stopping.")
                     return
-                continue
-            else:
-                consecutive_skips = 0
-            try:
-                logging.info(f"Navigating to property card: {href}")
-                driver.get(href)
-                data = {}
-                data['ZIPCODE'] = zipcode
-                data['URL'] = href
-                try:
-                    mls_elem = driver.find_element(By.CSS_SELECTOR, "span.ListingSource--mlsId")
-                    mls_text = mls_elem.text.strip()
-                    if mls_text.startswith('#'):
-                        mls_text = mls_text[1:].strip()
-                    data['MLS'] = mls_text
-                except Exception:
-                    data['MLS'] = extract_mls(driver)
-                try:
-                    address_elem = driver.find_element(By.CSS_SELECTOR, "h1.full-address.addressBannerRevamp.street-address")
-                    data['ADDRESS'] = address_elem.text.strip()
-                except Exception:
-                    data['ADDRESS'] = ''
-                try:
-                    price_elem = driver.find_element(By.CSS_SELECTOR, "div.statsValue.price")
-                    data['PRICE'] = price_elem.text.strip()
-                except Exception:
-                    data['PRICE'] = ''
-                try:
-                    beds_elem = driver.find_element(By.CSS_SELECTOR, "div.stat-block.beds-section div.statsValue")
-                    data['BEDS'] = beds_elem.text.strip()
-                except Exception:
-                    data['BEDS'] = ''
-                try:
-                    baths_elem = driver.find_element(By.CSS_SELECTOR, "div.stat-block.baths-section span.bp-DefinitionFlyout.bath-flyout.bp-DefinitionFlyout__underline")
-                    data['BATHS'] = baths_elem.text.strip()
-                except Exception:
-                    data['BATHS'] = ''
-                try:
-                    sqft_elem = driver.find_element(By.CSS_SELECTOR, "div.stat-block.sqft-section span.statsValue")
-                    data['SQFT'] = sqft_elem.text.strip()
-                except Exception:
-                    data['SQFT'] = ''
-                try:
-                    agent_elem = driver.find_element(By.CSS_SELECTOR, "span.agent-basic-details--heading span")
-                    data['AGENT_NAME'] = agent_elem.text.strip()
-                except Exception:
-                    data['AGENT_NAME'] = ''
+                if seen.has(href):
+                    logging.info(f"Skipping already-saved property: {href}")
+                    consecutive_skips += 1
+                    if consecutive_skips >= 3:
+                        logging.info(f"Skipped 3 consecutive listings for zipcode {zipcode}. Assuming latest listings reached. Stopping.")
+                        return
+                    continue
+                else:
+                    consecutive_skips = 0
                 try:
-                    phone_elem = driver.find_element(By.CSS_SELECTOR, "span[data-rf-test-id='agentInfoItem-agentPhoneNumber']")
-                    phone_text = phone_elem.text.strip()
-                    # Remove '(agent)' if present
-                    phone_text = phone_text.replace('(agent)', '').strip()
-                    data['AGENT_PHONE'] = phone_text
-                except Exception:
-                    data['AGENT_PHONE'] = ''
-                data['EMAIL'] = ''
+                    logging.info(f"Navigating to property card: {href}")
+                    data = load_listing(driver, fetcher, href, lambda page: extract_listing(page, zipcode, href), open_page=tab.get, ready=DETAIL_READY)
+                    other_source = seen.captured_elsewhere(data.get('MLS'))
+                    if other_source:
+                        logging.info(f"Skipping MLS {data.get('MLS')}, already captured from {other_source}: {href}")
+                        seen.add(href)
+                        continue
+                    store.add(data)
+                    logging.info(f"Extracted and saved property data: {data}")
+                    listings_processed += 1
+                    # Persisted in the seen index once the store has flushed the row
+                    seen.mark(href)
+                except Exception as e:
+                    logging.error(f"Error processing property card: {e}")
+            # Go back to the results tab (still on this page) and try to go to next page
+            tab.back_to_results()
+            try:
+                next_btn = None
                 try:
-                    days_elem = driver.find_element(By.CSS_SELECTOR, "div.keyDetails-row div.keyDetails-value span.valueText")
-                    data['DAYS_ON_MARKET'] = days_elem.text.strip()
+                    next_btn = WebDriverWait(driver, 3).until(
+                        EC.element_to_be_clickable((By.CSS_SELECTOR, "button.PageArrow__direction--next"))
+                    )
                 except Exception:
-                    data['DAYS_ON_MARKET'] = ''
-                if data['ADDRESS']:
-                    maps_query = data['ADDRESS'].replace(' ', '+')
-                    data['MAPS_URL'] = f"https://www.google.com/maps/search/?api=1&query={maps_query}"
+                    pass
+                if next_btn and next_btn.is_displayed() and next_btn.is_enabled():
+                    polite_delay()
+                    old_url = driver.current_url
+                    old_cards = driver.find_elements(By.CSS_SELECTOR, CARD_SELECTOR)
+                    next_btn.click()
+                    logging.info(f"Successfully clicked next page link for page {page_num + 1}.")
+                    # Wait for the next results page to replace the current cards
+                    wait_for_navigation(driver, old_url, stale_element=old_cards[0] if old_cards else next_btn)
+                    page_num += 1
+                    skip = 0
+                    if checkpoint:
+                        checkpoint.position(zipcode, page_num, 0, listings_processed, store)
                 else:
-                    data['MAPS_URL'] = ''
-                with open(csv_file, 'a', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=headers)
-                    writer.writerow(data)
-                logging.info(f"Extracted and saved property data: {data}")
-                listings_processed += 1
-                saved_urls.add(href)
-                driver.get(search_url)
-            except Exception as e:
-                logging.error(f"Error processing property card: {e}")
-        # Try to go to next page
-        try:
-            next_btn = None
-            try:
-                next_btn = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, "button.PageArrow__direction--next"))
-                )
+                    logging.info("Next page link not enabled, not visible, or not found. Scraping complete.")
+                    break
             except Exception:
-                pass
-            if next_btn and next_btn.is_displayed() and next_btn.is_enabled():
-                time.sleep(2)
-                next_btn.click()
-                logging.info(f"Successfully clicked next page link for page {page_num + 1}.")
-                time.sleep(2)
-                page_num += 1
-            else:
-                logging.info("Next page link not enabled, not visible, or not found. Scraping complete.")
+                logging.info("No more pages found or next page link not clickable. Scraping complete.")
                 break
-        except Exception:
-            logging.info("No more pages found or next page link not clickable. Scraping complete.")
-            break
 
 def main():
+    args = parse_scraper_args("Scrape Redfin listings by zipcode.")
     log_filename = 'redfin_scraper.log'
     with open(log_filename, 'a', encoding='utf-8') as f:
         separator = "\n" + "="*80 + "\n"
@@ -209,64 +277,48 @@ def main():
     console.setFormatter(formatter)
     logging.getLogger('').addHandler(console)
 
+    if args.clean_only:
+        logging.info("Running cleaner only on redfin_results.csv...")
+        cleaning.clean_results(RESULTS_CSV)
+        return
+
     driver = None
+    seen = None
+    store = None
     try:
-        logging.info("Starting Redfin scraper...")
-        driver = setup_browser()
-        for zipcode in ZIPCODES:
+        zipcodes = select_zipcodes(ZIPCODES, args)
+        checkpoint = Checkpoint(SOURCE, zipcodes, args.shard)
+        zipcodes, start = checkpoint.resume() if args.resume else (zipcodes, (1, 0, 0))
+        logging.info(f"Starting Redfin scraper for {len(zipcodes)} zipcodes...")
+        driver = setup_browser(args)
+        fetcher = None if args.no_http else HttpFetcher()
+        seen = SeenIndex(SOURCE, skip_other_sources=args.skip_cross_source, bloom=args.seen_bloom)
+        seen.bootstrap(RESULTS_CSV)
+        store = open_store(args.storage, SOURCE, RESULTS_CSV, on_flush=seen.add_rows, emit=args.emit)
+        for zipcode in zipcodes:
             logging.info(f"Processing zipcode: {zipcode}")
-            search_zipcode(driver, zipcode)
-        logging.info("All zipcodes processed. Applying cleaner logic to redfin_results.csv...")
-        # Cleaner logic
-        import pandas as pd
-        import re
-        import os
-        csv_file = 'redfin_results.csv'
-        log_file = 'redfin_scraper_cleaner.log'
-        def valid_zipcode(val):
-            return bool(re.match(r'^\d{5}$', str(val).strip()))
-        def valid_mls(val):
-            s = str(val).strip()
-            return bool(re.match(r'^[A-Za-z0-9\-]+$', s)) and s and s.lower() != 'source'
-        def valid_price(val):
-            s = str(val).replace('$', '').replace(',', '').strip()
-            return bool(re.match(r'^\d+(\.\d+)?$', s)) and float(s) > 0
-        if os.path.exists(csv_file):
-            df = pd.read_csv(csv_file)
-            initial_count = len(df)
-            deleted_rows = []
-            # Clean ZIPCODE
-            if 'ZIPCODE' in df.columns:
-                mask_zip = df['ZIPCODE'].apply(valid_zipcode)
-                deleted_rows.extend(df[~mask_zip].to_dict('records'))
-                df = df[mask_zip]
-            # Clean MLS: remove rows where MLS is missing or invalid
-            if 'MLS' in df.columns:
-                mask_mls = df['MLS'].apply(lambda x: pd.notna(x) and str(x).strip() != '' and valid_mls(x))
-                deleted_rows.extend(df[~mask_mls].to_dict('records'))
-                df = df[mask_mls]
-            # Clean PRICE
-            if 'PRICE' in df.columns:
-                mask_price = df['PRICE'].apply(valid_price)
-                deleted_rows.extend(df[~mask_price].to_dict('records'))
-                df = df[mask_price]
-            final_count = len(df)
-            deleted_count = initial_count - final_count
-            cleaned_path = csv_file.replace('.csv', '_cleaned.csv')
-            df.to_csv(cleaned_path, index=False)
-            # Log deleted rows
-            with open(log_file, 'a', encoding='utf-8') as logf:
-                if deleted_count > 0:
-                    logf.write(f"{deleted_count} rows deleted from {csv_file}.\n")
-                    for row in deleted_rows:
-                        logf.write(f"Deleted from {csv_file}: {row}\n")
-            print(f"{deleted_count} rows deleted from {csv_file}. Cleaned file saved as {cleaned_path}.")
-        else:
-            print(f"{csv_file} not found for cleaning.")
-        logging.info("Cleaning complete. See redfin_scraper_cleaner.log for details.")
+            search_zipcode(driver, zipcode, seen, store, fetcher, checkpoint, start)
+            checkpoint.finish(zipcode, store)
+            start = (1, 0, 0)
+        checkpoint.clear()
+        if fetcher:
+            logging.info(f"Detail pages fetched over HTTP: {fetcher.stats['http']}, in the browser: {fetcher.stats['browser']}")
     finally:
+        if store:
+            try:
+                # Bring the results CSV up to date for the cleaner and compiler
+                store.export()
+            finally:
+                store.close()
+        if seen:
+            seen.close()
         if driver:
             driver.quit()
+    if args.skip_clean:
+        logging.info("All zipcodes processed. Skipping cleaner (--skip-clean).")
+    else:
+        logging.info("All zipcodes processed. Applying cleaner logic to redfin_results.csv...")
+        cleaning.clean_results(RESULTS_CSV)
 
 if __name__ == "__main__":
     main()
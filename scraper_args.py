@@ -0,0 +1,59 @@
+import argparse
+from storage import STORAGE_BACKENDS
+
+
+def parse_shard(value):
+    """Parse a 'i/n' shard spec into (index, count), index being 0-based."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected i/n (e.g. 0/4)")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', index must be in 0..n-1")
+    return index, count
+
+
+def parse_scraper_args(description, argv=None):
+    """Parse the command-line options shared by the site scrapers."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--shard', type=parse_shard, default=None,
+                        help="Only scrape shard i/n of the zipcode list (0-based, e.g. 0/4)")
+    parser.add_argument('--zipcodes', default=None,
+                        help="Comma-separated zipcodes to scrape instead of the built-in list")
+    parser.add_argument('--no-http', action='store_true',
+                        help="Load every detail page in the browser instead of trying plain HTTP first")
+    parser.add_argument('--headless', action='store_true',
+                        help="Run Chrome headless (automatic on Linux without a display); also blocks "
+                             "images/media/fonts/trackers and uses the eager page load strategy")
+    parser.add_argument('--block-resources', action='store_true',
+                        help="Block images, media, fonts, map tiles and trackers in a headed browser too")
+    parser.add_argument('--no-window-layout', action='store_true',
+                        help="Leave the browser window where Chrome puts it instead of tiling it")
+    parser.add_argument('--skip-cross-source', action='store_true',
+                        help="Do not save listings whose MLS was already captured by another scraper")
+    parser.add_argument('--seen-bloom', action='store_true',
+                        help="Keep only a Bloom filter of seen listing IDs in memory (for very large histories)")
+    parser.add_argument('--storage', choices=STORAGE_BACKENDS, default='sqlite',
+                        help="Where scraped rows are buffered: a shared SQLite database exported to the "
+                             "results CSV at the end of the run, or direct batched CSV appends")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted run from its checkpoint (zipcode, results page and card)")
+    parser.add_argument('--emit', action='store_true',
+                        help="Also write every stored listing to stdout as a JSON line for the pipelined orchestrator")
+    parser.add_argument('--skip-clean', action='store_true',
+                        help="Do not run the cleaner after scraping (the orchestrator cleans once per source)")
+    parser.add_argument('--clean-only', action='store_true',
+                        help="Only run the cleaner on the results CSV, without opening a browser")
+    return parser.parse_args(argv)
+
+
+def select_zipcodes(zipcodes, args):
+    """Return the zipcodes this process should scrape given --zipcodes/--shard."""
+    if args.zipcodes:
+        selected = [z.strip() for z in args.zipcodes.split(',') if z.strip()]
+    else:
+        selected = list(zipcodes)
+    if args.shard:
+        index, count = args.shard
+        selected = selected[index::count]
+    return selected
@@ -0,0 +1,125 @@
+import os
+import re
+import csv
+import time
+import sqlite3
+import logging
+from listing_ids import canonical_id, SeenSet, BloomFilter
+
+SEEN_DB = 'seen_listings.db'
+
+# PRAGMA user_version of the current schema; 0 is the original URL-keyed table
+SCHEMA_VERSION = 1
+
+def mls_key(mls):
+    """MLS number without any 'MLS#:' label, upper-cased, so sources compare equal."""
+    return re.sub(r'^\s*MLS\s*#?\s*:?\s*', '', str(mls or ''), flags=re.I).strip().upper()
+
+class SeenIndex:
+    """Persistent index of listings already captured, shared across runs and sources.
+
+    Backed by SQLite (WAL mode, so sharded workers can use it concurrently)
+    and keyed by listing_ids.canonical_id. Each instance is bound to one
+    source code ('ZLW', 'RLTR', 'RDFN'). has() answers from an in-memory
+    SeenSet of ID hashes loaded at open; with bloom=True only a Bloom filter
+    is kept in memory and its hits are confirmed in the database. With
+    skip_other_sources, a listing whose MLS was already captured by another
+    source is reported by captured_elsewhere().
+    """
+
+    def __init__(self, source, path=SEEN_DB, skip_other_sources=False, bloom=False, timeout=30):
+        self.source = source
+        self.skip_other_sources = skip_other_sources
+        self.bloom = bloom
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+        ids = [row[0] for row in self.conn.execute('SELECT listing_key FROM seen')]
+        if bloom:
+            self.memory = BloomFilter(max(len(ids) * 2, 100000), ids=ids)
+        else:
+            self.memory = SeenSet(ids)
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS seen ('
+                ' listing_key TEXT PRIMARY KEY,'
+                ' source TEXT NOT NULL,'
+                ' mls TEXT,'
+                ' url TEXT,'
+                ' seen_at REAL)'
+            )
+            self.conn.execute('CREATE TABLE IF NOT EXISTS imported (csv_file TEXT PRIMARY KEY, imported_at REAL)')
+            if version < 1:
+                # Re-key rows written under the URL-based key on their canonical ID
+                rows = self.conn.execute('SELECT source, mls, url, seen_at FROM seen').fetchall()
+                self.conn.execute('DELETE FROM seen')
+                self.conn.executemany('INSERT OR IGNORE INTO seen VALUES (?, ?, ?, ?, ?)',
+                                      [(canonical_id(url), source, mls, url, seen_at) for source, mls, url, seen_at in rows])
+                if rows:
+                    logging.info(f"Migrated {len(rows)} seen listings to canonical listing IDs.")
+            self.conn.execute('CREATE INDEX IF NOT EXISTS seen_mls ON seen (mls)')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def bootstrap(self, csv_file):
+        """One-time import of a results CSV written before the index existed."""
+        if self.conn.execute('SELECT 1 FROM imported WHERE csv_file = ?', (csv_file,)).fetchone():
+            return
+        rows = []
+        if os.path.exists(csv_file):
+            with open(csv_file, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if row.get('URL'):
+                        rows.append((canonical_id(row['URL']), self.source, mls_key(row.get('MLS')), row['URL'], time.time()))
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self.conn.executemany('INSERT OR IGNORE INTO seen VALUES (?, ?, ?, ?, ?)', rows)
+            self.conn.execute('INSERT OR IGNORE INTO imported VALUES (?, ?)', (csv_file, time.time()))
+        for row in rows:
+            self.memory.add(row[0])
+        logging.info(f"Imported {len(rows)} listings from {csv_file} into the seen-listing index.")
+
+    def has(self, url):
+        """True if this listing was already captured (by any source), under any URL variant."""
+        listing_id = canonical_id(url)
+        if listing_id not in self.memory:
+            return False
+        if not self.bloom:
+            return True
+        return self.conn.execute('SELECT 1 FROM seen WHERE listing_key = ?', (listing_id,)).fetchone() is not None
+
+    def captured_elsewhere(self, mls):
+        """Source that already captured this MLS, if skipping other sources' listings is on."""
+        mls = mls_key(mls)
+        if not self.skip_other_sources or not mls:
+            return None
+        row = self.conn.execute('SELECT source FROM seen WHERE mls = ? AND source != ? LIMIT 1', (mls, self.source)).fetchone()
+        return row[0] if row else None
+
+    def add(self, url, mls=''):
+        """Record a captured listing; committed immediately."""
+        listing_id = canonical_id(url)
+        self.conn.execute('INSERT OR IGNORE INTO seen VALUES (?, ?, ?, ?, ?)',
+                          (listing_id, self.source, mls_key(mls), url, time.time()))
+        self.memory.add(listing_id)
+
+    def mark(self, url):
+        """Remember a listing for the rest of this run only; add()/add_rows() persist it."""
+        self.memory.add(canonical_id(url))
+
+    def add_rows(self, rows):
+        """Record a batch of stored result rows in one transaction."""
+        values = [(canonical_id(row['URL']), self.source, mls_key(row.get('MLS')), row['URL'], time.time())
+                  for row in rows if row.get('URL')]
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self.conn.executemany('INSERT OR IGNORE INTO seen VALUES (?, ?, ?, ?, ?)', values)
+        for value in values:
+            self.memory.add(value[0])
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,215 @@
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import logging
+from datetime import datetime, timezone
+from listing_ids import canonical_id
+
+LISTINGS_DB = 'listings.db'
+
+# Columns of the *_results.csv files read by the cleaners and the compiler
+RESULT_HEADERS = ['ZIPCODE', 'MLS', 'PRICE', 'ADDRESS', 'BEDS', 'BATHS', 'SQFT', 'URL', 'MAPS_URL', 'DAYS_ON_MARKET', 'AGENT_NAME', 'AGENT_PHONE', 'EMAIL', 'SCRAPED_AT']
+
+STORAGE_BACKENDS = ('sqlite', 'csv')
+
+# Prefix of the stdout lines written with emit, one JSON listing row each,
+# so the orchestrator can tell them from the scrapers' other output
+EMIT_PREFIX = 'LISTING\t'
+
+def emit_rows(source, rows, stream=None):
+    """Write rows to stdout as EMIT_PREFIX + JSON lines, with their SOURCE."""
+    stream = stream or sys.stdout
+    for row in rows:
+        stream.write(EMIT_PREFIX + json.dumps(dict(row, SOURCE=source)) + '\n')
+    stream.flush()
+
+def parse_emitted(line):
+    """The row of an emit_rows line, None for any other line."""
+    if not line.startswith(EMIT_PREFIX):
+        return None
+    try:
+        return json.loads(line[len(EMIT_PREFIX):])
+    except ValueError:
+        return None
+
+def write_csv_atomic(csv_file, headers, rows):
+    """Write rows to csv_file through a temporary file, so readers never see a partial file."""
+    tmp_file = f"{csv_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=headers, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_file, csv_file)
+
+class ListingStore:
+    """Buffers scraped rows and writes them in batches.
+
+    A batch is flushed once batch_size rows are buffered, when add() is called
+    flush_interval seconds after the last flush, and on close(), so a crash
+    loses at most one batch. on_flush(rows) is called after each batch has
+    been written, e.g. to mark the rows as seen only once they are durable.
+    With emit the written rows are also emitted on stdout (emit_rows) for
+    the pipelined orchestrator. Subclasses implement _write(rows) and
+    export().
+    """
+
+    def __init__(self, source, results_csv, headers=RESULT_HEADERS, batch_size=25, flush_interval=30, on_flush=None, emit=False):
+        self.source = source
+        self.on_flush = on_flush
+        self.emit = emit
+        self.results_csv = results_csv
+        self.headers = list(headers)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def add(self, row):
+        row = dict(row)
+        if not row.get('SCRAPED_AT'):
+            row['SCRAPED_AT'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self._write(self.buffer)
+            if self.on_flush:
+                self.on_flush(self.buffer)
+            if self.emit:
+                emit_rows(self.source, self.buffer)
+            logging.info(f"Stored {len(self.buffer)} {self.source} listings.")
+            self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def export(self):
+        """Bring results_csv up to date with everything stored."""
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class CsvListingStore(ListingStore):
+    """Appends each batch to the results CSV in a single write."""
+
+    def __init__(self, source, results_csv, headers=RESULT_HEADERS, **kwargs):
+        super().__init__(source, results_csv, headers, **kwargs)
+        if not os.path.exists(results_csv) or os.path.getsize(results_csv) == 0:
+            with open(results_csv, 'w', newline='', encoding='utf-8') as f:
+                csv.DictWriter(f, fieldnames=self.headers).writeheader()
+        else:
+            # Keep appending in the column order of an existing (possibly older) file
+            with open(results_csv, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                existing = reader.fieldnames or []
+                missing = [h for h in self.headers if h not in existing]
+                rows = list(reader) if existing and missing else None
+            if rows is not None:
+                # Files from before SCRAPED_AT (or other new columns) get them added once,
+                # empty for the rows already there
+                write_csv_atomic(results_csv, existing + missing, rows)
+                logging.info(f"Added {', '.join(missing)} to the header of {results_csv}.")
+            self.headers = existing + missing if existing else self.headers
+
+    def _write(self, rows):
+        with open(self.results_csv, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.headers, extrasaction='ignore')
+            writer.writerows(rows)
+
+class SqliteListingStore(ListingStore):
+    """Commits each batch to a shared SQLite (WAL) database in one transaction.
+
+    Safe for several workers at once. Rows are keyed by source and canonical
+    listing ID, so a re-scraped listing replaces its earlier row. export()
+    rewrites results_csv atomically from the database; the existing CSV is
+    imported once on first use so earlier runs are not lost. stored_at is
+    the database's own write time, SCRAPED_AT the row's scrape time.
+    """
+
+    def __init__(self, source, results_csv, headers=RESULT_HEADERS, path=LISTINGS_DB, timeout=30, **kwargs):
+        super().__init__(source, results_csv, headers, **kwargs)
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        quoted = [f'"{h}"' for h in self.headers]
+        self._insert_sql = (
+            f'INSERT OR REPLACE INTO listings (source, listing_key, {", ".join(quoted)}, stored_at) '
+            f'VALUES ({", ".join("?" * (len(self.headers) + 3))})'
+        )
+        columns = ', '.join(f'{q} TEXT' for q in quoted)
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS listings ('
+                ' source TEXT NOT NULL,'
+                ' listing_key TEXT NOT NULL,'
+                f' {columns},'
+                ' stored_at REAL,'
+                ' PRIMARY KEY (source, listing_key))'
+            )
+            self.conn.execute('CREATE TABLE IF NOT EXISTS imported (csv_file TEXT PRIMARY KEY, imported_at REAL)')
+            existing = {row[1]: row[2] for row in self.conn.execute('PRAGMA table_info(listings)')}
+            if existing.get('scraped_at') == 'REAL':
+                # Databases from before SCRAPED_AT kept the write time under that name;
+                # SQLite column names ignore case, so it has to make way for SCRAPED_AT
+                self.conn.execute('ALTER TABLE listings RENAME COLUMN scraped_at TO stored_at')
+                existing['stored_at'] = existing.pop('scraped_at')
+            existing = {name.lower() for name in existing}
+            for header in self.headers:
+                if header.lower() not in existing:
+                    self.conn.execute(f'ALTER TABLE listings ADD COLUMN "{header}" TEXT')
+            if not self.conn.execute('SELECT 1 FROM imported WHERE csv_file = ?', (results_csv,)).fetchone():
+                self._import_csv()
+
+    def _import_csv(self):
+        rows = []
+        if os.path.exists(self.results_csv):
+            with open(self.results_csv, 'r', encoding='utf-8') as f:
+                rows = [row for row in csv.DictReader(f) if row.get('URL')]
+        self._insert(rows, stored_at=0)
+        self.conn.execute('INSERT OR IGNORE INTO imported VALUES (?, ?)', (self.results_csv, time.time()))
+        logging.info(f"Imported {len(rows)} rows from {self.results_csv} into {self.source} storage.")
+
+    def _insert(self, rows, stored_at=None):
+        stored_at = time.time() if stored_at is None else stored_at
+        self.conn.executemany(
+            self._insert_sql,
+            [(self.source, canonical_id(row.get('URL') or ''), *(row.get(h, '') for h in self.headers), stored_at) for row in rows],
+        )
+
+    def _write(self, rows):
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self._insert(rows)
+
+    def export(self):
+        self.flush()
+        columns = ', '.join(f'"{h}"' for h in self.headers)
+        cursor = self.conn.execute(f'SELECT {columns} FROM listings WHERE source = ? ORDER BY stored_at, rowid', (self.source,))
+        rows = [dict(zip(self.headers, values)) for values in cursor]
+        write_csv_atomic(self.results_csv, self.headers, rows)
+        logging.info(f"Exported {len(rows)} {self.source} listings to {self.results_csv}.")
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+
+def open_store(backend, source, results_csv, **kwargs):
+    """Listing store for backend ('sqlite' or 'csv')."""
+    if backend == 'csv':
+        return CsvListingStore(source, results_csv, **kwargs)
+    if backend == 'sqlite':
+        return SqliteListingStore(source, results_csv, **kwargs)
+    raise ValueError(f"Unknown storage backend '{backend}', expected one of {STORAGE_BACKENDS}")
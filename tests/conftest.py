@@ -0,0 +1,59 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+# The modules live in the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FixtureServer:
+    """Local HTTP server answering GET/POST with handle(method, path, body) -> (status, html)."""
+
+    def __init__(self, handle):
+        self.hits = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else ''
+                server.hits.append((method, self.path))
+                status, html = handle(method, self.path, body)
+                data = html.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply('GET')
+
+            def do_POST(self):
+                self._reply('POST')
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def fixture_server():
+    """Factory for FixtureServers that are shut down after the test."""
+    servers = []
+
+    def start(handle):
+        servers.append(FixtureServer(handle))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
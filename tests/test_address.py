@@ -0,0 +1,25 @@
+import pandas as pd
+from address import address_keys, parse_address
+
+def test_parse_address_splits_and_normalizes_the_parts():
+    assert parse_address('1913 S Ocean Dr APT 410, Hallandale, FL 33009') == ('1913', 'S OCEAN DR', '410', 'HALLANDALE BEACH', '33009')
+    assert parse_address('1500 Bay Rd #PH-5, Miami Beach, FL 33139') == ('1500', 'BAY RD', 'PH5', 'MIAMI BEACH', '33139')
+
+def test_only_the_street_type_is_abbreviated():
+    assert parse_address('2000 Island Blvd, Aventura, FL 33160')[1] == 'ISLAND BLVD'
+    assert parse_address('2000 Island Boulevard, Aventura, FL 33160')[1] == 'ISLAND BLVD'
+    assert parse_address('100 Harbour Point Drive, Miami, FL 33131')[1] == 'HARBOUR POINT DR'
+    assert parse_address('40 Court Street, Miami, FL 33131')[1] == 'COURT ST'
+    assert parse_address('5 Star Island, Miami Beach, FL 33139')[1] == 'STAR IS'
+    assert parse_address('300 Ocean Drive North, Miami Beach, FL 33139')[1] == 'OCEAN DR N'
+
+def test_address_keys_match_spellings_of_the_same_unit():
+    keys = address_keys(pd.Series([
+        '2000 Island Blvd Apt 1203, Aventura, FL 33160',
+        '2000 ISLAND BOULEVARD #1203, Aventura, FL 33160',
+        '2000 Island Blvd Apt 1204, Aventura, FL 33160',
+        'Aventura, FL 33160',
+    ]))
+    assert keys[0] == keys[1] == '33160|2000|ISLAND BLVD|1203'
+    assert keys[2] != keys[0]
+    assert pd.isna(keys[3])
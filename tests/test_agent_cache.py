@@ -0,0 +1,40 @@
+import agent_cache
+import pandas as pd
+from agent_cache import AgentEmailCache, CACHE_HEADERS, attach_emails, shared_cache
+
+OLD_FILE = 'AGENT_NAME,EMAIL\nJane Doe,jane@example.com\n'
+
+def test_readers_leave_old_files_alone(tmp_path):
+    path = tmp_path / 'nestfully_emails.csv'
+    path.write_text(OLD_FILE)
+    df = pd.DataFrame({'AGENT_NAME': ['Jane Doe'], 'EMAIL': ['']})
+    assert attach_emails(df, shared_cache(str(path)))['EMAIL'].tolist() == ['jane@example.com']
+    assert path.read_text() == OLD_FILE
+
+def test_writer_upgrades_the_file_before_appending(tmp_path):
+    path = tmp_path / 'nestfully_emails.csv'
+    path.write_text(OLD_FILE)
+    AgentEmailCache(str(path)).record('Bob Roe', '', 'bob@example.com')
+    lines = path.read_text().splitlines()
+    assert lines[0] == ','.join(CACHE_HEADERS)
+    assert [line.split(',')[1] for line in lines[1:]] == ['Jane Doe', 'Bob Roe']
+
+def test_shared_cache_is_reread_after_the_file_changes(tmp_path):
+    path = str(tmp_path / 'nestfully_emails.csv')
+    cache = shared_cache(path)
+    assert shared_cache(path) is cache
+    AgentEmailCache(path).record('Bob Roe', '', 'bob@example.com')
+    assert shared_cache(path) is not cache
+    assert shared_cache(path).lookup('Bob Roe', '') == 'bob@example.com'
+
+def test_file_is_read_again_only_for_the_upgrade(tmp_path, monkeypatch):
+    path = tmp_path / 'nestfully_emails.csv'
+    path.write_text(OLD_FILE)
+    cache = AgentEmailCache(str(path))
+    reads = []
+    read_entries = agent_cache._read_entries
+    monkeypatch.setattr(agent_cache, '_read_entries', lambda p: reads.append(p) or read_entries(p))
+    for i in range(3):
+        cache.record(f"Agent{i} Roe", '', '')
+    assert len(reads) == 1
+    assert len(path.read_text().splitlines()) == 5
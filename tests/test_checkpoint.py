@@ -0,0 +1,31 @@
+from checkpoint import Checkpoint
+
+class Store:
+    def __init__(self):
+        self.buffer = []
+
+    def flush(self):
+        self.buffer = []
+
+def test_resume_continues_at_the_saved_card(tmp_path):
+    store = Store()
+    checkpoint = Checkpoint('ZLW', ['33139', '33140'], directory=str(tmp_path))
+    assert checkpoint.resume() == (['33139', '33140'], (1, 0, 0))
+    checkpoint.position('33139', 2, 5, 30, store)
+    assert Checkpoint('ZLW', ['33139', '33140'], directory=str(tmp_path)).resume() == (['33139', '33140'], (2, 5, 30))
+    checkpoint.finish('33139', store)
+    assert Checkpoint('ZLW', ['33139', '33140'], directory=str(tmp_path)).resume() == (['33140'], (1, 0, 0))
+    checkpoint.clear()
+    assert Checkpoint('ZLW', ['33139', '33140'], directory=str(tmp_path)).resume() == (['33139', '33140'], (1, 0, 0))
+
+def test_position_is_not_written_while_rows_are_buffered(tmp_path):
+    store = Store()
+    checkpoint = Checkpoint('RDFN', ['33139'], shard=(1, 2), directory=str(tmp_path))
+    checkpoint.position('33139', 1, 4, 4, store)
+    store.buffer.append({'URL': 'x'})
+    checkpoint.position('33139', 1, 9, 9, store)
+    assert Checkpoint('RDFN', ['33139'], shard=(1, 2), directory=str(tmp_path)).resume() == (['33139'], (1, 4, 4))
+
+def test_checkpoint_for_other_zipcodes_is_ignored(tmp_path):
+    Checkpoint('RLTR', ['33139'], directory=str(tmp_path)).position('33139', 3, 1, 40, Store())
+    assert Checkpoint('RLTR', ['33140'], directory=str(tmp_path)).resume() == (['33140'], (1, 0, 0))
@@ -0,0 +1,19 @@
+import pandas as pd
+from cleaning import clean_results, reject_reasons
+
+def test_reject_reasons_name_the_first_failed_check():
+    df = pd.DataFrame({
+        'ZIPCODE': ['33139', '3313', '33139', '33139', '33139', '33139'],
+        'MLS': ['A11111111', 'A1', 'source', 'A1 #2', '', 'B2'],
+        'PRICE': ['$450,000', 'bad', '$1', '$1', '$1,200,000', '$0'],
+    })
+    assert reject_reasons(df).tolist() == ['', 'ZIPCODE', 'MLS', 'MLS', '', 'PRICE']
+
+def test_clean_results_splits_kept_and_quarantined_rows(tmp_path):
+    results_csv = tmp_path / 'zillow_results.csv'
+    results_csv.write_text('ZIPCODE,MLS,PRICE,BEDS\n33139,A11111111,"$450,000",2\n33139,A2,Call for price,3\n')
+    assert clean_results(str(results_csv)) == (1, 1)
+    kept = pd.read_csv(tmp_path / 'zillow_results_cleaned.csv', dtype=str)
+    rejected = pd.read_csv(tmp_path / 'zillow_results_rejected.csv', dtype=str)
+    assert kept['MLS'].tolist() == ['A11111111'] and kept['PRICE_NUM'].tolist() == ['450000']
+    assert rejected[['MLS', 'REJECT_REASON']].values.tolist() == [['A2', 'PRICE']]
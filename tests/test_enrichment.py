@@ -0,0 +1,36 @@
+import threading
+import time
+from agent_cache import AgentEmailCache
+from enrichment import EnrichmentPool, RateLimiter
+
+class SlowWorker:
+    """Worker whose lookups wait until release is set."""
+
+    def __init__(self, release, names):
+        self.release = release
+        self.names = names
+
+    def lookup(self, agent_name, phone=''):
+        self.release.wait()
+        self.names.append(agent_name)
+        return f"{agent_name.split()[0].lower()}@example.com", 'FL'
+
+    def close(self):
+        pass
+
+def test_non_blocking_submit_backlogs_agents_while_the_queue_is_full(tmp_path):
+    release, names = threading.Event(), []
+    cache = AgentEmailCache(str(tmp_path / 'nestfully_emails.csv'))
+    pool = EnrichmentPool(lambda limiter: SlowWorker(release, names), 1, cache, RateLimiter(0), queue_size=1)
+    agents = [(f"Agent{i} Smith", f"(305) 555-010{i}") for i in range(5)]
+    started = time.monotonic()
+    assert all(pool.submit(name, phone, block=False) for name, phone in agents)
+    assert time.monotonic() - started < 1
+    assert pool.backlog
+    # Already submitted, also when it is still in the backlog
+    assert not pool.submit(*agents[-1], block=False)
+    release.set()
+    results = pool.close()
+    assert sorted(names) == sorted(name for name, _ in agents)
+    assert len(results) == 5 and not pool.backlog
+    assert cache.lookup('Agent4 Smith', '(305) 555-0104') == 'agent4@example.com'
@@ -0,0 +1,115 @@
+from extraction import extract_fields, page_text
+from fetcher import HttpFetcher, load_listing
+
+DETAIL_PAGE = """<html><head><style>.price { color: red }</style></head><body>
+<h1 class="address">1 Ocean Dr, Miami, FL 33139</h1>
+<span class="price">$450,000</span>
+<div class="mls">MLS# A11111111</div>
+<script>window.state = {"mls": "MLS# B22222222"};</script>
+</body></html>"""
+
+BOT_WALL_PAGE = """<html><body><div id="px-captcha"></div>
+<p>Press & Hold to confirm you are a human.</p></body></html>"""
+
+ROUTES = {
+    '/detail': (200, DETAIL_PAGE),
+    '/wall': (200, BOT_WALL_PAGE),
+    '/forbidden': (403, 'Forbidden'),
+    '/slow-down': (429, 'Too Many Requests'),
+    '/empty': (200, '<html><body><h1 class="address">2 Bay Rd</h1></body></html>'),
+}
+
+FIELDS = {
+    'ADDRESS': [('css selector', 'h1.address')],
+    'PRICE': [('css selector', 'span.price')],
+    'MLS': [('css selector', 'div.mls')],
+}
+
+BROWSER_ROW = {'ADDRESS': 'from browser', 'PRICE': '$1', 'MLS': 'BROWSER'}
+
+class FakeDriver:
+    def __init__(self):
+        self.opened = []
+
+    def get(self, url):
+        self.opened.append(url)
+
+def extract(page):
+    if isinstance(page, FakeDriver):
+        return dict(BROWSER_ROW)
+    return extract_fields(page, FIELDS)
+
+def serve(fixture_server):
+    return fixture_server(lambda method, path, body: ROUTES.get(path, (404, 'Not found')))
+
+def test_detail_page_is_extracted_over_http(fixture_server):
+    server = serve(fixture_server)
+    fetcher, driver = HttpFetcher(), FakeDriver()
+    data = load_listing(driver, fetcher, f"{server.url}/detail", extract)
+    assert data == {'ADDRESS': '1 Ocean Dr, Miami, FL 33139', 'PRICE': '$450,000', 'MLS': 'MLS# A11111111'}
+    assert driver.opened == []
+    assert fetcher.stats == {'http': 1, 'browser': 0}
+
+def test_page_text_leaves_out_script_and_style(fixture_server):
+    server = serve(fixture_server)
+    text = page_text(HttpFetcher().fetch_html(f"{server.url}/detail"))
+    assert 'A11111111' in text
+    assert 'B22222222' not in text
+    assert 'color' not in text
+
+def test_blocked_responses_fall_back_to_the_browser(fixture_server):
+    server = serve(fixture_server)
+    for path in ('/wall', '/forbidden', '/slow-down'):
+        fetcher, driver = HttpFetcher(), FakeDriver()
+        data = load_listing(driver, fetcher, f"{server.url}{path}", extract)
+        assert data == BROWSER_ROW
+        assert driver.opened == [f"{server.url}{path}"]
+        assert fetcher.blocked == 1
+        assert fetcher.stats == {'http': 0, 'browser': 1}
+
+def test_page_missing_listing_data_is_loaded_in_the_browser(fixture_server):
+    server = serve(fixture_server)
+    fetcher, driver = HttpFetcher(), FakeDriver()
+    assert load_listing(driver, fetcher, f"{server.url}/empty", extract) == BROWSER_ROW
+    assert driver.opened == [f"{server.url}/empty"]
+    # Not a bot wall, HTTP stays enabled
+    assert fetcher.blocked == 0
+
+def test_http_stops_after_max_blocked_until_session_is_borrowed(fixture_server):
+    server = serve(fixture_server)
+    fetcher, driver = HttpFetcher(max_blocked=2), FakeDriver()
+    for _ in range(2):
+        load_listing(driver, fetcher, f"{server.url}/slow-down", extract)
+    assert not fetcher.enabled
+    hits = len(server.hits)
+    # Disabled: straight to the browser without another request
+    assert load_listing(driver, fetcher, f"{server.url}/detail", extract) == BROWSER_ROW
+    assert len(server.hits) == hits
+    assert fetcher.stats == {'http': 0, 'browser': 3}
+
+    class WarmBrowser:
+        def execute_script(self, script):
+            return 'Mozilla/5.0 test'
+
+        def get_cookies(self):
+            return [{'name': 'session', 'value': 'abc', 'domain': '127.0.0.1', 'path': '/'}]
+
+    fetcher.borrow_session(WarmBrowser())
+    assert fetcher.enabled
+    assert load_listing(driver, fetcher, f"{server.url}/detail", extract)['PRICE'] == '$450,000'
+    assert fetcher.session.headers['User-Agent'] == 'Mozilla/5.0 test'
+
+def test_browser_path_waits_for_the_ready_selector(fixture_server):
+    server = serve(fixture_server)
+
+    class RenderingDriver(FakeDriver):
+        polls = 0
+
+        def find_elements(self, by, selector):
+            # The key element shows up on the third poll
+            self.polls += 1
+            return ['price'] if self.polls >= 3 else []
+
+    driver = RenderingDriver()
+    load_listing(driver, HttpFetcher(), f"{server.url}/wall", extract, ready=[('css selector', 'span.price')])
+    assert driver.polls == 3
@@ -0,0 +1,16 @@
+from listing_ids import BloomFilter, SeenSet, canonical_id
+
+def test_canonical_id_ignores_slugs_and_query_strings():
+    assert canonical_id('https://www.zillow.com/homedetails/1-Ocean-Dr/12345_zpid/') == 'ZLW:12345'
+    assert canonical_id('https://www.zillow.com/homedetails/1-Ocean-Dr-APT-5/12345_zpid/?utm=x#photos') == 'ZLW:12345'
+    assert canonical_id('https://www.realtor.com/realestateandhomes-detail/1-Ocean-Dr_Miami-Beach_FL_33139_M64907-12238?from=srp') == 'RLTR:M64907-12238'
+    assert canonical_id('https://www.redfin.com/FL/Miami-Beach/1-Ocean-Dr-33139/unit-5/home/42424242') == 'RDFN:42424242'
+
+def test_unknown_urls_fall_back_to_host_and_path():
+    assert canonical_id('https://Example.com/listing/7/?ref=1') == 'example.com/listing/7'
+
+def test_seen_sets_remember_ids():
+    for seen in (SeenSet(['ZLW:1']), BloomFilter(1000, ids=['ZLW:1'])):
+        seen.add('RDFN:2')
+        assert 'ZLW:1' in seen and 'RDFN:2' in seen
+        assert 'RLTR:M3-3' not in seen
@@ -0,0 +1,31 @@
+import pandas as pd
+from listings_compiler import merge_listings, merge_rows, SOURCE_PRIORITY
+
+def rows(*records):
+    return pd.DataFrame(records, columns=['LISTING_KEY', 'MLS', 'AGENT_PHONE', 'SOURCE']).astype('string')
+
+def test_agent_phone_prefers_the_agents_direct_number_over_realtors_office_line():
+    merged = merge_rows(rows(
+        ('A1', 'A1', '(305) 555-0000', 'RLTR'),
+        ('A1', 'A1', '(305) 555-1111', 'RDFN'),
+        ('A1', 'A1', '(305) 555-2222', 'ZLW'),
+    ), SOURCE_PRIORITY)
+    assert merged.loc[0, 'AGENT_PHONE'] == '(305) 555-2222'
+
+def test_agent_phone_falls_back_to_the_next_source_with_a_value():
+    merged = merge_rows(rows(
+        ('A1', 'A1', '(305) 555-0000', 'RLTR'),
+        ('A1', 'A1', '(305) 555-1111', 'RDFN'),
+        ('A1', 'A1', '', 'ZLW'),
+    ), SOURCE_PRIORITY)
+    assert merged.loc[0, 'AGENT_PHONE'] == '(305) 555-1111'
+    assert merged.loc[0, 'FIELD_SOURCES'] == 'AGENT_PHONE=RDFN'
+
+def test_key_and_provenance_columns_follow_the_scraped_ones():
+    new = pd.DataFrame([
+        ('33139', 'A1', '$1', '1 Ocean Dr, Miami Beach, FL 33139', 'https://www.zillow.com/homedetails/x/1_zpid/', 'Jane Doe', 'JANE DOE', 'ZLW'),
+        ('33139', 'A1', '$2', '1 Ocean Drive, Miami Beach, FL 33139', 'https://www.realtor.com/x_M1-1', 'Jane Doe', 'JANE DOE', 'RLTR'),
+    ], columns=['ZIPCODE', 'MLS', 'PRICE', 'ADDRESS', 'URL', 'AGENT_NAME', 'AGENT_ID', 'SOURCE']).astype('string')
+    combined, appended = merge_listings(pd.DataFrame(), new)
+    assert list(combined.columns) == ['ZIPCODE', 'MLS', 'PRICE', 'ADDRESS', 'URL', 'AGENT_NAME', 'SOURCE',
+                                      'LISTING_KEY', 'ADDRESS_KEY', 'AGENT_ID', 'FIELD_SOURCES']
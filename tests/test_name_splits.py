@@ -0,0 +1,17 @@
+from name_splits import NameSplitter, candidate_patterns, is_confident_match
+
+def test_candidate_patterns_start_with_first_and_last_name():
+    assert candidate_patterns(1) == []
+    assert candidate_patterns(2) == ['FL', '-L']
+    assert candidate_patterns(3)[:2] == ['--L', 'F-L']
+
+def test_splits_follow_the_patterns_that_found_emails():
+    splitter = NameSplitter()
+    assert splitter.splits('Melissa Lynn Aptakin, P.A.')[0] == ('--L', '', 'Aptakin')
+    splitter.record('F-L')
+    assert splitter.splits('Melissa Lynn Aptakin')[0] == ('F-L', 'Melissa', 'Aptakin')
+
+def test_confident_match_needs_first_and_last_name():
+    assert is_confident_match('Melissa L. Aptakin', 'Melissa Lynn Aptakin')
+    assert not is_confident_match('Mark Aptakin', 'Melissa Lynn Aptakin')
+    assert not is_confident_match('Aptakin', 'Aptakin')
@@ -0,0 +1,147 @@
+from urllib.parse import parse_qs
+import pytest
+from lxml import html as lxml_html
+from nestfully_http import HttpWorker, NestfullyBlocked, NestfullyClient, SEARCH_PATH, parse_email, parse_results
+
+SEARCH_PAGE = """<html><body><form method="post" action="./search.aspx" id="aspnetForm">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="search-state" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="search-validation" />
+<input type="text" name="ctl00$Master$FirstName" id="Master_FirstName" />
+<input type="text" name="ctl00$Master$LastName" id="Master_LastName" />
+<input type="submit" name="ctl00$Master$Search" value="Search" />
+</form></body></html>"""
+
+RESULTS_PAGE = """<html><body><form method="post" action="./search.aspx" id="aspnetForm">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="results-state" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="results-validation" />
+<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="" />
+<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="" />
+{links}
+</form></body></html>"""
+
+RESULT_LINK = ("""<div class="result"><a class="ao_results_icon_text A detail-page" """
+               """href="javascript:__doPostBack('ctl00$Results$Agent{i}','')">{name}</a>"""
+               """<span>Office: {phone}</span></div>""")
+
+DETAIL_PAGE = """<html><body><h1>{name}</h1>
+<a id="hlAgentEmailAddress" href="mailto:{email}">Email {first}</a></body></html>"""
+
+BLOCK_PAGE = """<html><body><div id="px-captcha"></div>
+<p>Press & Hold to confirm you are a human.</p></body></html>"""
+
+AGENTS = [('Jane Smith', 'jane.smith@example.com', '(305) 555-0100'), ('John Smith', 'john@example.com', '(305) 555-0101'),
+          ('John Smith', 'john.smith@example.com', '954.555.0199')]
+
+class Directory:
+    """Stand-in of the ASP.NET agent directory; block=True answers every request with a bot wall."""
+
+    def __init__(self):
+        self.block = False
+        self.posts = []
+
+    def __call__(self, method, path, body):
+        if self.block:
+            return 200, BLOCK_PAGE
+        if not path.startswith(SEARCH_PATH):
+            return 404, 'Not found'
+        if method == 'GET':
+            return 200, SEARCH_PAGE
+        form = {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+        self.posts.append(form)
+        if form.get('__EVENTTARGET'):
+            if form.get('__VIEWSTATE') != 'results-state':
+                return 500, 'Invalid postback or callback argument'
+            name, email, _ = AGENTS[int(form['__EVENTTARGET'].rsplit('Agent', 1)[1])]
+            return 200, DETAIL_PAGE.format(name=name, email=email, first=name.split()[0])
+        if form.get('__VIEWSTATE') != 'search-state' or 'ctl00$Master$Search' not in form:
+            return 500, 'Invalid postback or callback argument'
+        first, last = form.get('ctl00$Master$FirstName', ''), form.get('ctl00$Master$LastName', '')
+        links = [RESULT_LINK.format(i=i, name=name, phone=phone) for i, (name, _, phone) in enumerate(AGENTS)
+                 if name.split()[-1] == last and (not first or name.split()[0] == first)]
+        return 200, RESULTS_PAGE.format(links='\n'.join(links))
+
+def serve(fixture_server):
+    directory = Directory()
+    return directory, fixture_server(directory)
+
+def test_search_posts_the_form_with_its_state(fixture_server):
+    directory, server = serve(fixture_server)
+    tree, url = NestfullyClient(server.url).search('John', 'Smith')
+    assert url == f"{server.url}{SEARCH_PATH}"
+    assert parse_results(tree) == [('John Smith', "javascript:__doPostBack('ctl00$Results$Agent1','')", {'+13055550101'}),
+                                   ('John Smith', "javascript:__doPostBack('ctl00$Results$Agent2','')", {'+19545550199'})]
+    form = directory.posts[-1]
+    assert form['__EVENTVALIDATION'] == 'search-validation'
+    assert form['ctl00$Master$FirstName'] == 'John'
+    assert form['ctl00$Master$Search'] == 'Search'
+
+def test_parse_email_reads_the_email_link():
+    tree = lxml_html.fromstring(DETAIL_PAGE.format(name='Jane Smith', email='jane.smith@example.com', first='Jane'))
+    assert parse_email(tree) == 'jane.smith@example.com'
+    assert parse_email(lxml_html.fromstring('<html><body>No email</body></html>')) == ''
+
+def test_lookup_follows_the_postback_link(fixture_server):
+    directory, server = serve(fixture_server)
+    assert NestfullyClient(server.url).lookup('Jane Smith') == ('jane.smith@example.com', 'FL')
+    assert directory.posts[-1]['__EVENTTARGET'] == 'ctl00$Results$Agent0'
+    assert directory.posts[-1]['__EVENTVALIDATION'] == 'results-validation'
+
+def test_lookup_tells_namesakes_apart_by_phone(fixture_server):
+    directory, server = serve(fixture_server)
+    client = NestfullyClient(server.url)
+    assert client.lookup('John Smith', '+1 954 555 0199') == ('john.smith@example.com', 'FL')
+    # Without the phone, or with one no result shows, the first match is taken
+    assert client.lookup('John Smith') == ('john@example.com', 'FL')
+    assert client.lookup('John Smith', '(786) 555-0000') == ('john@example.com', 'FL')
+
+def test_lookup_without_a_confident_match_finds_nothing(fixture_server):
+    directory, server = serve(fixture_server)
+    assert NestfullyClient(server.url).lookup('Maria Garcia') == ('', '')
+
+def test_blocked_client_raises(fixture_server):
+    directory, server = serve(fixture_server)
+    directory.block = True
+    with pytest.raises(NestfullyBlocked):
+        NestfullyClient(server.url).lookup('Jane Smith')
+
+def test_worker_switches_to_the_browser_when_blocked(fixture_server):
+    directory, server = serve(fixture_server)
+
+    class FakeBrowserWorker:
+        closed = False
+
+        def __init__(self):
+            self.names = []
+
+        def lookup(self, agent_name, phone=''):
+            self.names.append(agent_name)
+            return 'from-browser@example.com', 'FL'
+
+        def close(self):
+            self.closed = True
+
+    browsers = []
+
+    def open_browser():
+        browsers.append(FakeBrowserWorker())
+        return browsers[-1]
+
+    worker = HttpWorker(open_browser=open_browser, base_url=server.url)
+    assert worker.lookup('Jane Smith') == ('jane.smith@example.com', 'FL')
+    assert browsers == []
+    directory.block = True
+    assert worker.lookup('John Smith') == ('from-browser@example.com', 'FL')
+    hits = len(server.hits)
+    # Once switched the worker stays in the browser
+    directory.block = False
+    assert worker.lookup('Jane Smith') == ('from-browser@example.com', 'FL')
+    assert len(server.hits) == hits
+    assert len(browsers) == 1 and browsers[0].names == ['John Smith', 'Jane Smith']
+    worker.close()
+    assert browsers[0].closed
+
+def test_worker_without_a_browser_reraises(fixture_server):
+    directory, server = serve(fixture_server)
+    directory.block = True
+    with pytest.raises(NestfullyBlocked):
+        HttpWorker(base_url=server.url).lookup('Jane Smith')
@@ -0,0 +1,32 @@
+import io
+import pandas as pd
+from normalize import normalize, read_listings
+
+def test_normalize_parses_the_scraped_text():
+    df = normalize(pd.DataFrame({
+        'PRICE': ['$295,000', 'Contact agent'],
+        'BEDS': ['2', ''],
+        'BATHS': ['2.5', '1'],
+        'SQFT': ['1,250', '-'],
+        'DAYS_ON_MARKET': ['3 days', '18 hours'],
+        'AGENT_PHONE': ['(954) 545-5583', '754-802-9634,'],
+        'SCRAPED_AT': ['2026-10-10T12:00:00+00:00', ''],
+    }))
+    assert df['PRICE_NUM'].tolist() == [295000, pd.NA]
+    assert df['BATHS_NUM'].tolist() == [2.5, 1.0]
+    assert df['SQFT_NUM'].tolist() == [1250, pd.NA]
+    assert df['HOURS_ON_MARKET'].tolist() == [72.0, 18.0]
+    assert df['PHONE_E164'].tolist() == ['+19545455583', '+17548029634']
+    # Only rows with a scrape time get a listing date
+    assert df.loc[0, 'LISTED_AT'] == pd.Timestamp('2026-10-07T12:00:00+00:00')
+    assert pd.isna(df.loc[1, 'LISTED_AT'])
+
+def test_read_listings_keeps_text_and_types_the_normalized_columns():
+    buffer = io.StringIO()
+    normalize(pd.DataFrame({'ZIPCODE': ['09001'], 'PRICE': ['$1,000'], 'DAYS_ON_MARKET': ['1 day'],
+                            'SCRAPED_AT': ['2026-10-10T00:00:00+00:00']})).to_csv(buffer, index=False)
+    buffer.seek(0)
+    df = read_listings(buffer)
+    assert df.loc[0, 'ZIPCODE'] == '09001'
+    assert str(df['PRICE_NUM'].dtype) == 'Int64' and df.loc[0, 'PRICE_NUM'] == 1000
+    assert df.loc[0, 'LISTED_AT'] == pd.Timestamp('2026-10-09T00:00:00+00:00')
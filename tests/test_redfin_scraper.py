@@ -0,0 +1,44 @@
+import json
+from redfin_scraper import home_id, listing_from_json
+
+URL = 'https://www.redfin.com/FL/Miami-Beach/1-Ocean-Dr-33139/unit-5/home/111'
+
+LD_JSON = json.dumps({
+    '@type': 'RealEstateListing',
+    'offers': {'price': 450000},
+    'mainEntity': {
+        'address': {'streetAddress': '1 Ocean Dr #5', 'addressLocality': 'Miami Beach', 'addressRegion': 'FL', 'postalCode': '33139'},
+        'numberOfBedrooms': 2, 'numberOfBathroomsTotal': 2, 'floorSize': {'value': 1100},
+    },
+})
+
+def home_state(property_id, mls, agent, phone):
+    return {'propertyId': property_id, 'listingInfo': {'mlsId': {'label': 'MLS#', 'value': mls}},
+            'listingAgents': [{'agentInfo': {'agentName': agent, 'agentPhoneNumber': {'phoneNumber': phone}}}]}
+
+def page(state):
+    # Redfin escapes its API responses inside JS strings
+    text = json.dumps('{}&&' + json.dumps({'payload': state}))
+    return (f'<html><head><script type="application/ld+json">{LD_JSON}</script></head><body><script>'
+            f'root.__reactServerState.InitialContext = {{"dataCache": {{"/stingray/api/home/details/aboveTheFold?propertyId=111&accessLevel=1": {{"res": {{"text": {text}}}}}}}}};'
+            f'</script></body></html>')
+
+NEARBY = home_state(222, 'N2222222', 'Nearby Agent', '305-555-0222')
+
+def test_home_id_comes_from_the_detail_url():
+    assert home_id(URL) == '111'
+    assert home_id('https://www.redfin.com/zipcode/33139') == ''
+
+def test_server_state_values_of_nearby_homes_are_ignored():
+    state = {'similarHomes': [NEARBY], 'home': home_state(111, 'A1111111', 'Jane Doe', '305-555-0111')}
+    data = listing_from_json(page(state), URL)
+    assert (data['MLS'], data['AGENT_NAME'], data['AGENT_PHONE']) == ('A1111111', 'Jane Doe', '305-555-0111')
+    assert data['PRICE'] == '$450,000'
+
+def test_fields_named_in_an_api_response_for_the_home_are_used():
+    state = {'mainHouseInfo': {'listingAgents': [{'agentInfo': {'agentName': 'Jane Doe'}}]}, 'nearby': [NEARBY]}
+    assert listing_from_json(page(state), URL)['AGENT_NAME'] == 'Jane Doe'
+
+def test_only_other_homes_leave_the_fields_to_the_dom():
+    data = listing_from_json(page({'similarHomes': [NEARBY]}).replace('propertyId=111', 'propertyId=999'), URL)
+    assert (data['MLS'], data['AGENT_NAME'], data['AGENT_PHONE']) == ('', '', '')
@@ -0,0 +1,29 @@
+import pytest
+from seen_index import SeenIndex
+
+ZILLOW_URL = 'https://www.zillow.com/homedetails/1-Ocean-Dr/12345_zpid/'
+
+@pytest.mark.parametrize('bloom', [False, True])
+def test_has_matches_any_url_variant_of_a_listing(tmp_path, bloom):
+    index = SeenIndex('ZLW', path=str(tmp_path / 'seen.db'), bloom=bloom)
+    assert not index.has(ZILLOW_URL)
+    index.add_rows([{'URL': ZILLOW_URL, 'MLS': 'MLS# A11111111'}])
+    assert index.has('https://www.zillow.com/homedetails/1-Ocean-Dr-APT-5/12345_zpid/?utm_source=share')
+    index.close()
+    # Persisted across runs
+    assert SeenIndex('ZLW', path=str(tmp_path / 'seen.db'), bloom=bloom).has(ZILLOW_URL)
+
+def test_mark_only_lasts_for_the_run(tmp_path):
+    path = str(tmp_path / 'seen.db')
+    index = SeenIndex('RDFN', path=path)
+    index.mark('https://www.redfin.com/FL/Miami/1-Ocean-Dr-33139/home/42?x=1')
+    assert index.has('https://www.redfin.com/FL/Miami/1-Ocean-Dr-33139/unit-1/home/42')
+    index.close()
+    assert not SeenIndex('RDFN', path=path).has('https://www.redfin.com/FL/Miami/1-Ocean-Dr-33139/home/42')
+
+def test_captured_elsewhere_compares_mls_numbers(tmp_path):
+    path = str(tmp_path / 'seen.db')
+    SeenIndex('ZLW', path=path).add(ZILLOW_URL, 'MLS#: a11111111')
+    assert SeenIndex('RLTR', path=path, skip_other_sources=True).captured_elsewhere('A11111111') == 'ZLW'
+    assert SeenIndex('RLTR', path=path).captured_elsewhere('A11111111') is None
+    assert SeenIndex('ZLW', path=path, skip_other_sources=True).captured_elsewhere('A11111111') is None
@@ -0,0 +1,82 @@
+import csv
+import sqlite3
+from storage import RESULT_HEADERS, open_store
+
+ROW = {'ZIPCODE': '33139', 'MLS': 'A11111111', 'PRICE': '$450,000', 'ADDRESS': '1 Ocean Dr, Miami Beach, FL 33139',
+       'URL': 'https://www.zillow.com/homedetails/1-Ocean-Dr/12345_zpid/'}
+
+# Header of the results CSVs from before SCRAPED_AT
+OLD_HEADERS = [h for h in RESULT_HEADERS if h != 'SCRAPED_AT']
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+def test_fresh_sqlite_store_exports_scraped_at(tmp_path):
+    results_csv = str(tmp_path / 'zillow_results.csv')
+    with open_store('sqlite', 'ZLW', results_csv, path=str(tmp_path / 'listings.db')) as store:
+        store.add(ROW)
+        store.export()
+    headers, rows = read_csv(results_csv)
+    assert headers == RESULT_HEADERS
+    assert rows[0]['MLS'] == 'A11111111' and rows[0]['SCRAPED_AT']
+
+def test_sqlite_store_opens_a_database_from_before_scraped_at(tmp_path):
+    db = str(tmp_path / 'listings.db')
+    results_csv = str(tmp_path / 'zillow_results.csv')
+    quoted = ', '.join(f'"{h}" TEXT' for h in OLD_HEADERS)
+    conn = sqlite3.connect(db)
+    conn.execute(f'CREATE TABLE listings (source TEXT NOT NULL, listing_key TEXT NOT NULL, {quoted}, scraped_at REAL, PRIMARY KEY (source, listing_key))')
+    conn.execute('CREATE TABLE imported (csv_file TEXT PRIMARY KEY, imported_at REAL)')
+    conn.execute('INSERT INTO listings (source, listing_key, "MLS", "URL", scraped_at) VALUES (?, ?, ?, ?, ?)',
+                 ('ZLW', 'old', 'B22222222', 'https://www.zillow.com/homedetails/2-Bay-Rd/67890_zpid/', 1.0))
+    conn.execute('INSERT INTO imported VALUES (?, 0)', (results_csv,))
+    conn.commit()
+    conn.close()
+    with open_store('sqlite', 'ZLW', results_csv, path=db) as store:
+        store.add(ROW)
+        store.export()
+    headers, rows = read_csv(results_csv)
+    assert headers == RESULT_HEADERS
+    # Rows keep their write order across the renamed column
+    assert [row['MLS'] for row in rows] == ['B22222222', 'A11111111']
+    assert rows[0]['SCRAPED_AT'] == '' and rows[1]['SCRAPED_AT']
+
+def test_csv_store_adds_scraped_at_to_an_old_results_file(tmp_path):
+    results_csv = str(tmp_path / 'realtor_results.csv')
+    with open(results_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=OLD_HEADERS)
+        writer.writeheader()
+        writer.writerow({'MLS': 'B22222222', 'URL': 'https://www.realtor.com/realestateandhomes-detail/2-Bay-Rd_M1'})
+    with open_store('csv', 'RLTR', results_csv) as store:
+        store.add(ROW)
+    headers, rows = read_csv(results_csv)
+    assert headers == OLD_HEADERS + ['SCRAPED_AT']
+    assert [row['MLS'] for row in rows] == ['B22222222', 'A11111111']
+    assert rows[0]['SCRAPED_AT'] == '' and rows[1]['SCRAPED_AT']
+
+def test_store_flushes_full_batches_and_exports_one_row_per_listing(tmp_path):
+    results_csv = str(tmp_path / 'zillow_results.csv')
+    flushed = []
+    store = open_store('sqlite', 'ZLW', results_csv, path=str(tmp_path / 'listings.db'), batch_size=2, on_flush=lambda rows: flushed.append(len(rows)))
+    store.add(ROW)
+    assert flushed == []
+    store.add(dict(ROW, MLS='B22222222', URL='https://www.zillow.com/homedetails/2-Bay-Rd/67890_zpid/'))
+    assert flushed == [2]
+    # The same listing under another URL replaces its row
+    store.add(dict(ROW, PRICE='$440,000', URL=ROW['URL'] + '?utm_source=share'))
+    store.export()
+    store.close()
+    assert flushed == [2, 1]
+    headers, rows = read_csv(results_csv)
+    assert [(row['MLS'], row['PRICE']) for row in rows] == [('B22222222', '$450,000'), ('A11111111', '$440,000')]
+
+def test_csv_store_appends_each_batch(tmp_path):
+    results_csv = str(tmp_path / 'redfin_results.csv')
+    with open_store('csv', 'RDFN', results_csv, batch_size=10) as store:
+        store.add(ROW)
+        assert read_csv(results_csv)[1] == []
+    headers, rows = read_csv(results_csv)
+    assert headers == RESULT_HEADERS
+    assert rows[0]['URL'] == ROW['URL']
@@ -0,0 +1,106 @@
+import os
+import time
+import random
+import logging
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+# How long to wait for a page condition before giving up, in seconds
+DEFAULT_TIMEOUT = float(os.environ.get('SCRAPER_WAIT_TIMEOUT', '15'))
+
+def _parse_delay(value):
+    low, _, high = value.partition(',')
+    low = float(low or 0)
+    return low, float(high) if high else low
+
+# Deliberate politeness delay between actions on the same site, as "min,max"
+# seconds (e.g. SCRAPER_POLITE_DELAY=1,3). Kept separate from the waits below,
+# which only wait as long as the page actually needs. Off by default.
+POLITE_DELAY = _parse_delay(os.environ.get('SCRAPER_POLITE_DELAY', '0'))
+
+def polite_delay(delay=None):
+    """Sleep for the configured politeness delay, if any."""
+    low, high = delay or POLITE_DELAY
+    if high > 0:
+        time.sleep(random.uniform(low, high))
+
+def _wait(driver, timeout):
+    return WebDriverWait(driver, DEFAULT_TIMEOUT if timeout is None else timeout, poll_frequency=0.1)
+
+def wait_for_ready(driver, timeout=None, states=('interactive', 'complete')):
+    """Wait until document.readyState is one of states; True if it got there in time."""
+    try:
+        _wait(driver, timeout).until(lambda d: d.execute_script("return document.readyState") in states)
+        return True
+    except Exception:
+        logging.debug(f"Timed out waiting for readyState in {states}")
+        return False
+
+def wait_for_element(driver, locator, timeout=None, clickable=False):
+    """Wait for an element to be present (or clickable); returns it, or None on timeout."""
+    condition = EC.element_to_be_clickable(locator) if clickable else EC.presence_of_element_located(locator)
+    try:
+        return _wait(driver, timeout).until(condition)
+    except Exception:
+        logging.debug(f"Timed out waiting for element {locator}")
+        return None
+
+def wait_for_any(driver, locators, timeout=None):
+    """Wait until any of the locators matches; returns the first matching element, or None."""
+    def first_match(d):
+        for locator in locators:
+            found = d.find_elements(*locator)
+            if found:
+                return found[0]
+        return False
+    try:
+        return _wait(driver, timeout).until(first_match)
+    except Exception:
+        logging.debug(f"Timed out waiting for any of {locators}")
+        return None
+
+def wait_for_url_change(driver, old_url, timeout=None):
+    """Wait until the current URL differs from old_url; True if it changed in time."""
+    try:
+        _wait(driver, timeout).until(lambda d: d.current_url != old_url)
+        return True
+    except Exception:
+        return False
+
+def wait_for_navigation(driver, old_url, stale_element=None, timeout=None):
+    """Wait for a click/submit to replace the current page.
+
+    With stale_element (an element of the old page) the page counts as replaced
+    once that element is detached, which covers full loads, same-URL form
+    postbacks and client-side re-renders alike; without it, once the URL
+    changes. The new document then has to reach readyState.
+    """
+    def navigated(d):
+        if stale_element is not None:
+            return EC.staleness_of(stale_element)(d)
+        return d.current_url != old_url
+    try:
+        _wait(driver, timeout).until(navigated)
+    except Exception:
+        logging.debug(f"Timed out waiting for navigation away from {old_url}")
+        return False
+    return wait_for_ready(driver, timeout)
+
+NETWORK_IDLE_JS = "return performance.getEntriesByType('resource').length;"
+
+def wait_for_network_idle(driver, idle_time=0.5, timeout=None):
+    """Wait until no new resource requests have started for idle_time seconds."""
+    deadline = time.monotonic() + (DEFAULT_TIMEOUT if timeout is None else timeout)
+    last_count, last_change = -1, time.monotonic()
+    while time.monotonic() < deadline:
+        try:
+            count = driver.execute_script(NETWORK_IDLE_JS)
+        except Exception:
+            return False
+        now = time.monotonic()
+        if count != last_count:
+            last_count, last_change = count, now
+        elif now - last_change >= idle_time:
+            return True
+        time.sleep(0.1)
+    return False
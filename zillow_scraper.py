@@ -1,12 +1,25 @@
 import logging
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 import time
-import csv
 import re
-import os
+import json
+from scraper_args import parse_scraper_args, select_zipcodes
+from extraction import extract_fields, page_source, harvest_cards, maps_url
+from fetcher import HttpFetcher, load_listing
+from seen_index import SeenIndex
+from storage import open_store
+from checkpoint import Checkpoint
+import cleaning
+import browser
+from browser import DetailTab
+from waits import wait_for_element, wait_for_navigation, polite_delay
+from page_json import next_data, find_dict, join_address, format_price, format_number, needs_dom_fallback, fill_missing
+
+# Source code used in the seen-listing index and the compiled SOURCE column
+SOURCE = 'ZLW'
+RESULTS_CSV = 'zillow_results.csv'
 
 ZIPCODES = [
     '33009', '33019', '33119', '33128', '33129', '33130',
@@ -14,198 +27,186 @@ ZIPCODES = [
     '33160', '33180', '33239'
 ]
 
-def setup_browser():
-    logging.info("Setting up browser...")
-    options = uc.ChromeOptions()
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-gpu')
-    driver = uc.Chrome(options=options, use_subprocess=True)
-    logging.info("Browser launched.")
-    # Set window to 1/4 of the screen and position it in the upper right corner
-    import ctypes
-    user32 = ctypes.windll.user32
-    screen_width = user32.GetSystemMetrics(0)
-    screen_height = user32.GetSystemMetrics(1)
-    window_width = int(screen_width / 2)
-    window_height = int(screen_height / 2)
-    window_x = screen_width - window_width
-    window_y = 0
-    driver.set_window_rect(window_x, window_y, window_width, window_height)
-    logging.info(f"Set window size to {window_width}x{window_height} at position ({window_x}, {window_y})")
-    return driver
+def setup_browser(args=None):
+    """Launch Chrome with the browser profile selected on the command line."""
+    return browser.setup_browser(
+        headless=True if args and args.headless else None,
+        block_resources=True if args and args.block_resources else None,
+        corner=None if args and args.no_window_layout else 'upper-right',
+    )
+
+# Detail page selectors, evaluated in one round trip by extraction.extract_fields
+DETAIL_FIELDS = {
+    'MLS': [(By.XPATH, "//span[contains(text(), 'MLS#')]")],
+    'ADDRESS': [(By.XPATH, "//h1[@itemprop='address']")],
+    'PRICE': [(By.XPATH, "//span[@data-testid='price']")],
+    'BEDS': [(By.XPATH, "//span[@data-testid='bed']")],
+    'BATHS': [(By.XPATH, "//span[@data-testid='bath']")],
+    'SQFT': [(By.XPATH, "//span[@data-testid='sqft']")],
+    'AGENT_NAME': [(By.XPATH, "//span[contains(@class, 'ListingAgentName')]")],
+    'AGENT_PHONE': [(By.XPATH, "//a[contains(@href, 'tel:')]")],
+    'DAYS_ON_MARKET': [(By.XPATH, "//span[contains(text(), 'days on Zillow')]")],
+}
 
-def search_zipcode(driver, zipcode):
-    """Scrape Zillow for a given zipcode and save results to CSV."""
-    csv_file = 'zillow_results.csv'
-    headers = ['ZIPCODE', 'MLS', 'PRICE', 'ADDRESS', 'BEDS', 'BATHS', 'SQFT', 'URL', 'MAPS_URL', 'DAYS_ON_MARKET', 'AGENT_NAME', 'AGENT_PHONE', 'EMAIL']
-    # Always ensure headers are present in the CSV
-    write_headers = False
-    if not os.path.exists(csv_file):
-        write_headers = True
+# Key content of a detail page, waited for before extracting it in the browser
+DETAIL_READY = DETAIL_FIELDS['PRICE'] + DETAIL_FIELDS['ADDRESS']
+
+def listing_from_json(html):
+    """Map the property record embedded in a Zillow detail page to CSV fields, or None."""
+    page_data = next_data(html)
+    if not page_data:
+        return None
+    is_property = lambda d: 'zpid' in d and 'price' in d and 'address' in d
+    prop = None
+    cache = find_dict(page_data, lambda d: 'gdpClientCache' in d)
+    if cache:
+        # gdpClientCache is itself a JSON string keyed by the GraphQL query
+        entries = cache['gdpClientCache']
+        if isinstance(entries, str):
+            try:
+                entries = json.loads(entries)
+            except ValueError:
+                entries = {}
+        prop = find_dict(entries, is_property)
+    if prop is None:
+        prop = find_dict(page_data, is_property)
+    if prop is None:
+        return None
+    address = prop.get('address') or {}
+    attribution = prop.get('attributionInfo') or {}
+    if isinstance(prop.get('timeOnZillow'), str):
+        days_on_market = prop['timeOnZillow']
+    elif prop.get('daysOnZillow') is not None:
+        days_on_market = f"{prop['daysOnZillow']} days"
     else:
-        try:
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                first_line = f.readline()
-                if not first_line or not all(h in first_line for h in headers):
-                    write_headers = True
-        except Exception:
-            write_headers = True
-    if write_headers:
-        with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-    saved_urls = set()
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if 'URL' in row and row['URL']:
-                    saved_urls.add(row['URL'])
-    except Exception:
-        pass
+        days_on_market = ''
+    return {
+        'MLS': str(prop.get('mlsid') or attribution.get('mlsId') or ''),
+        'ADDRESS': join_address(address.get('streetAddress'), address.get('city'), address.get('state'), address.get('zipcode')),
+        'PRICE': format_price(prop.get('price')),
+        'BEDS': format_number(prop.get('bedrooms')),
+        'BATHS': format_number(prop.get('bathrooms')),
+        'SQFT': format_number(prop.get('livingArea'), thousands=True),
+        'AGENT_NAME': attribution.get('agentName') or '',
+        'AGENT_PHONE': attribution.get('agentPhoneNumber') or '',
+        'DAYS_ON_MARKET': days_on_market,
+    }
+
+def listing_from_dom(page):
+    """Extract the detail fields with the DETAIL_FIELDS selectors."""
+    data = extract_fields(page, DETAIL_FIELDS)
+    match = re.search(r'MLS#?:?\s*([A-Za-z0-9\-]+)', data['MLS'])
+    data['MLS'] = match.group(1) if match else ''
+    return data
+
+def extract_listing(page, zipcode, href):
+    """Extract one Zillow detail page (a driver that has loaded it, or its HTML) into a CSV row dict.
+
+    The listing JSON embedded in the page source is used when present; the DOM
+    selectors only fill in what it is missing.
+    """
+    data = listing_from_json(page_source(page))
+    if needs_dom_fallback(data):
+        data = fill_missing(data or {}, listing_from_dom(page))
+    data['ZIPCODE'] = zipcode
+    data['URL'] = href
+    data['EMAIL'] = ''
+    # Construct Google Maps link from address if available
+    data['MAPS_URL'] = maps_url(data['ADDRESS'])
+    return data
+
+# Search results cards and their detail links, for extraction.harvest_cards
+CARD_SELECTOR = "article[data-test='property-card']"
+CARD_LINK_SELECTOR = "a[href*='/homedetails/']"
+
+def page_url(search_url, page):
+    """Search URL of results page page (Zillow takes it as a '/2_p/' path segment)."""
+    base, _, query = search_url.partition('?')
+    return f"{base.rstrip('/')}/{page}_p/" + (f"?{query}" if query else '')
+
+def search_zipcode(driver, zipcode, seen, store, fetcher=None, checkpoint=None, start=(1, 0, 0)):
+    """Scrape Zillow for a given zipcode, adding new listings to store.
+
+    start is the (page, card index, listings saved) to continue from, as
+    returned by Checkpoint.resume; progress is recorded in checkpoint.
+    """
     # Use provided filtered URL for Hallandale FL 33009, otherwise default pattern
     if zipcode == '33009':
         search_url = "https://www.zillow.com/hallandale-fl-33009/?searchQueryState=%7B%22pagination%22%3A%7B%7D%2C%22isMapVisible%22%3Atrue%2C%22mapBounds%22%3A%7B%22west%22%3A-80.1939404527588%2C%22east%22%3A-80.09351854724122%2C%22south%22%3A25.955104049959537%2C%22north%22%3A26.01759803433258%7D%2C%22regionSelection%22%3A%5B%7B%22regionId%22%3A72347%2C%22regionType%22%3A7%7D%5D%2C%22filterState%22%3A%7B%22sort%22%3A%7B%22value%22%3A%22days%22%7D%2C%22price%22%3A%7B%22min%22%3A200000%7D%2C%22mp%22%3A%7B%22min%22%3A987%7D%2C%22beds%22%3A%7B%22min%22%3A2%7D%7D%2C%22isListVisible%22%3Atrue%2C%22mapZoom%22%3A14%2C%22usersSearchTerm%22%3A%22Hallandale%20FL%2033009%22%7D"
     else:
         search_url = f"https://www.zillow.com/homes/{zipcode}_rb/?searchQueryState=%7B%22filterState%22%3A%7B%22price%22%3A%7B%22min%22%3A200000%7D%2C%22beds%22%3A%7B%22min%22%3A2%7D%2C%22sort%22%3A%7B%22value%22%3A%22days%22%7D%7D%7D"
-    driver.get(search_url)
-    time.sleep(3)
-    # Scroll all '/homedetails/' links into view
-    for _ in range(20):
-        anchors = driver.find_elements(By.XPATH, "//a[contains(@href, '/homedetails/')]")
-        for a in anchors:
-            href = a.get_attribute('href')
-            if href and '/homedetails/' in href:
-                driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", a)
-                time.sleep(0.3)
-        time.sleep(0.3)
+    start_page, skip, listings_processed = start
+    # A resumed run opens its results page directly instead of paging through the earlier ones
+    driver.get(page_url(search_url, start_page) if start_page > 1 else search_url)
+    wait_for_element(driver, (By.CSS_SELECTOR, CARD_SELECTOR))
+    # Detail pages are fetched over HTTP with this browser's cookies where possible
+    if fetcher:
+        fetcher.borrow_session(driver)
     MAX_LISTINGS = 100
-    listings_processed = 0
-    page_num = 1
-    while True:
-        # Find all property cards
-        cards = driver.find_elements(By.CSS_SELECTOR, "article[data-test='property-card']")
-        logging.info(f"Found {len(cards)} property cards to process on page {page_num}.")
-        hrefs = []
-        for card in cards:
-            try:
-                anchor = card.find_element(By.XPATH, ".//a[contains(@href, '/homedetails/')]")
-                href = anchor.get_attribute('href')
-                if href:
-                    hrefs.append(href)
-            except Exception as e:
-                logging.debug(f"Card anchor extraction error: {e}")
-        for href in hrefs:
-            if listings_processed >= MAX_LISTINGS:
-                logging.info(f"Reached {MAX_LISTINGS} listings for zipcode {zipcode}. Stopping.")
-                return
-            if href in saved_urls:
-                logging.info(f"Skipping already-saved property: {href}")
-                continue
-            try:
-                logging.info(f"Navigating to property card: {href}")
-                driver.get(href)
-                data = {}
-                data['ZIPCODE'] = zipcode
-                data['URL'] = href
-                # Extract MLS
-                try:
-                    mls_elem = driver.find_element(By.XPATH, "//span[contains(text(), 'MLS#')]")
-                    mls_text = mls_elem.text.strip()
-                    match = re.search(r'MLS#?:?\s*([A-Za-z0-9\-]+)', mls_text)
-                    if match:
-                        data['MLS'] = match.group(1)
-                    else:
-                        data['MLS'] = ''
-                except Exception:
-                    data['MLS'] = ''
-                # Extract address
-                try:
-                    address_elem = driver.find_element(By.XPATH, "//h1[@itemprop='address']")
-                    data['ADDRESS'] = address_elem.text.strip()
-                except Exception:
-                    data['ADDRESS'] = ''
-                # Extract price
+    page_num = start_page
+    # Detail pages open in a side tab so the results page never has to be reloaded
+    with DetailTab(driver) as tab:
+        while True:
+            # Scroll the lazy-loaded results and collect all property cards in one call
+            hrefs = harvest_cards(driver, CARD_SELECTOR, CARD_LINK_SELECTOR)
+            logging.info(f"Found {len(hrefs)} property cards to process on page {page_num}.")
+            for index, href in enumerate(hrefs):
+                if index < skip:
+                    continue
+                if checkpoint:
+                    checkpoint.position(zipcode, page_num, index, listings_processed, store)
+                if listings_processed >= MAX_LISTINGS:
+                    logging.info(f"Reached {MAX_LISTINGS} listings for zipcode {zipcode}. Stopping.")
+                    return
+                if seen.has(href):
+                    logging.info(f"Skipping already-saved property: {href}")
+                    continue
                 try:
-                    price_elem = driver.find_element(By.XPATH, "//span[@data-testid='price']")
-                    data['PRICE'] = price_elem.text.strip()
-                except Exception:
-                    data['PRICE'] = ''
-                # Extract beds
-                try:
-                    beds_elem = driver.find_element(By.XPATH, "//span[@data-testid='bed']")
-                    data['BEDS'] = beds_elem.text.strip()
-                except Exception:
-                    data['BEDS'] = ''
-                # Extract baths
-                try:
-                    baths_elem = driver.find_element(By.XPATH, "//span[@data-testid='bath']")
-                    data['BATHS'] = baths_elem.text.strip()
-                except Exception:
-                    data['BATHS'] = ''
-                # Extract sqft
-                try:
-                    sqft_elem = driver.find_element(By.XPATH, "//span[@data-testid='sqft']")
-                    data['SQFT'] = sqft_elem.text.strip()
-                except Exception:
-                    data['SQFT'] = ''
-                # Extract agent name
-                try:
-                    agent_elem = driver.find_element(By.XPATH, "//span[contains(@class, 'ListingAgentName')]")
-                    data['AGENT_NAME'] = agent_elem.text.strip()
-                except Exception:
-                    data['AGENT_NAME'] = ''
-                # Extract agent phone
-                try:
-                    phone_elem = driver.find_element(By.XPATH, "//a[contains(@href, 'tel:')]")
-                    data['AGENT_PHONE'] = phone_elem.text.strip()
-                except Exception:
-                    data['AGENT_PHONE'] = ''
-                data['EMAIL'] = ''
-                # Extract days on market
+                    logging.info(f"Navigating to property card: {href}")
+                    data = load_listing(driver, fetcher, href, lambda page: extract_listing(page, zipcode, href), open_page=tab.get, ready=DETAIL_READY)
+                    other_source = seen.captured_elsewhere(data.get('MLS'))
+                    if other_source:
+                        logging.info(f"Skipping MLS {data.get('MLS')}, already captured from {other_source}: {href}")
+                        seen.add(href)
+                        continue
+                    store.add(data)
+                    logging.info(f"Extracted and saved property data: {data}")
+                    listings_processed += 1
+                    # Persisted in the seen index once the store has flushed the row
+                    seen.mark(href)
+                except Exception as e:
+                    logging.error(f"Error processing property card: {e}")
+            # Go back to the results tab (still on this page) and try to go to next page
+            tab.back_to_results()
+            try:
+                next_btn = None
                 try:
-                    days_elem = driver.find_element(By.XPATH, "//span[contains(text(), 'days on Zillow')]")
-                    data['DAYS_ON_MARKET'] = days_elem.text.strip()
+                    next_btn = WebDriverWait(driver, 3).until(
+                        EC.element_to_be_clickable((By.CSS_SELECTOR, "a[title='Next page']"))
+                    )
                 except Exception:
-                    data['DAYS_ON_MARKET'] = ''
-                # Construct Google Maps link from address if available
-                if data['ADDRESS']:
-                    maps_query = data['ADDRESS'].replace(' ', '+')
-                    data['MAPS_URL'] = f"https://www.google.com/maps/search/?api=1&query={maps_query}"
+                    pass
+                if next_btn and next_btn.is_displayed() and next_btn.is_enabled():
+                    polite_delay()
+                    old_url = driver.current_url
+                    old_cards = driver.find_elements(By.CSS_SELECTOR, CARD_SELECTOR)
+                    next_btn.click()
+                    logging.info(f"Successfully clicked next page link for page {page_num + 1}.")
+                    # Wait for the next results page to replace the current cards
+                    wait_for_navigation(driver, old_url, stale_element=old_cards[0] if old_cards else next_btn)
+                    page_num += 1
+                    skip = 0
+                    if checkpoint:
+                        checkpoint.position(zipcode, page_num, 0, listings_processed, store)
                 else:
-                    data['MAPS_URL'] = ''
-                with open(csv_file, 'a', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=headers)
-                    writer.writerow(data)
-                logging.info(f"Extracted and saved property data: {data}")
-                listings_processed += 1
-                saved_urls.add(href)
-                driver.get(search_url)
-            except Exception as e:
-                logging.error(f"Error processing property card: {e}")
-        # Try to go to next page
-        try:
-            next_btn = None
-            try:
-                next_btn = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, "a[title='Next page']"))
-                )
+                    logging.info("Next page link not enabled, not visible, or not found. Scraping complete.")
+                    break
             except Exception:
-                pass
-            if next_btn and next_btn.is_displayed() and next_btn.is_enabled():
-                time.sleep(2)
-                next_btn.click()
-                logging.info(f"Successfully clicked next page link for page {page_num + 1}.")
-                time.sleep(2)
-                page_num += 1
-            else:
-                logging.info("Next page link not enabled, not visible, or not found. Scraping complete.")
+                logging.info("No more pages found or next page link not clickable. Scraping complete.")
                 break
-        except Exception:
-            logging.info("No more pages found or next page link not clickable. Scraping complete.")
-            break
 
 def main():
+    args = parse_scraper_args("Scrape Zillow listings by zipcode.")
     log_filename = 'zillow_scraper.log'
     with open(log_filename, 'a', encoding='utf-8') as f:
         separator = "\n" + "="*80 + "\n"
@@ -223,64 +224,48 @@ def main():
     console.setFormatter(formatter)
     logging.getLogger('').addHandler(console)
 
+    if args.clean_only:
+        logging.info("Running cleaner only on zillow_results.csv...")
+        cleaning.clean_results(RESULTS_CSV)
+        return
+
     driver = None
+    seen = None
+    store = None
     try:
-        logging.info("Starting Zillow scraper...")
-        driver = setup_browser()
-        for zipcode in ZIPCODES:
+        zipcodes = select_zipcodes(ZIPCODES, args)
+        checkpoint = Checkpoint(SOURCE, zipcodes, args.shard)
+        zipcodes, start = checkpoint.resume() if args.resume else (zipcodes, (1, 0, 0))
+        logging.info(f"Starting Zillow scraper for {len(zipcodes)} zipcodes...")
+        driver = setup_browser(args)
+        fetcher = None if args.no_http else HttpFetcher()
+        seen = SeenIndex(SOURCE, skip_other_sources=args.skip_cross_source, bloom=args.seen_bloom)
+        seen.bootstrap(RESULTS_CSV)
+        store = open_store(args.storage, SOURCE, RESULTS_CSV, on_flush=seen.add_rows, emit=args.emit)
+        for zipcode in zipcodes:
             logging.info(f"Processing zipcode: {zipcode}")
-            search_zipcode(driver, zipcode)
-        logging.info("All zipcodes processed. Applying cleaner logic to zillow_results.csv...")
-        # Cleaner logic (copied from redfin_scraper.py)
-        import pandas as pd
-        import re
-        import os
-        csv_file = 'zillow_results.csv'
-        log_file = 'zillow_scraper_cleaner.log'
-        def valid_zipcode(val):
-            return bool(re.match(r'^\d{5}$', str(val).strip()))
-        def valid_mls(val):
-            s = str(val).strip()
-            return bool(re.match(r'^[A-Za-z0-9\-]+$', s)) and s and s.lower() != 'source'
-        def valid_price(val):
-            s = str(val).replace('$', '').replace(',', '').strip()
-            return bool(re.match(r'^\d+(\.\d+)?$', s)) and float(s) > 0
-        if os.path.exists(csv_file):
-            df = pd.read_csv(csv_file)
-            initial_count = len(df)
-            deleted_rows = []
-            # Clean ZIPCODE
-            if 'ZIPCODE' in df.columns:
-                mask_zip = df['ZIPCODE'].apply(valid_zipcode)
-                deleted_rows.extend(df[~mask_zip].to_dict('records'))
-                df = df[mask_zip]
-            # Clean MLS: remove rows where MLS is missing or invalid
-            if 'MLS' in df.columns:
-                mask_mls = df['MLS'].apply(lambda x: pd.notna(x) and str(x).strip() != '' and valid_mls(x))
-                deleted_rows.extend(df[~mask_mls].to_dict('records'))
-                df = df[mask_mls]
-            # Clean PRICE
-            if 'PRICE' in df.columns:
-                mask_price = df['PRICE'].apply(valid_price)
-                deleted_rows.extend(df[~mask_price].to_dict('records'))
-                df = df[mask_price]
-            final_count = len(df)
-            deleted_count = initial_count - final_count
-            cleaned_path = csv_file.replace('.csv', '_cleaned.csv')
-            df.to_csv(cleaned_path, index=False)
-            # Log deleted rows
-            with open(log_file, 'a', encoding='utf-8') as logf:
-                if deleted_count > 0:
-                    logf.write(f"{deleted_count} rows deleted from {csv_file}.\n")
-                    for row in deleted_rows:
-                        logf.write(f"Deleted from {csv_file}: {row}\n")
-            print(f"{deleted_count} rows deleted from {csv_file}. Cleaned file saved as {cleaned_path}.")
-        else:
-            print(f"{csv_file} not found for cleaning.")
-        logging.info("Cleaning complete. See zillow_scraper_cleaner.log for details.")
+            search_zipcode(driver, zipcode, seen, store, fetcher, checkpoint, start)
+            checkpoint.finish(zipcode, store)
+            start = (1, 0, 0)
+        checkpoint.clear()
+        if fetcher:
+            logging.info(f"Detail pages fetched over HTTP: {fetcher.stats['http']}, in the browser: {fetcher.stats['browser']}")
     finally:
+        if store:
+            try:
+                # Bring the results CSV up to date for the cleaner and compiler
+                store.export()
+            finally:
+                store.close()
+        if seen:
+            seen.close()
         if driver:
             driver.quit()
+    if args.skip_clean:
+        logging.info("All zipcodes processed. Skipping cleaner (--skip-clean).")
+    else:
+        logging.info("All zipcodes processed. Applying cleaner logic to zillow_results.csv...")
+        cleaning.clean_results(RESULTS_CSV)
 
 if __name__ == "__main__":
     main()